@@ -2,12 +2,13 @@
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from uuid import UUID
 
 from app.dependencies import get_db
 from app.services.analytics_service import (
-    get_mentor_dashboard_data,
-    get_user_analytics
+    get_mentor_dashboard_data_async,
+    get_user_analytics_async
 )
 from app.utils.context_builder import build_goal_context, build_mentor_context
 from app.repositories.checkin_repo import CheckinRepository
@@ -26,17 +27,18 @@ def get_user_dashboard(
 
 
 @router.get("/mentor/{mentor_id}/patient/{user_id}")
-def get_mentor_dashboard(
+async def get_mentor_dashboard(
     mentor_id: UUID,
     user_id: UUID,
     session: Session = Depends(get_db)
 ):
     """Get mentor's view of a patient's dashboard."""
-    context = build_mentor_context(session, user_id)
+    # Postgres access is sync — keep it off the event loop
+    context = await run_in_threadpool(build_mentor_context, session, user_id)
     
     # Add Snowflake analytics
     try:
-        analytics = get_mentor_dashboard_data(str(user_id))
+        analytics = await get_mentor_dashboard_data_async(str(user_id))
         context["snowflake_analytics"] = analytics
     except Exception as e:
         context["snowflake_analytics"] = {"error": str(e)}
@@ -45,13 +47,13 @@ def get_mentor_dashboard(
 
 
 @router.get("/analytics/{user_id}")
-def get_user_analytics_dashboard(
+async def get_user_analytics_dashboard(
     user_id: UUID,
     session: Session = Depends(get_db)
 ):
     """Get user-specific analytics from Snowflake."""
     try:
-        analytics = get_user_analytics(str(user_id))
+        analytics = await get_user_analytics_async(str(user_id))
         return {"user_id": user_id, "analytics": analytics}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
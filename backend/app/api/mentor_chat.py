@@ -2,6 +2,7 @@
 
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from uuid import UUID
 from pydantic import BaseModel
 from datetime import datetime
@@ -9,7 +10,9 @@ from datetime import datetime
 from app.dependencies import get_db
 from app.utils.context_builder import build_mentor_context
 from app.services.gemini_service import mentor_copilot
-from app.services.analytics_service import get_mentor_dashboard_data
+from app.services.analytics_service import get_mentor_dashboard_data_async
+from app.config import settings
+from app.utils.snowflake_async import gather_limited
 from app.models import MentorInteraction
 
 router = APIRouter(prefix="/mentor/chat", tags=["mentor"])
@@ -30,7 +33,7 @@ class MentorChatResponse(BaseModel):
 
 
 @router.post("/", response_model=MentorChatResponse)
-def mentor_chat(
+async def mentor_chat(
     data: MentorChatRequest,
     session: Session = Depends(get_db)
 ):
@@ -51,16 +54,19 @@ def mentor_chat(
     """
     sources_used = []
     
+    # Blocking work (Postgres, Gemini) runs in the threadpool; Snowflake
+    # queries are awaited directly.
+    
     # Load operational context from Postgres
     try:
-        operational_context = build_mentor_context(session, data.patient_id)
+        operational_context = await run_in_threadpool(build_mentor_context, session, data.patient_id)
         sources_used.append("postgresql")
     except Exception as e:
         operational_context = {"error": str(e)}
     
     # Load analytics context from Snowflake
     try:
-        analytics_context = get_mentor_dashboard_data(str(data.patient_id))
+        analytics_context = await get_mentor_dashboard_data_async(str(data.patient_id))
         sources_used.append("snowflake")
     except Exception as e:
         analytics_context = {"error": str(e)}
@@ -101,7 +107,7 @@ def mentor_chat(
     Provide coaching advice:"""
     
     try:
-        ai_reply = mentor_copilot(str(context), data.message)
+        ai_reply = await run_in_threadpool(mentor_copilot, str(context), data.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gemini error: {str(e)}")
     
@@ -121,7 +127,7 @@ def mentor_chat(
         created_at=datetime.utcnow()
     )
     session.add(interaction)
-    session.commit()
+    await run_in_threadpool(session.commit)
     
     return MentorChatResponse(
         ai_reply=ai_reply,
@@ -132,7 +138,7 @@ def mentor_chat(
 
 
 @router.get("/{mentor_id}/patients")
-def list_mentor_patients(
+async def list_mentor_patients(
     mentor_id: UUID,
     session: Session = Depends(get_db)
 ):
@@ -141,26 +147,29 @@ def list_mentor_patients(
     from sqlalchemy import select
     from app.models import User
     
-    result = session.execute(
-        select(User).where(User.mentor_id == mentor_id)
+    def load_patients():
+        result = session.execute(
+            select(User).where(User.mentor_id == mentor_id)
+        )
+        return result.scalars().all()
+    
+    patients = await run_in_threadpool(load_patients)
+    
+    # Fetch patients' analytics concurrently, capped so one mentor's list
+    # can't take every pooled Snowflake connection
+    analytics_list = await gather_limited(
+        *(get_mentor_dashboard_data_async(str(patient.id)) for patient in patients),
+        limit=settings.SNOWFLAKE_QUERY_CONCURRENCY,
+        return_exceptions=True,
     )
-    patients = result.scalars().all()
     
     patient_list = []
-    for patient in patients:
-        try:
-            analytics = get_mentor_dashboard_data(str(patient.id))
-            patient_list.append({
-                "id": str(patient.id),
-                "name": patient.name,
-                "analytics": analytics
-            })
-        except:
-            patient_list.append({
-                "id": str(patient.id),
-                "name": patient.name,
-                "analytics": None
-            })
+    for patient, analytics in zip(patients, analytics_list):
+        patient_list.append({
+            "id": str(patient.id),
+            "name": patient.name,
+            "analytics": None if isinstance(analytics, BaseException) else analytics
+        })
     
     return patient_list
 
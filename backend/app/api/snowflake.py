@@ -2,19 +2,31 @@
 Snowflake analytics API — exposes user and group data fetched from
 Snowflake (analytics) and Supabase (relational), intended to provide
 context for the Gemini chatbot.
+
+User and group endpoints are ``async def`` and await Snowflake through the
+async service variants, so slow warehouse queries don't tie up the
+threadpool that sync handlers run on.
 """
 
 from typing import Optional
 
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
+from app.database import get_snowflake_pool
 from app.services.snowflake_service import (
-    get_user_summary,
-    get_user_goals_detail,
-    get_group_member_summaries,
-    build_group_context_string,
+    get_user_summary_async,
+    get_user_goals_detail_async,
+    get_goal_completion_history_async,
+    get_group_member_summaries_async,
+    get_group_member_summaries_batch_async,
+    build_group_context_string_async,
+    iter_group_context_async,
 )
 from app.supabase_client import get_supabase_client
+from app.utils.query_metrics import get_query_stats
+from app.utils.query_tags import MAX_REPORT_HOURS, credit_report
+from app.utils.result_cache import data_version, get_result_cache
 
 router = APIRouter(prefix="/snowflake", tags=["snowflake"])
 
@@ -24,7 +36,7 @@ router = APIRouter(prefix="/snowflake", tags=["snowflake"])
 # ---------------------------------------------------------------------------
 
 @router.get("/user/{user_id}/summary")
-def user_summary(user_id: str):
+async def user_summary(user_id: str):
     """
     Full summary for a single user:
     - Profile (name, email)
@@ -35,21 +47,44 @@ def user_summary(user_id: str):
     Used by the chatbot to give context about the current user.
     """
     try:
-        return get_user_summary(user_id)
+        return await get_user_summary_async(user_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/user/{user_id}/goals")
-def user_goals(user_id: str):
+async def user_goals(
+    user_id: str,
+    history_limit: int = Query(30, ge=0, le=500, description="Recent completions to include per goal"),
+):
     """
-    Detailed per-goal breakdown for a user including full check-in history.
-    Snowflake fact_checkins used when available; falls back to Supabase goal_completions.
+    Detailed per-goal breakdown for a user including recent check-in history.
 
-    Includes completion rate, missed count, and per-checkin timestamps.
+    Includes completion count, completion rate, missed count, first/last
+    completion dates and the most recent completions. Counts are aggregated
+    in Snowflake; use /user/{user_id}/goals/{goal_id}/completions for the
+    full history.
     """
     try:
-        return get_user_goals_detail(user_id)
+        return await get_user_goals_detail_async(user_id, history_limit=history_limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/user/{user_id}/goals/{goal_id}/completions")
+async def goal_completions(
+    user_id: str,
+    goal_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Paginated completion history for one goal, newest first.
+
+    Returns {goal_id, total, limit, offset, completions}.
+    """
+    try:
+        return await get_goal_completion_history_async(user_id, goal_id, limit=limit, offset=offset)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -59,7 +94,7 @@ def user_goals(user_id: str):
 # ---------------------------------------------------------------------------
 
 @router.get("/group/{group_id}/members")
-def group_members(group_id: str):
+async def group_members(group_id: str):
     """
     All members of a group with their individual summaries:
     - Goals + completion counts
@@ -70,13 +105,13 @@ def group_members(group_id: str):
     to the chatbot.
     """
     try:
-        return get_group_member_summaries(group_id)
+        return await get_group_member_summaries_async(group_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/group/{group_id}/context")
-def group_context(group_id: str):
+async def group_context(group_id: str):
     """
     Pre-formatted plain-text context string for a group, ready to inject
     into a Gemini prompt.
@@ -96,7 +131,7 @@ def group_context(group_id: str):
     directly into the Gemini prompt.
     """
     try:
-        context_str, group_name = build_group_context_string(group_id)
+        context_str, group_name = await build_group_context_string_async(group_id)
         return {
             "group_id":   group_id,
             "group_name": group_name,
@@ -106,6 +141,58 @@ def group_context(group_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/group/{group_id}/context/stream")
+async def group_context_stream(group_id: str):
+    """
+    Same text as /group/{group_id}/context, streamed as chunked text/plain:
+    the header line first, then each member's block as soon as its chunk
+    of members has been fetched. Use for large groups, where waiting for
+    the whole string delays the first byte and holds every member in memory.
+
+    Errors before the header (e.g. Snowflake unreachable) return 500; a
+    failure mid-stream ends the response early.
+    """
+    chunks = iter_group_context_async(group_id)
+    try:
+        header = await anext(chunks)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def body():
+        yield header
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(body(), media_type="text/plain; charset=utf-8")
+
+
+# Upper bound on group_ids per batch request
+_MAX_BATCH_GROUPS = 50
+
+
+@router.get("/groups/members")
+async def groups_members(
+    group_ids: list[str] = Query(..., description="Group ids; repeat the parameter for each group"),
+):
+    """
+    /group/{group_id}/members for several groups in one call.
+
+    Returns {group_id: summary} in request order, each summary shaped like
+    the single-group endpoint. Members shared between groups are fetched
+    once, and the number of Snowflake queries doesn't grow with the number
+    of groups.
+    """
+    if len(group_ids) > _MAX_BATCH_GROUPS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {_MAX_BATCH_GROUPS} group_ids per request",
+        )
+    try:
+        return await get_group_member_summaries_batch_async(group_ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ---------------------------------------------------------------------------
 # Group discovery
 # ---------------------------------------------------------------------------
@@ -150,3 +237,60 @@ def list_groups(
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# ---------------------------------------------------------------------------
+# Monitoring
+# ---------------------------------------------------------------------------
+
+@router.get("/pool/stats")
+def pool_stats():
+    """
+    Snowflake connection pool statistics for monitoring:
+    open / in-use / idle connections, checkouts, waits, timeouts,
+    health-check failures and average wait time.
+    """
+    return get_snowflake_pool().stats()
+
+
+@router.get("/cache/stats")
+def cache_stats():
+    """Result cache statistics (hits, misses, evictions) and the current data version."""
+    return {**get_result_cache().stats(), "data_version": data_version()}
+
+
+@router.get("/queries/stats")
+def query_stats():
+    """
+    Per-fingerprint Snowflake query statistics for this API process:
+    count, errors, total/avg/max latency, rows, bytes, calling functions and
+    a cumulative latency histogram. Sorted by total time spent.
+    """
+    return get_query_stats().summary()
+
+
+@router.get("/queries/slow")
+def slow_queries(limit: int = Query(20, ge=1, le=200)):
+    """
+    The slowest recent Snowflake queries (rolling window of the last
+    SNOWFLAKE_QUERY_LOG_WINDOW statements), with query id, fingerprint,
+    normalized SQL, elapsed time, rows, bytes and caller.
+    """
+    return get_query_stats().slowest(limit)
+
+
+@router.get("/queries/credits")
+def query_credits(
+    hours: int = Query(24, ge=1, le=MAX_REPORT_HOURS),
+    by: str = Query("feature", pattern="^(feature|scope|tag)$"),
+):
+    """
+    Snowflake spend attribution from QUERY_HISTORY, grouped by QUERY_TAG:
+    query count, elapsed / execution seconds, bytes scanned and estimated
+    credits per route or task (*by*=feature), per user/group (*by*=scope)
+    or per raw tag. Covers this service user's queries from every process.
+    """
+    try:
+        return credit_report(hours=hours, by=by)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
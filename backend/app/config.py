@@ -24,6 +24,56 @@ class Settings(BaseSettings):
     SNOWFLAKE_SCHEMA: str = "PUBLIC"
     SNOWFLAKE_ROLE: str = ""
 
+    # Snowflake connection pool (read path used by snowflake_service / snowflake_utils)
+    SNOWFLAKE_POOL_SIZE: int = 5                 # max open connections per process
+    SNOWFLAKE_POOL_TIMEOUT: float = 30.0         # seconds to wait for a free connection
+    SNOWFLAKE_POOL_MAX_LIFETIME: float = 3600.0  # recycle connections older than this
+    SNOWFLAKE_POOL_IDLE_TIMEOUT: float = 600.0   # close connections idle longer than this
+    SNOWFLAKE_POOL_PING_AFTER: float = 60.0      # health-check connections idle longer than this
+    SNOWFLAKE_QUERY_CONCURRENCY: int = 4         # max concurrent queries per group-summary request
+    SNOWFLAKE_IN_LIST_THRESHOLD: int = 200       # above this many ids, read them from a session temp table
+    SNOWFLAKE_ARROW_FETCH: bool = False          # columnar fetch for large grouped results (needs pyarrow)
+    SNOWFLAKE_CONTEXT_CHUNK_SIZE: int = 50       # members fetched per step when streaming group context
+
+    # Warmup / keepalive (see app/utils/snowflake_warmup.py)
+    SNOWFLAKE_WARMUP: bool = True                # pre-open pooled sessions at API start
+    SNOWFLAKE_WARMUP_CONNECTIONS: int = 2        # sessions opened and kept warm (capped at pool size)
+    SNOWFLAKE_KEEPALIVE: bool = True             # client_session_keep_alive on every connection
+    SNOWFLAKE_KEEPALIVE_INTERVAL: float = 240.0  # seconds between re-warms of the idle pool
+
+    # Query instrumentation (see app/utils/query_metrics.py)
+    SNOWFLAKE_QUERY_METRICS: bool = True         # record every statement issued via get_snowflake_connection
+    SNOWFLAKE_SLOW_QUERY_MS: float = 1000.0      # log at WARNING at or above this latency
+    SNOWFLAKE_QUERY_LOG_WINDOW: int = 1000       # recent queries kept for the slow-query report
+
+    # Request-path adherence/risk come from the precomputed metrics tables
+    # when newer than this; otherwise they are computed live (analytics_service)
+    SNOWFLAKE_METRICS_MAX_AGE_SECONDS: float = 7 * 3600  # metrics tasks run every 4-6h
+
+    # "Last N days" analytics windows end at the current time truncated to
+    # this many seconds, so repeated reads hit Snowflake's result cache
+    # (see app/utils/sql_templates.py); 0 = the current second
+    SNOWFLAKE_TIME_BUCKET_SECONDS: int = 3600
+
+    # Group summaries come from group_summary_snapshot (one document per group,
+    # rebuilt by the worker) when newer than this; otherwise they are built live
+    SNOWFLAKE_GROUP_SNAPSHOTS: bool = True
+    SNOWFLAKE_GROUP_SNAPSHOT_MAX_AGE_SECONDS: float = 7 * 3600
+
+    # Optional local DuckDB replica of the analytics tables (see app/utils/local_replica.py)
+    ANALYTICS_READ_BACKEND: str = "snowflake"    # "snowflake" or "duckdb" — where snowflake_service reads
+    DUCKDB_REPLICA_PATH: str = ""                # replica file; the worker keeps it up to date when set
+
+    # Result cache for Snowflake-backed service functions (see app/utils/result_cache.py)
+    SNOWFLAKE_CACHE_ENABLED: bool = True
+    SNOWFLAKE_CACHE_TTL: float = 900.0                 # safety net if a version bump is missed
+    SNOWFLAKE_CACHE_MAX_ENTRIES: int = 512             # in-process LRU size
+    SNOWFLAKE_CACHE_REDIS: bool = False                # also share cached results via Redis
+    SNOWFLAKE_CACHE_VERSION_CHECK_SECONDS: float = 5.0 # how often to re-read the data version
+
+    # Redis — Celery broker/backend; also carries the cache data version
+    REDIS_URL: str = "redis://localhost:6379/0"
+
     GEMINI_API_KEY: str = ""
 
     class Config:
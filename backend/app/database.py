@@ -2,8 +2,14 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.config import settings
-import snowflake.connector
+from snowflake.connector.errors import Error as SnowflakeError, ProgrammingError
+from collections import deque
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from functools import lru_cache
+import asyncio
 import os
+import threading
+import time
 
 # Supabase PostgreSQL connection (synchronous engine)
 DATABASE_URL = settings.DATABASE_URL
@@ -49,7 +55,13 @@ Base = declarative_base()
 
 
 def get_snowflake_connection():
-    """Create a synchronous Snowflake connection."""
+    """
+    Create a synchronous Snowflake connection.
+
+    Every statement run on it carries the caller's QUERY_TAG
+    (app/utils/query_tags.py) and, with SNOWFLAKE_QUERY_METRICS on, is timed
+    and recorded (app/utils/query_metrics.py).
+    """
     kwargs = dict(
         user=settings.SNOWFLAKE_USER,
         password=settings.SNOWFLAKE_PASSWORD,
@@ -60,4 +72,297 @@ def get_snowflake_connection():
     )
     if settings.SNOWFLAKE_ROLE:
         kwargs["role"] = settings.SNOWFLAKE_ROLE
-    return snowflake.connector.connect(**kwargs)
\ No newline at end of file
+    if settings.SNOWFLAKE_KEEPALIVE:
+        # Heartbeats stop idle sessions expiring server-side (4h by default)
+        kwargs["client_session_keep_alive"] = True
+    from app.utils.query_metrics import InstrumentedConnection
+    return InstrumentedConnection(**kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Snowflake connection pool
+# ---------------------------------------------------------------------------
+
+class SnowflakeConnectionPool:
+    """
+    Thread-safe, bounded pool of reusable Snowflake connections.
+
+    Logging in to Snowflake costs far more than a typical analytics query,
+    so read paths borrow an already-authenticated connection instead of
+    opening one per statement.
+
+    - At most *max_size* connections exist at once; borrowers wait up to
+      *timeout* seconds for one to be returned, then get a TimeoutError.
+    - Connections older than *max_lifetime* are recycled.
+    - Connections idle longer than *idle_timeout* are closed.
+    - Connections idle longer than *ping_after* are health-checked with
+      ``SELECT 1`` before being handed out.
+    - A connection that raised a connector error other than a SQL
+      (Programming) error is discarded rather than returned to the pool.
+    """
+
+    def __init__(
+        self,
+        connect=None,
+        max_size: int = 5,
+        timeout: float = 30.0,
+        max_lifetime: float = 3600.0,
+        idle_timeout: float = 600.0,
+        ping_after: float = 60.0,
+    ):
+        self._connect = connect or get_snowflake_connection
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+
+        self._lock = threading.Condition()
+        self._idle: deque = deque()  # (conn, created_at, last_used), most recent on the right
+        self._created_at: dict[int, float] = {}
+        self._in_use = 0
+        self._closed = False
+        self._stats = {
+            "connections_created": 0,
+            "connections_closed": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "health_check_failures": 0,
+            "discarded_on_error": 0,
+        }
+        self._wait_seconds_total = 0.0
+
+    # -- borrowing -----------------------------------------------------------
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the ``with`` block."""
+        conn = self._checkout()
+        try:
+            yield conn
+        except BaseException as exc:
+            self._release(conn, exc)
+            raise
+        else:
+            self._release(conn, None)
+
+    @asynccontextmanager
+    async def connection_async(self):
+        """Async counterpart of connection(); waits for a free connection off the event loop."""
+        checkout = asyncio.ensure_future(asyncio.to_thread(self._checkout))
+        try:
+            conn = await asyncio.shield(checkout)
+        except asyncio.CancelledError:
+            # The worker thread may still get a connection — hand it back
+            checkout.add_done_callback(
+                lambda f: f.cancelled() or f.exception() or self._checkin(f.result())
+            )
+            raise
+        try:
+            yield conn
+        except BaseException as exc:
+            self._release(conn, exc)
+            raise
+        else:
+            self._release(conn, None)
+
+    def _release(self, conn, exc: BaseException | None) -> None:
+        """Return *conn* to the pool, or discard it if *exc* means the session may be broken."""
+        if exc is None or isinstance(exc, ProgrammingError):
+            # No error, or a SQL-level error: the session itself is still healthy
+            self._checkin(conn)
+        elif isinstance(exc, SnowflakeError):
+            # Network / session-level failure: don't hand this one out again
+            with self._lock:
+                self._stats["discarded_on_error"] += 1
+            self._discard(conn)
+        elif isinstance(exc, Exception):
+            self._checkin(conn)
+        else:
+            # Cancellation / interpreter exit mid-query
+            self._discard(conn)
+
+    def _checkout(self):
+        deadline = time.monotonic() + self.timeout
+        waited = False
+        wait_start = time.monotonic()
+
+        while True:
+            expired = []
+            candidate = None
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Snowflake connection pool is closed")
+
+                expired = self._evict_expired_locked(time.monotonic())
+                if self._idle:
+                    candidate = self._idle.pop()
+                    self._in_use += 1
+                elif self._in_use + len(self._idle) < self.max_size:
+                    self._in_use += 1
+                else:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise TimeoutError(
+                            f"Timed out after {self.timeout:.1f}s waiting for a "
+                            f"Snowflake connection (pool size {self.max_size})"
+                        )
+                    if not waited:
+                        self._stats["waits"] += 1
+                        waited = True
+                    self._lock.wait(remaining)
+                    continue
+
+            self._close_all(expired)
+
+            if candidate is not None:
+                conn, _, last_used = candidate
+                if self._is_healthy(conn, last_used):
+                    self._record_checkout(waited, wait_start)
+                    return conn
+                with self._lock:
+                    self._stats["health_check_failures"] += 1
+                self._discard(conn)
+                continue
+
+            try:
+                conn = self._connect()
+            except BaseException:
+                with self._lock:
+                    self._in_use -= 1
+                    self._lock.notify()
+                raise
+            with self._lock:
+                self._created_at[id(conn)] = time.monotonic()
+                self._stats["connections_created"] += 1
+            self._record_checkout(waited, wait_start)
+            return conn
+
+    def _checkin(self, conn) -> None:
+        now = time.monotonic()
+        with self._lock:
+            created = self._created_at.get(id(conn), now)
+            if not self._closed and now - created < self.max_lifetime:
+                self._in_use -= 1
+                self._idle.append((conn, created, now))
+                self._lock.notify()
+                return
+        self._discard(conn)
+
+    def _discard(self, conn) -> None:
+        with self._lock:
+            self._in_use -= 1
+            self._lock.notify()
+        self._close_all([conn])
+
+    def _record_checkout(self, waited: bool, wait_start: float) -> None:
+        with self._lock:
+            self._stats["checkouts"] += 1
+            if waited:
+                self._wait_seconds_total += time.monotonic() - wait_start
+
+    # -- health / eviction ---------------------------------------------------
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        try:
+            if conn.is_closed():
+                return False
+            if time.monotonic() - last_used >= self.ping_after:
+                cur = conn.cursor()
+                try:
+                    cur.execute("SELECT 1")
+                    cur.fetchone()
+                finally:
+                    cur.close()
+            return True
+        except Exception:
+            return False
+
+    def _evict_expired_locked(self, now: float) -> list:
+        """Remove idle connections past their lifetime or idle timeout. Caller holds the lock."""
+        keep: deque = deque()
+        expired = []
+        for conn, created, last_used in self._idle:
+            if now - created >= self.max_lifetime or now - last_used >= self.idle_timeout:
+                expired.append(conn)
+            else:
+                keep.append((conn, created, last_used))
+        self._idle = keep
+        return expired
+
+    def _close_all(self, conns: list) -> None:
+        """Close connections outside the lock — closing is a network call."""
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        if conns:
+            with self._lock:
+                for conn in conns:
+                    self._created_at.pop(id(conn), None)
+                self._stats["connections_closed"] += len(conns)
+
+    # -- lifecycle / monitoring ----------------------------------------------
+
+    def warm(self, count: int, statement: str = "SELECT 1") -> int:
+        """
+        Hold *count* connections at once (opening new ones as needed, capped
+        at max_size), run *statement* on each and return them to the pool.
+        Returns the number of connections warmed.
+        """
+        count = max(0, min(count, self.max_size))
+        with ExitStack() as stack:
+            conns = [stack.enter_context(self.connection()) for _ in range(count)]
+            for conn in conns:
+                cur = conn.cursor()
+                try:
+                    cur.execute(statement)
+                    cur.fetchall()
+                finally:
+                    cur.close()
+        return count
+
+    def evict_idle(self) -> int:
+        """Close idle connections past their lifetime or idle timeout. Returns the count closed."""
+        with self._lock:
+            expired = self._evict_expired_locked(time.monotonic())
+        self._close_all(expired)
+        return len(expired)
+
+    def close(self) -> None:
+        """Close every idle connection and refuse further checkouts."""
+        with self._lock:
+            self._closed = True
+            idle = [conn for conn, _, _ in self._idle]
+            self._idle.clear()
+            self._lock.notify_all()
+        self._close_all(idle)
+
+    def stats(self) -> dict:
+        """Point-in-time pool statistics for monitoring."""
+        with self._lock:
+            waits = self._stats["waits"]
+            return {
+                "max_size":     self.max_size,
+                "open":         self._in_use + len(self._idle),
+                "in_use":       self._in_use,
+                "idle":         len(self._idle),
+                "closed":       self._closed,
+                **self._stats,
+                "avg_wait_ms":  round(1000 * self._wait_seconds_total / waits, 2) if waits else 0.0,
+            }
+
+
+@lru_cache(maxsize=1)
+def get_snowflake_pool() -> SnowflakeConnectionPool:
+    """Return the process-wide Snowflake connection pool (created on first use)."""
+    return SnowflakeConnectionPool(
+        max_size=settings.SNOWFLAKE_POOL_SIZE,
+        timeout=settings.SNOWFLAKE_POOL_TIMEOUT,
+        max_lifetime=settings.SNOWFLAKE_POOL_MAX_LIFETIME,
+        idle_timeout=settings.SNOWFLAKE_POOL_IDLE_TIMEOUT,
+        ping_after=settings.SNOWFLAKE_POOL_PING_AFTER,
+    )
@@ -1,12 +1,16 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.api import member, mentor, goals, dashboard, chat, mentor_chat, coach, snowflake
-from app.database import engine, Base
+from app.database import engine, Base, get_snowflake_pool
+from app.utils.query_tags import tag_request
+from app.utils.snowflake_warmup import start_warmup, stop_warmup, warmup_status
 
 app = FastAPI(
     title="Goal Tracking App API",
     description="API for managing goals, mentors, and progress tracking",
-    version="1.0.0"
+    version="1.0.0",
+    # Tag Snowflake statements with the route and user/group they serve
+    dependencies=[Depends(tag_request)],
 )
 
 # ---------------------------------------------------------------------------
@@ -41,8 +45,16 @@ def startup():
         except Exception as e:
             print(f"Warning: Database unreachable ({type(e).__name__}). API will run; use Supabase REST for data.")
     threading.Thread(target=_create_tables, daemon=True).start()
+    # Open Snowflake sessions before traffic arrives; /ready reports progress
+    start_warmup()
 
 
+@app.on_event("shutdown")
+def shutdown():
+    """Close pooled Snowflake connections so sessions are not left open server-side."""
+    stop_warmup()
+    get_snowflake_pool().close()
+
 
 # Add CORS middleware
 app.add_middleware(
@@ -77,4 +89,16 @@ async def root():
 @app.get("/health")
 async def health():
     """Health check endpoint."""
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready(response: Response):
+    """
+    Readiness probe: 503 until the Snowflake analytics path is warm (pooled
+    sessions open, warehouse resumed), and again if keeping it warm fails.
+    Always ready when warmup is disabled or reads go to the local replica.
+    """
+    status = warmup_status()
+    if not status["ready"]:
+        response.status_code = 503
+    return status
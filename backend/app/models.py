@@ -169,6 +169,7 @@ class SyncWatermark(Base):
 
     source_table = Column(Text, primary_key=True)
     last_watermark = Column(DateTime, nullable=True)   # highest watermark synced
+    last_key = Column(Text, nullable=True)              # pk of the last row synced at last_watermark
     last_run = Column(DateTime, nullable=True)          # wall-clock time of last run
     last_status = Column(Text, nullable=True)           # ok | idle | error
     last_error = Column(Text, nullable=True)            # error message if status=error
@@ -1,17 +1,102 @@
-"""Analytics service for Snowflake read-only operations."""
+"""
+Analytics service for Snowflake read-only operations.
 
+Adherence and risk are served from the precomputed metrics_adherence /
+metrics_risk tables when the Celery metrics tasks have written them
+within SNOWFLAKE_METRICS_MAX_AGE_SECONDS; otherwise that section is
+computed live from fact_checkins. Responses carry a "freshness" field
+saying which source each section came from and how old it is.
+"""
+
+import asyncio
+
+from app.config import settings
 from app.utils.snowflake_utils import (
     compute_adherence_metrics,
+    compute_adherence_metrics_async,
     detect_risk_patterns,
-    get_mentor_patient_metrics
+    detect_risk_patterns_async,
+    get_mentor_patient_metrics,
+    get_precomputed_metrics,
+    get_precomputed_metrics_async,
 )
 
 
+def _usable(precomputed: dict, section: str) -> bool:
+    """True if *section* was precomputed within the staleness bound."""
+    age = precomputed.get(f"{section}_age_seconds")
+    return (
+        precomputed.get(section) is not None
+        and age is not None
+        and age <= settings.SNOWFLAKE_METRICS_MAX_AGE_SECONDS
+    )
+
+
+def _metrics_response(adherence: dict, adherence_age, risk: dict, risk_age) -> dict:
+    """*_age is seconds since the precomputed row was written, or None for live data."""
+    def freshness(table: str, age) -> dict:
+        if age is None:
+            return {"source": "live", "age_seconds": 0}
+        return {"source": table, "age_seconds": age}
+
+    return {
+        "adherence": adherence,
+        "risk": risk,
+        "freshness": {
+            "adherence": freshness("metrics_adherence", adherence_age),
+            "risk": freshness("metrics_risk", risk_age),
+            "max_age_seconds": settings.SNOWFLAKE_METRICS_MAX_AGE_SECONDS,
+        },
+        "status": "success"
+    }
+
+
+def _load_metrics(user_id: str) -> dict:
+    try:
+        precomputed = get_precomputed_metrics(user_id)
+    except Exception:
+        # e.g. metrics tables not created yet — compute everything live
+        precomputed = {}
+
+    if _usable(precomputed, "adherence"):
+        adherence, adherence_age = precomputed["adherence"], precomputed["adherence_age_seconds"]
+    else:
+        adherence, adherence_age = compute_adherence_metrics(user_id), None
+
+    if _usable(precomputed, "risk"):
+        risk, risk_age = precomputed["risk"], precomputed["risk_age_seconds"]
+    else:
+        risk, risk_age = detect_risk_patterns(user_id), None
+
+    return _metrics_response(adherence, adherence_age, risk, risk_age)
+
+
+async def _load_metrics_async(user_id: str) -> dict:
+    try:
+        precomputed = await get_precomputed_metrics_async(user_id)
+    except Exception:
+        precomputed = {}
+
+    async def adherence():
+        if _usable(precomputed, "adherence"):
+            return precomputed["adherence"], precomputed["adherence_age_seconds"]
+        return await compute_adherence_metrics_async(user_id), None
+
+    async def risk():
+        if _usable(precomputed, "risk"):
+            return precomputed["risk"], precomputed["risk_age_seconds"]
+        return await detect_risk_patterns_async(user_id), None
+
+    # Live fallbacks (if any) run concurrently
+    (adh, adh_age), (rsk, rsk_age) = await asyncio.gather(adherence(), risk())
+    return _metrics_response(adh, adh_age, rsk, rsk_age)
+
+
 def get_mentor_dashboard_data(user_id: str) -> dict:
     """
     Get comprehensive mentor dashboard metrics from Snowflake.
     
-    Includes adherence, risk scores, streaks, and recent trends.
+    Includes adherence, risk scores and their freshness.
     
     Args:
         user_id: ID of the user/mentee to get analytics for
@@ -20,14 +105,18 @@ def get_mentor_dashboard_data(user_id: str) -> dict:
         Dictionary with metrics for mentor dashboard
     """
     try:
-        adherence = compute_adherence_metrics(user_id)
-        risk = detect_risk_patterns(user_id)
-        
+        return _load_metrics(user_id)
+    except Exception as e:
         return {
-            "adherence": adherence,
-            "risk": risk,
-            "status": "success"
+            "error": str(e),
+            "status": "error"
         }
+
+
+async def get_mentor_dashboard_data_async(user_id: str) -> dict:
+    """Async variant of get_mentor_dashboard_data for ``async def`` handlers."""
+    try:
+        return await _load_metrics_async(user_id)
     except Exception as e:
         return {
             "error": str(e),
@@ -45,15 +134,21 @@ def get_user_analytics(user_id: str) -> dict:
         user_id: ID of the user
         
     Returns:
-        User analytics data with adherence, risk, and trends
+        User analytics data with adherence, risk and freshness
     """
     try:
-        metrics = {
-            "adherence": compute_adherence_metrics(user_id),
-            "risk": detect_risk_patterns(user_id),
-            "status": "success"
+        return _load_metrics(user_id)
+    except Exception as e:
+        return {
+            "error": str(e),
+            "status": "error"
         }
-        return metrics
+
+
+async def get_user_analytics_async(user_id: str) -> dict:
+    """Async variant of get_user_analytics."""
+    try:
+        return await _load_metrics_async(user_id)
     except Exception as e:
         return {
             "error": str(e),
@@ -159,8 +159,8 @@ def _get_mcp_tools():
             name="get_user_goals",
             description=(
                 "Fetch a detailed per-goal breakdown for a user: title, frequency, total "
-                "check-ins, completed count, missed count, completion rate (%), and the "
-                "full check-in history with timestamps. Use this when the user asks about "
+                "check-ins, completed count, missed count, completion rate (%), first/last "
+                "completion dates, and recent check-ins with timestamps. Use this when the user asks about "
                 "specific goals or trends over time."
             ),
             parameters=protos.Schema(
@@ -225,17 +225,22 @@ def _dispatch_tool(name: str, args: dict) -> str:
         get_group_member_summaries,
         build_group_context_string,
     )
+    from app.utils.query_tags import query_tag, scope_from
 
     try:
-        if name == "get_user_summary":
-            return json.dumps(sf_user_summary(args["user_id"]), default=str)
-        if name == "get_user_goals":
-            return json.dumps(get_user_goals_detail(args["user_id"]), default=str)
-        if name == "get_group_members":
-            return json.dumps(get_group_member_summaries(args["group_id"]), default=str)
-        if name == "get_group_context":
-            context_str, _ = build_group_context_string(args["group_id"])
-            return context_str
+        # Attribute the tool's Snowflake work to the tool and its user/group
+        with query_tag(tool=name, scope=scope_from(args)):
+            if name == "get_user_summary":
+                return json.dumps(sf_user_summary(args["user_id"]), default=str)
+            if name == "get_user_goals":
+                return json.dumps(get_user_goals_detail(args["user_id"]), default=str)
+            if name == "get_group_members":
+                return json.dumps(get_group_member_summaries(args["group_id"]), default=str)
+            if name == "get_group_context":
+                # The function response is one string, so streaming gains
+                # nothing here; the cached build is reused across tool calls
+                context_str, _ = build_group_context_string(args["group_id"])
+                return context_str
         return f"Unknown tool: {name}"
     except Exception as e:
         return f"Tool error ({name}): {e}"
@@ -14,187 +14,513 @@ Table mapping (Supabase source -> Snowflake target):
 
 Computed analytics tables (populated by Celery):
   metrics_adherence, metrics_streak, metrics_risk
+
+Public service functions are cached (app/utils/result_cache.py) until the
+worker advances a sync watermark or finishes a metrics task. Each has an
+``*_async`` twin for ``async def`` handlers that shares its SQL, shaping
+and cache entries.
+
+With ANALYTICS_READ_BACKEND=duckdb the same queries are answered by the
+worker-maintained local replica (app/utils/local_replica.py).
 """
 
 from __future__ import annotations
 
-from typing import Any
+import asyncio
+import json
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Iterator
 
-from app.database import get_snowflake_connection
+from app.config import settings
+from app.database import get_snowflake_pool
+from app.utils.local_replica import get_replica_reader, use_local_replica
+from app.utils.query_tags import ContextThreadPoolExecutor
+from app.utils.result_cache import cached
+from app.utils.snowflake_async import gather_limited, query_async
+from app.utils.snowflake_utils import fetch_grouped, group_rows
+from app.utils.sql_templates import age_seconds, register, time_bucket
+
+logger = logging.getLogger(__name__)
 
 
 # ---------------------------------------------------------------------------
-# Low-level helper — open a connection, run a query, close everything
+# Low-level helpers — borrow a pooled connection, run a query, return it.
+# With ANALYTICS_READ_BACKEND=duckdb they read the local replica instead
+# (app/utils/local_replica.py); the few Snowflake-only statements below
+# have DuckDB spellings selected the same way.
 # ---------------------------------------------------------------------------
 
-def _query(sql: str, params: tuple = ()) -> list[Any]:  # type: ignore[return]
+def _query(sql: str, params: tuple | dict = ()) -> list[Any]:  # type: ignore[return]
     """Execute a read-only query against Snowflake and return all rows."""
-    conn = get_snowflake_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute(sql, params)
-        return cur.fetchall()  # type: ignore[return-value]
-    finally:
-        cur.close()
-        conn.close()
-
-
-def _query_one(sql: str, params: tuple = ()) -> tuple | None:
+    if use_local_replica():
+        return get_replica_reader().query(sql, params)
+    tables, params = _split_id_tables(params)
+    with get_snowflake_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            _load_id_tables(cur, tables)
+            cur.execute(sql, params)
+            return cur.fetchall()  # type: ignore[return-value]
+        finally:
+            _drop_id_tables(cur, tables)
+            cur.close()
+
+
+def _query_one(sql: str, params: tuple | dict = ()) -> tuple | None:
     """Execute a read-only query and return the first row (or None)."""
     rows = _query(sql, params)
     return rows[0] if rows else None
 
 
+def _query_grouped(sql: str, params: tuple | dict = (), key_index: int = 0) -> dict[str, list[tuple]]:
+    """
+    Execute a read-only query and return its rows grouped by the column at
+    *key_index* (result order kept within each group). Uses the columnar
+    Arrow path when SNOWFLAKE_ARROW_FETCH is enabled.
+    """
+    if use_local_replica():
+        return group_rows(get_replica_reader().query(sql, params), key_index)
+    tables, params = _split_id_tables(params)
+    with get_snowflake_pool().connection() as conn:
+        cur = conn.cursor()
+        try:
+            _load_id_tables(cur, tables)
+            cur.execute(sql, params)
+            return fetch_grouped(cur, key_index)
+        finally:
+            _drop_id_tables(cur, tables)
+            cur.close()
+
+
+def _id_tables_query_async(sql: str, params: tuple | dict, fetch=None):
+    tables, params = _split_id_tables(params)
+    if not tables:
+        return query_async(sql, params, fetch=fetch)
+    return query_async(
+        sql, params, fetch=fetch,
+        setup=lambda cur: _load_id_tables(cur, tables),
+        teardown=lambda cur: _drop_id_tables(cur, tables),
+    )
+
+
+async def _query_async(sql: str, params: tuple | dict = ()) -> list[Any]:
+    """Async counterpart of _query (see app/utils/snowflake_async.py)."""
+    if use_local_replica():
+        return await asyncio.to_thread(get_replica_reader().query, sql, params)
+    return await _id_tables_query_async(sql, params)
+
+
+async def _query_one_async(sql: str, params: tuple | dict = ()) -> tuple | None:
+    rows = await _query_async(sql, params)
+    return rows[0] if rows else None
+
+
+async def _query_grouped_async(
+    sql: str, params: tuple | dict = (), key_index: int = 0,
+) -> dict[str, list[tuple]]:
+    if use_local_replica():
+        rows = await asyncio.to_thread(get_replica_reader().query, sql, params)
+        return group_rows(rows, key_index)
+    return await _id_tables_query_async(sql, params, fetch=lambda cur: fetch_grouped(cur, key_index))
+
+
 # ---------------------------------------------------------------------------
-# Single-user helpers  (used by get_user_summary / get_user_goals_detail)
+# Row shaping — shared by the per-section, batched and composite query paths
 # ---------------------------------------------------------------------------
 
-def _sf_profile(user_id: str) -> dict:
-    row = _query_one(
-        "SELECT id, name, email FROM dim_profiles WHERE id = %s",
-        (user_id,),
-    )
+def _goal_from_row(r: tuple) -> dict:
+    """(id, title, description, frequency, created_at) -> goal dict."""
+    return {
+        "id":          str(r[0]),
+        "title":       r[1],
+        "description": r[2] or "",
+        "frequency":   r[3] or "",
+        "created_at":  str(r[4]) if r[4] else None,
+    }
+
+
+def _completion_from_row(r: tuple) -> dict:
+    """(date, reflection) -> completion dict."""
+    return {"date": str(r[0]), "completed": True, "reflection": r[1]}
+
+
+def _completion_stats_from_row(r: tuple, recent_rows: list[tuple]) -> dict:
+    """(total, first_completion, last_completion) + recent (date, reflection) rows -> stats dict."""
+    return {
+        "total":            int(r[0] or 0),
+        "first_completion": str(r[1]) if r[1] else None,
+        "last_completion":  str(r[2]) if r[2] else None,
+        "recent":           [_completion_from_row(c) for c in recent_rows],
+    }
+
+
+def _check_in_from_row(r: tuple) -> dict:
+    """(date, mood, reflection) -> check-in dict."""
+    return {"date": str(r[0]), "mood": r[1], "reflection": r[2]}
+
+
+def _adherence_from_row(r: tuple) -> dict:
+    """(adherence_7d, adherence_30d, adherence_90d, completed_7d, total_7d) -> adherence dict."""
+    return {
+        "adherence_7d":  round(float(r[0] or 0), 1),
+        "adherence_30d": round(float(r[1] or 0), 1),
+        "adherence_90d": round(float(r[2] or 0), 1),
+        "completed_7d":  int(r[3] or 0),
+        "total_7d":      int(r[4] or 0),
+    }
+
+
+def _streak_from_row(r: tuple) -> dict:
+    """(current_streak, longest_streak, last_completion) -> streak dict."""
+    return {
+        "current_streak":  int(r[0] or 0),
+        "longest_streak":  int(r[1] or 0),
+        "last_completion": str(r[2]) if r[2] else None,
+    }
+
+
+def _risk_from_row(r: tuple) -> dict:
+    """(risk_level, risk_score, missed_3d, missed_7d, last_checkin_days_ago) -> risk dict."""
+    return {
+        "risk_level":            r[0] or "unknown",
+        "risk_score":            round(float(r[1] or 0), 3),
+        "missed_count_3d":       int(r[2] or 0),
+        "missed_count_7d":       int(r[3] or 0),
+        "last_checkin_days_ago": r[4],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Single-user queries  (used by get_user_summary / get_user_goals_detail)
+#
+# Each query is a SQL constant (or builder) plus a row shaper, so the sync
+# helpers below and their *_async twins share everything but the I/O.
+# ---------------------------------------------------------------------------
+
+_PROFILE_SQL = "SELECT id, name, email FROM dim_profiles WHERE id = %s"
+
+_GOALS_SQL = """
+    SELECT id, title, description, frequency, created_at
+    FROM   dim_goals
+    WHERE  user_id = %s
+    ORDER  BY created_at DESC
+"""
+
+_HISTORY_PAGE_SQL = """
+    SELECT c.date, c.reflection, COUNT(*) OVER () AS total
+    FROM   fact_goal_completions c
+    JOIN   dim_goals g ON g.id = c.goal_id
+    WHERE  c.goal_id = %s
+    AND    g.user_id = %s
+    ORDER  BY c.date DESC
+    LIMIT  %s OFFSET %s
+"""
+
+_HISTORY_COUNT_SQL = """
+    SELECT COUNT(*)
+    FROM   fact_goal_completions c
+    JOIN   dim_goals g ON g.id = c.goal_id
+    WHERE  c.goal_id = %s
+    AND    g.user_id = %s
+"""
+
+_CHECK_INS_SQL = """
+    SELECT date, mood, reflection
+    FROM   fact_check_ins
+    WHERE  user_id = %s
+    ORDER  BY date DESC
+    LIMIT  %s
+"""
+
+_ADHERENCE_SQL = """
+    SELECT adherence_7d, adherence_30d, adherence_90d,
+           checkins_completed_7d, checkins_total_7d
+    FROM   metrics_adherence
+    WHERE  user_id = %s
+    ORDER  BY metric_date DESC
+    LIMIT  1
+"""
+
+_STREAK_SQL = """
+    SELECT current_streak, longest_streak, last_completion
+    FROM   metrics_streak
+    WHERE  user_id = %s
+"""
+
+_RISK_SQL = """
+    SELECT risk_level, risk_score, missed_count_3d,
+           missed_count_7d, last_checkin_days_ago
+    FROM   metrics_risk
+    WHERE  user_id = %s
+"""
+
+
+def _profile_from_row(row: tuple | None) -> dict:
     if row:
         return {"id": str(row[0]), "name": row[1], "email": row[2]}
     return {}
 
 
+def _history_page(goal_id: str, limit: int, offset: int, rows: list, total: int | None) -> dict:
+    return {
+        "goal_id":     goal_id,
+        "total":       total or 0,
+        "limit":       limit,
+        "offset":      offset,
+        "completions": [_completion_from_row(r[:2]) for r in rows],
+    }
+
+
+def _sf_profile(user_id: str) -> dict:
+    return _profile_from_row(_query_one(_PROFILE_SQL, (user_id,)))
+
+
 def _sf_goals(user_id: str) -> list[dict]:
-    rows = _query(
-        """
-        SELECT id, title, description, frequency, created_at
-        FROM   dim_goals
-        WHERE  user_id = %s
-        ORDER  BY created_at DESC
-        """,
-        (user_id,),
-    )
-    return [
-        {
-            "id":          str(r[0]),
-            "title":       r[1],
-            "description": r[2] or "",
-            "frequency":   r[3] or "",
-            "created_at":  str(r[4]) if r[4] else None,
-        }
-        for r in rows
-    ]
+    return [_goal_from_row(r) for r in _query(_GOALS_SQL, (user_id,))]
 
 
-def _sf_completions(goal_ids: list[str]) -> dict[str, list]:
-    """fact_goal_completions grouped by goal_id."""
-    if not goal_ids:
-        return {}
-    placeholders = ", ".join(["%s"] * len(goal_ids))
-    rows = _query(
-        f"""
-        SELECT goal_id, date, reflection
-        FROM   fact_goal_completions
-        WHERE  goal_id IN ({placeholders})
-        ORDER  BY date DESC
-        """,
-        tuple(goal_ids),
-    )
-    by_goal: dict[str, list] = {}
-    for goal_id, date, reflection in rows:
-        by_goal.setdefault(str(goal_id), []).append(
-            {"date": str(date), "completed": True, "reflection": reflection}
-        )
-    return by_goal
+def _sf_completion_history(
+    user_id: str, goal_id: str, limit: int = 50, offset: int = 0,
+) -> dict:
+    """One page of a goal's completion history (newest first) plus the total count."""
+    rows = _query(_HISTORY_PAGE_SQL, (goal_id, user_id, limit, offset))
+    total = int(rows[0][2]) if rows else None
+    if total is None and offset:
+        # Page past the end — still report the real total
+        row = _query_one(_HISTORY_COUNT_SQL, (goal_id, user_id))
+        total = int(row[0]) if row else 0
+    return _history_page(goal_id, limit, offset, rows, total)
 
 
 def _sf_check_ins(user_id: str, limit: int = 20) -> list[dict]:
     """Recent mood check-ins from fact_check_ins."""
-    rows = _query(
-        """
-        SELECT date, mood, reflection
-        FROM   fact_check_ins
-        WHERE  user_id = %s
-        ORDER  BY date DESC
-        LIMIT  %s
-        """,
-        (user_id, limit),
-    )
-    return [
-        {"date": str(r[0]), "mood": r[1], "reflection": r[2]}
-        for r in rows
-    ]
+    return [_check_in_from_row(r) for r in _query(_CHECK_INS_SQL, (user_id, limit))]
 
 
 def _sf_adherence(user_id: str) -> dict:
     try:
-        row = _query_one(
-            """
-            SELECT adherence_7d, adherence_30d, adherence_90d,
-                   checkins_completed_7d, checkins_total_7d
-            FROM   metrics_adherence
-            WHERE  user_id = %s
-            ORDER  BY metric_date DESC
-            LIMIT  1
-            """,
-            (user_id,),
-        )
+        row = _query_one(_ADHERENCE_SQL, (user_id,))
         if row:
-            return {
-                "adherence_7d":  round(float(row[0] or 0), 1),
-                "adherence_30d": round(float(row[1] or 0), 1),
-                "adherence_90d": round(float(row[2] or 0), 1),
-                "completed_7d":  int(row[3] or 0),
-                "total_7d":      int(row[4] or 0),
-            }
+            return _adherence_from_row(row)
     except Exception:
         pass
-    return {
-        "adherence_7d": None, "adherence_30d": None, "adherence_90d": None,
-        "completed_7d": None, "total_7d": None,
-    }
+    return dict(_EMPTY_ADHERENCE)
 
 
 def _sf_streak(user_id: str) -> dict:
     try:
-        row = _query_one(
-            """
-            SELECT current_streak, longest_streak, last_completion
-            FROM   metrics_streak
-            WHERE  user_id = %s
-            """,
-            (user_id,),
-        )
+        row = _query_one(_STREAK_SQL, (user_id,))
         if row:
-            return {
-                "current_streak":  int(row[0] or 0),
-                "longest_streak":  int(row[1] or 0),
-                "last_completion": str(row[2]) if row[2] else None,
-            }
+            return _streak_from_row(row)
     except Exception:
         pass
-    return {"current_streak": None, "longest_streak": None, "last_completion": None}
+    return dict(_EMPTY_STREAK)
 
 
 def _sf_risk(user_id: str) -> dict:
     try:
-        row = _query_one(
-            """
-            SELECT risk_level, risk_score, missed_count_3d,
-                   missed_count_7d, last_checkin_days_ago
-            FROM   metrics_risk
-            WHERE  user_id = %s
-            """,
-            (user_id,),
-        )
+        row = _query_one(_RISK_SQL, (user_id,))
         if row:
-            return {
-                "risk_level":            row[0] or "unknown",
-                "risk_score":            round(float(row[1] or 0), 3),
-                "missed_count_3d":       int(row[2] or 0),
-                "missed_count_7d":       int(row[3] or 0),
-                "last_checkin_days_ago": row[4],
-            }
+            return _risk_from_row(row)
     except Exception:
         pass
+    return dict(_EMPTY_RISK)
+
+
+async def _sf_goals_async(user_id: str) -> list[dict]:
+    return [_goal_from_row(r) for r in await _query_async(_GOALS_SQL, (user_id,))]
+
+
+async def _sf_completion_history_async(
+    user_id: str, goal_id: str, limit: int = 50, offset: int = 0,
+) -> dict:
+    rows = await _query_async(_HISTORY_PAGE_SQL, (goal_id, user_id, limit, offset))
+    total = int(rows[0][2]) if rows else None
+    if total is None and offset:
+        row = await _query_one_async(_HISTORY_COUNT_SQL, (goal_id, user_id))
+        total = int(row[0]) if row else 0
+    return _history_page(goal_id, limit, offset, rows, total)
+
+
+# ---------------------------------------------------------------------------
+# Composite single-user query — the whole summary in one round trip
+# ---------------------------------------------------------------------------
+
+def _py_ts(col: str) -> str:
+    """SQL rendering a TIMESTAMP column the way str(datetime) does in Python."""
+    return (
+        f"IFF(DATE_PART(nanosecond, {col}) = 0, "
+        f"TO_VARCHAR({col}, 'YYYY-MM-DD HH24:MI:SS'), "
+        f"TO_VARCHAR({col}, 'YYYY-MM-DD HH24:MI:SS.FF6'))"
+    )
+
+
+# Each section comes back as a VARIANT array of objects (empty array when
+# there are no rows); keys mirror the column order of the per-section queries.
+_USER_SUMMARY_SQL = f"""
+WITH goals AS (
+    SELECT id, title, description, frequency, created_at
+    FROM   dim_goals
+    WHERE  user_id = %(user_id)s
+)
+SELECT
+    (SELECT ARRAY_AGG(OBJECT_CONSTRUCT_KEEP_NULL('id', id, 'name', name, 'email', email))
+     FROM   (SELECT id, name, email FROM dim_profiles WHERE id = %(user_id)s LIMIT 1)
+    ) AS profile,
+
+    (SELECT ARRAY_AGG(OBJECT_CONSTRUCT_KEEP_NULL(
+                'id', id, 'title', title, 'description', description,
+                'frequency', frequency, 'created_at', {_py_ts("created_at")}))
+            WITHIN GROUP (ORDER BY created_at DESC)
+     FROM   goals
+    ) AS goals,
+
+    (SELECT ARRAY_AGG(OBJECT_CONSTRUCT_KEEP_NULL(
+                'goal_id', goal_id, 'total', total, 'first_completion', first_completion,
+                'last_completion', last_completion, 'recent', recent))
+     FROM   (SELECT c.goal_id,
+                    COUNT(*)    AS total,
+                    MIN(c.date) AS first_completion,
+                    MAX(c.date) AS last_completion,
+                    ARRAY_SLICE(
+                        ARRAY_AGG(OBJECT_CONSTRUCT_KEEP_NULL('date', c.date, 'reflection', c.reflection))
+                            WITHIN GROUP (ORDER BY c.date DESC),
+                        0, %(recent_limit)s
+                    ) AS recent
+             FROM   fact_goal_completions c
+             JOIN   goals g ON c.goal_id = g.id
+             GROUP  BY c.goal_id)
+    ) AS completions,
+
+    (SELECT ARRAY_AGG(OBJECT_CONSTRUCT_KEEP_NULL('date', date, 'mood', mood, 'reflection', reflection))
+            WITHIN GROUP (ORDER BY date DESC)
+     FROM   (SELECT date, mood, reflection
+             FROM   fact_check_ins
+             WHERE  user_id = %(user_id)s
+             ORDER  BY date DESC
+             LIMIT  %(check_in_limit)s)
+    ) AS check_ins,
+
+    (SELECT ARRAY_AGG(OBJECT_CONSTRUCT_KEEP_NULL(
+                'adherence_7d', adherence_7d, 'adherence_30d', adherence_30d,
+                'adherence_90d', adherence_90d, 'completed_7d', checkins_completed_7d,
+                'total_7d', checkins_total_7d))
+     FROM   (SELECT * FROM metrics_adherence
+             WHERE  user_id = %(user_id)s
+             ORDER  BY metric_date DESC
+             LIMIT  1)
+    ) AS adherence,
+
+    (SELECT ARRAY_AGG(OBJECT_CONSTRUCT_KEEP_NULL(
+                'current_streak', current_streak, 'longest_streak', longest_streak,
+                'last_completion', {_py_ts("last_completion")}))
+     FROM   (SELECT * FROM metrics_streak WHERE user_id = %(user_id)s LIMIT 1)
+    ) AS streak,
+
+    (SELECT ARRAY_AGG(OBJECT_CONSTRUCT_KEEP_NULL(
+                'risk_level', risk_level, 'risk_score', risk_score,
+                'missed_count_3d', missed_count_3d, 'missed_count_7d', missed_count_7d,
+                'last_checkin_days_ago', last_checkin_days_ago))
+     FROM   (SELECT * FROM metrics_risk WHERE user_id = %(user_id)s LIMIT 1)
+    ) AS risk
+"""
+
+
+def _variant_rows(raw: Any, keys: tuple[str, ...]) -> list[tuple]:
+    """Decode a VARIANT array of objects into positional rows ordered by *keys*.
+
+    Nested VARIANTs arrive already decoded, top-level ones as JSON text.
+    """
+    if raw is None:
+        return []
+    items = json.loads(raw) if isinstance(raw, str) else raw
+    return [tuple(item.get(k) for k in keys) for item in items]
+
+
+def _user_sections_params(user_id: str, check_in_limit: int, recent_limit: int) -> dict:
+    return {"user_id": user_id, "check_in_limit": check_in_limit, "recent_limit": recent_limit}
+
+
+def _user_sections_from_row(row: tuple | None) -> dict:
+    """Decode the single row of _USER_SUMMARY_SQL into per-section dicts."""
+    profile, goals, comps, check_ins, adherence, streak, risk = row or (None,) * 7
+
+    profile_rows = _variant_rows(profile, ("id", "name", "email"))
+    adherence_rows = _variant_rows(
+        adherence, ("adherence_7d", "adherence_30d", "adherence_90d", "completed_7d", "total_7d"),
+    )
+    streak_rows = _variant_rows(streak, ("current_streak", "longest_streak", "last_completion"))
+    risk_rows = _variant_rows(
+        risk, ("risk_level", "risk_score", "missed_count_3d", "missed_count_7d", "last_checkin_days_ago"),
+    )
+
+    completions_by_goal = {
+        str(r[0]): _completion_stats_from_row(r[1:4], _variant_rows(r[4], ("date", "reflection")))
+        for r in _variant_rows(
+            comps, ("goal_id", "total", "first_completion", "last_completion", "recent"),
+        )
+    }
+
     return {
-        "risk_level": None, "risk_score": None, "missed_count_3d": None,
-        "missed_count_7d": None, "last_checkin_days_ago": None,
+        "profile": _profile_from_row(profile_rows[0] if profile_rows else None),
+        "goals": [
+            _goal_from_row(r)
+            for r in _variant_rows(goals, ("id", "title", "description", "frequency", "created_at"))
+        ],
+        "completions_by_goal": completions_by_goal,
+        "check_ins": [
+            _check_in_from_row(r)
+            for r in _variant_rows(check_ins, ("date", "mood", "reflection"))
+        ],
+        "adherence": _adherence_from_row(adherence_rows[0]) if adherence_rows else dict(_EMPTY_ADHERENCE),
+        "streak":    _streak_from_row(streak_rows[0]) if streak_rows else dict(_EMPTY_STREAK),
+        "risk":      _risk_from_row(risk_rows[0]) if risk_rows else dict(_EMPTY_RISK),
+    }
+
+
+def _sf_user_sections(user_id: str, check_in_limit: int = 20, recent_limit: int = 10) -> dict:
+    """
+    Profile, goals, completions, check-ins and metrics for one user in a
+    single Snowflake statement. Raises if any referenced table is missing;
+    callers fall back to the per-section helpers in that case.
+
+    The composite statement is Snowflake SQL; the local replica answers
+    section by section instead.
+    """
+    if use_local_replica():
+        return _sf_user_sections_sequential(user_id, check_in_limit, recent_limit)
+    row = _query_one(_USER_SUMMARY_SQL, _user_sections_params(user_id, check_in_limit, recent_limit))
+    return _user_sections_from_row(row)
+
+
+async def _sf_user_sections_async(
+    user_id: str, check_in_limit: int = 20, recent_limit: int = 10,
+) -> dict:
+    if use_local_replica():
+        return await asyncio.to_thread(
+            _sf_user_sections_sequential, user_id, check_in_limit, recent_limit,
+        )
+    row = await _query_one_async(
+        _USER_SUMMARY_SQL, _user_sections_params(user_id, check_in_limit, recent_limit),
+    )
+    return _user_sections_from_row(row)
+
+
+def _sf_user_sections_sequential(
+    user_id: str, check_in_limit: int = 20, recent_limit: int = 10,
+) -> dict:
+    """Same sections as _sf_user_sections, one statement per section."""
+    goals = _sf_goals(user_id)
+    return {
+        "profile":             _sf_profile(user_id),
+        "goals":               goals,
+        "completions_by_goal": _sf_completions_batch([user_id], recent_limit) if goals else {},
+        "check_ins":           _sf_check_ins(user_id, check_in_limit),
+        "adherence":           _sf_adherence(user_id),
+        "streak":              _sf_streak(user_id),
+        "risk":                _sf_risk(user_id),
     }
 
 
@@ -202,33 +528,217 @@ def _sf_risk(user_id: str) -> dict:
 # Batched group helpers — one query per data type for ALL members at once
 # ---------------------------------------------------------------------------
 
-def _sf_group_info(group_id: str) -> dict:
-    row = _query_one(
-        "SELECT id, name, created_at FROM dim_groups WHERE id = %s",
-        (group_id,),
-    )
+# Ids per INSERT when filling an id temp table (~40 bytes of SQL text each)
+_ID_TABLE_CHUNK = 5000
+
+
+class _IdTable:
+    """
+    Bind-param marker from _id_list: ids to load into session temp table
+    *name* before the statement runs. The query helpers take it out of the
+    params, load it on the borrowed connection and drop it afterwards.
+    """
+
+    __slots__ = ("name", "ids")
+
+    def __init__(self, ids: list[str]):
+        self.name = f"tmp_ids_{uuid.uuid4().hex}"
+        self.ids = list(ids)
+
+
+def _split_id_tables(params: tuple | dict) -> tuple[list[_IdTable], tuple | dict]:
+    """Separate _IdTable markers from the real bind params."""
+    if isinstance(params, dict):
+        return [], params
+    tables = [p for p in params if isinstance(p, _IdTable)]
+    if not tables:
+        return [], params
+    return tables, tuple(p for p in params if not isinstance(p, _IdTable))
+
+
+def _load_id_tables(cur, tables: list[_IdTable]) -> None:
+    for table in tables:
+        cur.execute(f"CREATE TEMPORARY TABLE {table.name} (id VARCHAR)")
+        for start in range(0, len(table.ids), _ID_TABLE_CHUNK):
+            chunk = table.ids[start:start + _ID_TABLE_CHUNK]
+            cur.execute(
+                f"INSERT INTO {table.name} "
+                "SELECT value::VARCHAR FROM TABLE(FLATTEN(INPUT => PARSE_JSON(%s)))",
+                (json.dumps(chunk),),
+            )
+
+
+def _drop_id_tables(cur, tables: list[_IdTable]) -> None:
+    # Temp tables would otherwise live as long as the pooled session
+    for table in tables:
+        try:
+            cur.execute(f"DROP TABLE IF EXISTS {table.name}")
+        except Exception as e:  # noqa: BLE001
+            logger.warning("[snowflake] Could not drop %s: %s", table.name, e)
+
+
+def _id_list(ids: list[str]) -> tuple[str, tuple]:
+    """
+    SQL for the inside of ``col IN (...)`` plus its bind params.
+
+    Small lists get one %s per id. The connector binds client-side (pyformat),
+    so every id ends up in the statement text; above
+    SNOWFLAKE_IN_LIST_THRESHOLD that would grow without bound (and past
+    Snowflake's statement size limit for tens of thousands of ids), so the
+    ids are loaded into a session temp table instead, in INSERTs of at most
+    _ID_TABLE_CHUNK ids, and the query reads ``SELECT id FROM <temp>``.
+    The local replica always gets plain placeholders.
+    """
+    if len(ids) <= settings.SNOWFLAKE_IN_LIST_THRESHOLD or use_local_replica():
+        return ", ".join(["%s"] * len(ids)), tuple(ids)
+    table = _IdTable(ids)
+    return f"SELECT id FROM {table.name}", (table,)
+
+
+_GROUP_INFO_SQL = "SELECT id, name, created_at FROM dim_groups WHERE id = %s"
+
+_GROUP_MEMBERS_SQL = "SELECT user_id FROM fact_group_members WHERE group_id = %s"
+
+
+def _group_info_from_row(row: tuple | None) -> dict:
     if row:
         return {"id": str(row[0]), "name": row[1], "created_at": str(row[2]) if row[2] else None}
     return {}
 
 
-def _sf_group_member_ids(group_id: str) -> list[str]:
-    rows = _query(
-        "SELECT user_id FROM fact_group_members WHERE group_id = %s",
-        (group_id,),
+def _group_info_batch_sql(group_ids: list[str]) -> tuple[str, tuple]:
+    id_list, id_params = _id_list(group_ids)
+    return f"SELECT id, name, created_at FROM dim_groups WHERE id IN ({id_list})", id_params
+
+
+def _group_members_batch_sql(group_ids: list[str]) -> tuple[str, tuple]:
+    id_list, id_params = _id_list(group_ids)
+    return (
+        f"SELECT group_id, user_id FROM fact_group_members WHERE group_id IN ({id_list})",
+        id_params,
     )
-    return [str(r[0]) for r in rows]
+
+
+def _profiles_batch_sql(user_ids: list[str]) -> tuple[str, tuple]:
+    id_list, id_params = _id_list(user_ids)
+    return f"SELECT id, name, email FROM dim_profiles WHERE id IN ({id_list})", id_params
+
+
+def _goals_batch_sql(user_ids: list[str]) -> tuple[str, tuple]:
+    id_list, id_params = _id_list(user_ids)
+    return f"""
+        SELECT user_id, id, title, description, frequency, created_at
+        FROM   dim_goals
+        WHERE  user_id IN ({id_list})
+        ORDER  BY created_at DESC
+    """, id_params
+
+
+def _completions_batch_sql(user_ids: list[str], recent_limit: int) -> tuple[str, tuple]:
+    # Goals are selected by owner in SQL, so goal ids never travel as binds
+    id_list, id_params = _id_list(user_ids)
+    if use_local_replica():
+        # DuckDB spelling of the same ordered, truncated array of objects
+        recent = "list_slice(list({'date': date, 'reflection': reflection} ORDER BY date DESC), 1, %s)"
+    else:
+        recent = """ARRAY_SLICE(
+                   ARRAY_AGG(OBJECT_CONSTRUCT_KEEP_NULL('date', date, 'reflection', reflection))
+                       WITHIN GROUP (ORDER BY date DESC),
+                   0, %s
+               )"""
+    return f"""
+        SELECT goal_id,
+               COUNT(*)  AS total_completions,
+               MIN(date) AS first_completion,
+               MAX(date) AS last_completion,
+               {recent} AS recent
+        FROM   fact_goal_completions
+        WHERE  goal_id IN (SELECT id FROM dim_goals WHERE user_id IN ({id_list}))
+        GROUP  BY goal_id
+    """, (recent_limit, *id_params)
+
+
+def _check_ins_batch_sql(user_ids: list[str], limit_per_user: int) -> tuple[str, tuple]:
+    id_list, id_params = _id_list(user_ids)
+    return f"""
+        SELECT user_id, date, mood, reflection
+        FROM   fact_check_ins
+        WHERE  user_id IN ({id_list})
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY date DESC) <= %s
+        ORDER  BY date DESC
+    """, (*id_params, limit_per_user)
+
+
+def _adherence_batch_sql(user_ids: list[str]) -> tuple[str, tuple]:
+    id_list, id_params = _id_list(user_ids)
+    return f"""
+        SELECT user_id, adherence_7d, adherence_30d, adherence_90d,
+               checkins_completed_7d, checkins_total_7d
+        FROM (
+            SELECT user_id, adherence_7d, adherence_30d, adherence_90d,
+                   checkins_completed_7d, checkins_total_7d,
+                   ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY metric_date DESC) AS rn
+            FROM   metrics_adherence
+            WHERE  user_id IN ({id_list})
+        ) t
+        WHERE rn = 1
+    """, id_params
+
+
+def _streak_batch_sql(user_ids: list[str]) -> tuple[str, tuple]:
+    id_list, id_params = _id_list(user_ids)
+    return f"""
+        SELECT user_id, current_streak, longest_streak, last_completion
+        FROM   metrics_streak
+        WHERE  user_id IN ({id_list})
+    """, id_params
+
+
+def _risk_batch_sql(user_ids: list[str]) -> tuple[str, tuple]:
+    id_list, id_params = _id_list(user_ids)
+    return f"""
+        SELECT user_id, risk_level, risk_score, missed_count_3d,
+               missed_count_7d, last_checkin_days_ago
+        FROM   metrics_risk
+        WHERE  user_id IN ({id_list})
+    """, id_params
+
+
+def _completions_by_goal(rows: list[tuple]) -> dict[str, dict]:
+    return {
+        str(r[0]): _completion_stats_from_row(r[1:], _variant_rows(r[4], ("date", "reflection")))
+        for r in rows
+    }
+
+
+def _sf_group_info(group_id: str) -> dict:
+    return _group_info_from_row(_query_one(_GROUP_INFO_SQL, (group_id,)))
+
+
+def _sf_group_member_ids(group_id: str) -> list[str]:
+    return [str(r[0]) for r in _query(_GROUP_MEMBERS_SQL, (group_id,))]
+
+
+def _sf_group_info_batch(group_ids: list[str]) -> dict[str, dict]:
+    """Returns {group_id: group_info} for the given groups that exist."""
+    if not group_ids:
+        return {}
+    return {str(r[0]): _group_info_from_row(r) for r in _query(*_group_info_batch_sql(group_ids))}
+
+
+def _sf_group_member_ids_batch(group_ids: list[str]) -> dict[str, list[str]]:
+    """Returns {group_id: [user_id, ...]} for the given groups in one query."""
+    if not group_ids:
+        return {}
+    rows_by_group = _query_grouped(*_group_members_batch_sql(group_ids))
+    return {gid: [str(r[1]) for r in rows] for gid, rows in rows_by_group.items()}
 
 
 def _sf_profiles_batch(user_ids: list[str]) -> dict[str, dict]:
     """Returns {user_id: {name, email}} for all given user_ids in one query."""
     if not user_ids:
         return {}
-    placeholders = ", ".join(["%s"] * len(user_ids))
-    rows = _query(
-        f"SELECT id, name, email FROM dim_profiles WHERE id IN ({placeholders})",
-        tuple(user_ids),
-    )
+    rows = _query(*_profiles_batch_sql(user_ids))
     return {str(r[0]): {"name": r[1], "email": r[2]} for r in rows}
 
 
@@ -236,71 +746,40 @@ def _sf_goals_batch(user_ids: list[str]) -> dict[str, list]:
     """Returns {user_id: [goal_dict, ...]} for all given user_ids in one query."""
     if not user_ids:
         return {}
-    placeholders = ", ".join(["%s"] * len(user_ids))
-    rows = _query(
-        f"""
-        SELECT user_id, id, title, description, frequency, created_at
-        FROM   dim_goals
-        WHERE  user_id IN ({placeholders})
-        ORDER  BY created_at DESC
-        """,
-        tuple(user_ids),
-    )
-    by_user: dict[str, list] = {}
-    for user_id, gid, title, desc, freq, created_at in rows:
-        by_user.setdefault(str(user_id), []).append({
-            "id":          str(gid),
-            "title":       title,
-            "description": desc or "",
-            "frequency":   freq or "",
-            "created_at":  str(created_at) if created_at else None,
-        })
-    return by_user
+    rows_by_user = _query_grouped(*_goals_batch_sql(user_ids))
+    return {
+        uid: [_goal_from_row(r[1:]) for r in rows]
+        for uid, rows in rows_by_user.items()
+    }
 
 
-def _sf_completions_batch(goal_ids: list[str]) -> dict[str, list]:
-    """Returns {goal_id: [completion_dict, ...]} for all given goal_ids in one query."""
-    if not goal_ids:
+def _sf_completions_batch(user_ids: list[str], recent_limit: int = 10) -> dict[str, dict]:
+    """
+    Returns {goal_id: completion_stats} for every goal owned by *user_ids*
+    in one query.
+
+    completion_stats = {"total", "first_completion", "last_completion", "recent"}
+    where the count and first/last dates are GROUP BY aggregates and
+    "recent" holds at most *recent_limit* completions, newest first. Full
+    history is paged separately via _sf_completion_history.
+    """
+    if not user_ids:
         return {}
-    placeholders = ", ".join(["%s"] * len(goal_ids))
-    rows = _query(
-        f"""
-        SELECT goal_id, date, reflection
-        FROM   fact_goal_completions
-        WHERE  goal_id IN ({placeholders})
-        ORDER  BY date DESC
-        """,
-        tuple(goal_ids),
-    )
-    by_goal: dict[str, list] = {}
-    for goal_id, date, reflection in rows:
-        by_goal.setdefault(str(goal_id), []).append(
-            {"date": str(date), "completed": True, "reflection": reflection}
-        )
-    return by_goal
+    return _completions_by_goal(_query(*_completions_batch_sql(user_ids, recent_limit)))
 
 
 def _sf_check_ins_batch(user_ids: list[str], limit_per_user: int = 20) -> dict[str, list]:
-    """Returns {user_id: [check_in_dict, ...]} for all given user_ids in one query."""
+    """
+    Returns {user_id: [check_in_dict, ...]} for all given user_ids in one query,
+    limited server-side to the *limit_per_user* most recent check-ins each.
+    """
     if not user_ids:
         return {}
-    placeholders = ", ".join(["%s"] * len(user_ids))
-    rows = _query(
-        f"""
-        SELECT user_id, date, mood, reflection
-        FROM   fact_check_ins
-        WHERE  user_id IN ({placeholders})
-        ORDER  BY date DESC
-        """,
-        tuple(user_ids),
-    )
-    by_user: dict[str, list] = {}
-    for user_id, date, mood, reflection in rows:
-        uid = str(user_id)
-        bucket = by_user.setdefault(uid, [])
-        if len(bucket) < limit_per_user:
-            bucket.append({"date": str(date), "mood": mood, "reflection": reflection})
-    return by_user
+    rows_by_user = _query_grouped(*_check_ins_batch_sql(user_ids, limit_per_user))
+    return {
+        uid: [_check_in_from_row(r[1:]) for r in rows]
+        for uid, rows in rows_by_user.items()
+    }
 
 
 def _sf_adherence_batch(user_ids: list[str]) -> dict[str, dict]:
@@ -308,32 +787,8 @@ def _sf_adherence_batch(user_ids: list[str]) -> dict[str, dict]:
     if not user_ids:
         return {}
     try:
-        placeholders = ", ".join(["%s"] * len(user_ids))
-        rows = _query(
-            f"""
-            SELECT user_id, adherence_7d, adherence_30d, adherence_90d,
-                   checkins_completed_7d, checkins_total_7d
-            FROM (
-                SELECT user_id, adherence_7d, adherence_30d, adherence_90d,
-                       checkins_completed_7d, checkins_total_7d,
-                       ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY metric_date DESC) AS rn
-                FROM   metrics_adherence
-                WHERE  user_id IN ({placeholders})
-            ) t
-            WHERE rn = 1
-            """,
-            tuple(user_ids),
-        )
-        result: dict[str, dict] = {}
-        for user_id, a7, a30, a90, comp7, total7 in rows:
-            result[str(user_id)] = {
-                "adherence_7d":  round(float(a7 or 0), 1),
-                "adherence_30d": round(float(a30 or 0), 1),
-                "adherence_90d": round(float(a90 or 0), 1),
-                "completed_7d":  int(comp7 or 0),
-                "total_7d":      int(total7 or 0),
-            }
-        return result
+        rows = _query(*_adherence_batch_sql(user_ids))
+        return {str(r[0]): _adherence_from_row(r[1:]) for r in rows}
     except Exception:
         return {}
 
@@ -343,23 +798,8 @@ def _sf_streak_batch(user_ids: list[str]) -> dict[str, dict]:
     if not user_ids:
         return {}
     try:
-        placeholders = ", ".join(["%s"] * len(user_ids))
-        rows = _query(
-            f"""
-            SELECT user_id, current_streak, longest_streak, last_completion
-            FROM   metrics_streak
-            WHERE  user_id IN ({placeholders})
-            """,
-            tuple(user_ids),
-        )
-        return {
-            str(r[0]): {
-                "current_streak":  int(r[1] or 0),
-                "longest_streak":  int(r[2] or 0),
-                "last_completion": str(r[3]) if r[3] else None,
-            }
-            for r in rows
-        }
+        rows = _query(*_streak_batch_sql(user_ids))
+        return {str(r[0]): _streak_from_row(r[1:]) for r in rows}
     except Exception:
         return {}
 
@@ -369,26 +809,97 @@ def _sf_risk_batch(user_ids: list[str]) -> dict[str, dict]:
     if not user_ids:
         return {}
     try:
-        placeholders = ", ".join(["%s"] * len(user_ids))
-        rows = _query(
-            f"""
-            SELECT user_id, risk_level, risk_score, missed_count_3d,
-                   missed_count_7d, last_checkin_days_ago
-            FROM   metrics_risk
-            WHERE  user_id IN ({placeholders})
-            """,
-            tuple(user_ids),
-        )
-        return {
-            str(r[0]): {
-                "risk_level":            r[1] or "unknown",
-                "risk_score":            round(float(r[2] or 0), 3),
-                "missed_count_3d":       int(r[3] or 0),
-                "missed_count_7d":       int(r[4] or 0),
-                "last_checkin_days_ago": r[5],
-            }
-            for r in rows
-        }
+        rows = _query(*_risk_batch_sql(user_ids))
+        return {str(r[0]): _risk_from_row(r[1:]) for r in rows}
+    except Exception:
+        return {}
+
+
+# --- async twins (same SQL and shaping, awaited via app/utils/snowflake_async.py) ---
+
+async def _sf_group_info_async(group_id: str) -> dict:
+    return _group_info_from_row(await _query_one_async(_GROUP_INFO_SQL, (group_id,)))
+
+
+async def _sf_group_member_ids_async(group_id: str) -> list[str]:
+    return [str(r[0]) for r in await _query_async(_GROUP_MEMBERS_SQL, (group_id,))]
+
+
+async def _sf_group_info_batch_async(group_ids: list[str]) -> dict[str, dict]:
+    if not group_ids:
+        return {}
+    rows = await _query_async(*_group_info_batch_sql(group_ids))
+    return {str(r[0]): _group_info_from_row(r) for r in rows}
+
+
+async def _sf_group_member_ids_batch_async(group_ids: list[str]) -> dict[str, list[str]]:
+    if not group_ids:
+        return {}
+    rows_by_group = await _query_grouped_async(*_group_members_batch_sql(group_ids))
+    return {gid: [str(r[1]) for r in rows] for gid, rows in rows_by_group.items()}
+
+
+async def _sf_profiles_batch_async(user_ids: list[str]) -> dict[str, dict]:
+    if not user_ids:
+        return {}
+    rows = await _query_async(*_profiles_batch_sql(user_ids))
+    return {str(r[0]): {"name": r[1], "email": r[2]} for r in rows}
+
+
+async def _sf_goals_batch_async(user_ids: list[str]) -> dict[str, list]:
+    if not user_ids:
+        return {}
+    sql, params = _goals_batch_sql(user_ids)
+    rows_by_user = await _query_grouped_async(sql, params)
+    return {
+        uid: [_goal_from_row(r[1:]) for r in rows]
+        for uid, rows in rows_by_user.items()
+    }
+
+
+async def _sf_completions_batch_async(user_ids: list[str], recent_limit: int = 10) -> dict[str, dict]:
+    if not user_ids:
+        return {}
+    return _completions_by_goal(await _query_async(*_completions_batch_sql(user_ids, recent_limit)))
+
+
+async def _sf_check_ins_batch_async(user_ids: list[str], limit_per_user: int = 20) -> dict[str, list]:
+    if not user_ids:
+        return {}
+    sql, params = _check_ins_batch_sql(user_ids, limit_per_user)
+    rows_by_user = await _query_grouped_async(sql, params)
+    return {
+        uid: [_check_in_from_row(r[1:]) for r in rows]
+        for uid, rows in rows_by_user.items()
+    }
+
+
+async def _sf_adherence_batch_async(user_ids: list[str]) -> dict[str, dict]:
+    if not user_ids:
+        return {}
+    try:
+        rows = await _query_async(*_adherence_batch_sql(user_ids))
+        return {str(r[0]): _adherence_from_row(r[1:]) for r in rows}
+    except Exception:
+        return {}
+
+
+async def _sf_streak_batch_async(user_ids: list[str]) -> dict[str, dict]:
+    if not user_ids:
+        return {}
+    try:
+        rows = await _query_async(*_streak_batch_sql(user_ids))
+        return {str(r[0]): _streak_from_row(r[1:]) for r in rows}
+    except Exception:
+        return {}
+
+
+async def _sf_risk_batch_async(user_ids: list[str]) -> dict[str, dict]:
+    if not user_ids:
+        return {}
+    try:
+        rows = await _query_async(*_risk_batch_sql(user_ids))
+        return {str(r[0]): _risk_from_row(r[1:]) for r in rows}
     except Exception:
         return {}
 
@@ -401,6 +912,7 @@ _EMPTY_ADHERENCE = {
     "adherence_7d": None, "adherence_30d": None, "adherence_90d": None,
     "completed_7d": None, "total_7d": None,
 }
+_EMPTY_COMPLETIONS = {"total": 0, "first_completion": None, "last_completion": None, "recent": []}
 _EMPTY_STREAK = {"current_streak": None, "longest_streak": None, "last_completion": None}
 _EMPTY_RISK   = {
     "risk_level": None, "risk_score": None, "missed_count_3d": None,
@@ -409,64 +921,44 @@ _EMPTY_RISK   = {
 
 
 # ---------------------------------------------------------------------------
-# Public service functions
+# Result assembly — shared by the sync and async public functions
 # ---------------------------------------------------------------------------
 
-def get_user_summary(user_id: str) -> dict:
-    """
-    Full summary for a single user:
-      - profile (name, email)
-      - goals list with per-goal completion counts
-      - adherence %, streak, risk from Snowflake metrics tables
-      - recent check-ins
-
-    All data sourced exclusively from Snowflake.
-    """
-    profile  = _sf_profile(user_id)
-    goals    = _sf_goals(user_id)
-    goal_ids = [g["id"] for g in goals]
-
-    completions_by_goal = _sf_completions(goal_ids)
+def _goal_summary(g: dict, comps: dict) -> dict:
+    return {
+        "id":                 g["id"],
+        "title":              g["title"],
+        "description":        g["description"],
+        "frequency":          g["frequency"],
+        "total_completions":  comps["total"],
+        "completed_count":    comps["total"],  # every fact_goal_completions row = a completion
+        "recent_completions": comps["recent"],
+    }
 
-    goals_out = []
-    for g in goals:
-        comps = completions_by_goal.get(g["id"], [])
-        goals_out.append({
-            "id":                 g["id"],
-            "title":              g["title"],
-            "description":        g["description"],
-            "frequency":          g["frequency"],
-            "total_completions":  len(comps),
-            "completed_count":    len(comps),  # every fact_goal_completions row = a completion
-            "recent_completions": comps[:10],
-        })
 
+def _user_summary(user_id: str, sections: dict) -> dict:
+    profile             = sections["profile"]
+    completions_by_goal = sections["completions_by_goal"]
     return {
         "user_id":   user_id,
         "name":      profile.get("name", "Unknown"),
         "email":     profile.get("email"),
-        "goals":     goals_out,
-        "check_ins": _sf_check_ins(user_id),
-        "adherence": _sf_adherence(user_id),
-        "streak":    _sf_streak(user_id),
-        "risk":      _sf_risk(user_id),
+        "goals":     [
+            _goal_summary(g, completions_by_goal.get(g["id"], _EMPTY_COMPLETIONS))
+            for g in sections["goals"]
+        ],
+        "check_ins": sections["check_ins"],
+        "adherence": sections["adherence"],
+        "streak":    sections["streak"],
+        "risk":      sections["risk"],
     }
 
 
-def get_user_goals_detail(user_id: str) -> list[dict]:
-    """
-    Detailed per-goal breakdown with full completion history.
-    All data sourced exclusively from Snowflake.
-    """
-    goals    = _sf_goals(user_id)
-    goal_ids = [g["id"] for g in goals]
-
-    completions_by_goal = _sf_completions(goal_ids)
-
+def _goals_detail(goals: list[dict], completions_by_goal: dict[str, dict]) -> list[dict]:
     result = []
     for g in goals:
-        comps     = completions_by_goal.get(g["id"], [])
-        total     = len(comps)
+        comps     = completions_by_goal.get(g["id"], _EMPTY_COMPLETIONS)
+        total     = comps["total"]
         completed = total  # every row in fact_goal_completions is a completion event
 
         result.append({
@@ -478,139 +970,555 @@ def get_user_goals_detail(user_id: str) -> list[dict]:
             "completed_count":  completed,
             "missed_count":     0,  # not tracked at row level; use metrics_risk for missed counts
             "completion_rate":  100.0 if total else 0.0,
-            "checkin_history":  comps,
+            "first_completion": comps["first_completion"],
+            "last_completion":  comps["last_completion"],
+            "checkin_history":  comps["recent"],
         })
-
     return result
 
 
-def get_group_member_summaries(group_id: str) -> dict:
-    """
-    Group info + a summary for every member.
-
-    Uses batched Snowflake queries (one per data type) to avoid the
-    per-member N+1 problem that caused 30s timeouts on large groups.
-    """
-    group_info = _sf_group_info(group_id)
-    member_ids = _sf_group_member_ids(group_id)
-
-    if not member_ids:
-        return {
-            "group_id":     group_id,
-            "group_name":   group_info.get("name", "Unknown Group"),
-            "member_count": 0,
-            "members":      [],
-        }
-
-    # --- one query per data type, all members at once ---
-    profiles_by_user    = _sf_profiles_batch(member_ids)
-    goals_by_user       = _sf_goals_batch(member_ids)
-
-    all_goal_ids = [
-        g["id"]
-        for goals in goals_by_user.values()
-        for g in goals
-    ]
-    completions_by_goal  = _sf_completions_batch(all_goal_ids)
-    check_ins_by_user    = _sf_check_ins_batch(member_ids)
-    adherence_by_user    = _sf_adherence_batch(member_ids)
-    streak_by_user       = _sf_streak_batch(member_ids)
-    risk_by_user         = _sf_risk_batch(member_ids)
-
+def _member_summaries(
+    member_ids: list[str],
+    profiles_by_user: dict,
+    goals_by_user: dict,
+    completions_by_goal: dict,
+    check_ins_by_user: dict,
+    adherence_by_user: dict,
+    streak_by_user: dict,
+    risk_by_user: dict,
+) -> list[dict]:
     members = []
     for uid in member_ids:
-        profile  = profiles_by_user.get(uid, {})
-        goals    = goals_by_user.get(uid, [])
-
-        goals_out = []
-        for g in goals:
-            comps = completions_by_goal.get(g["id"], [])
-            goals_out.append({
-                "id":                 g["id"],
-                "title":              g["title"],
-                "description":        g["description"],
-                "frequency":          g["frequency"],
-                "total_completions":  len(comps),
-                "completed_count":    len(comps),
-                "recent_completions": comps[:10],
-            })
+        profile = profiles_by_user.get(uid, {})
+        goals   = goals_by_user.get(uid, [])
 
         members.append({
             "user_id":   uid,
             "name":      profile.get("name", "Unknown"),
             "email":     profile.get("email"),
-            "goals":     goals_out,
+            "goals":     [
+                _goal_summary(g, completions_by_goal.get(g["id"], _EMPTY_COMPLETIONS))
+                for g in goals
+            ],
             "check_ins": check_ins_by_user.get(uid, []),
             "adherence": adherence_by_user.get(uid, _EMPTY_ADHERENCE),
             "streak":    streak_by_user.get(uid, _EMPTY_STREAK),
             "risk":      risk_by_user.get(uid, _EMPTY_RISK),
         })
+    return members
 
+
+def _group_summary(group_id: str, group_info: dict, members: list[dict]) -> dict:
     return {
         "group_id":     group_id,
-        "group_name":   group_info.get("name", "Unknown Group"),
+        "group_name":   _group_name(group_info),
         "member_count": len(members),
         "members":      members,
     }
 
 
+def _group_name(group_info: dict) -> str:
+    return group_info.get("name", "Unknown Group")
+
+
+def _sf_member_summaries(member_ids: list[str], pool: ThreadPoolExecutor) -> list[dict]:
+    """
+    Summaries for *member_ids*: one batched query per data type, all
+    submitted to *pool* at once.
+    """
+    if not member_ids:
+        return []
+
+    profiles_f    = pool.submit(_sf_profiles_batch, member_ids)
+    goals_f       = pool.submit(_sf_goals_batch, member_ids)
+    completions_f = pool.submit(_sf_completions_batch, member_ids)
+    check_ins_f   = pool.submit(_sf_check_ins_batch, member_ids)
+    adherence_f   = pool.submit(_sf_adherence_batch, member_ids)
+    streak_f      = pool.submit(_sf_streak_batch, member_ids)
+    risk_f        = pool.submit(_sf_risk_batch, member_ids)
+
+    return _member_summaries(
+        member_ids,
+        profiles_f.result(),
+        goals_f.result(),
+        completions_f.result(),
+        check_ins_f.result(),
+        adherence_f.result(),
+        streak_f.result(),
+        risk_f.result(),
+    )
+
+
+async def _sf_member_summaries_async(member_ids: list[str]) -> list[dict]:
+    """Async variant of _sf_member_summaries (at most SNOWFLAKE_QUERY_CONCURRENCY at a time)."""
+    if not member_ids:
+        return []
+
+    goals_by_user, completions_by_goal, profiles, check_ins, adherence, streak, risk = (
+        await gather_limited(
+            _sf_goals_batch_async(member_ids),
+            _sf_completions_batch_async(member_ids),
+            _sf_profiles_batch_async(member_ids),
+            _sf_check_ins_batch_async(member_ids),
+            _sf_adherence_batch_async(member_ids),
+            _sf_streak_batch_async(member_ids),
+            _sf_risk_batch_async(member_ids),
+            limit=max(1, settings.SNOWFLAKE_QUERY_CONCURRENCY),
+        )
+    )
+    return _member_summaries(
+        member_ids, profiles, goals_by_user, completions_by_goal,
+        check_ins, adherence, streak, risk,
+    )
+
+
+def _group_pool() -> ThreadPoolExecutor:
+    # Capped per request so one large group can't monopolise the Snowflake
+    # connection pool; tasks keep the caller's QUERY_TAG
+    return ContextThreadPoolExecutor(
+        max_workers=max(1, settings.SNOWFLAKE_QUERY_CONCURRENCY),
+        thread_name_prefix="sf-group",
+    )
+
+
+# Ages are taken at the bound time bucket so the statement text stays
+# stable (and result-cacheable) within it; see app/utils/sql_templates.py
+_GROUP_SNAPSHOT_SQL = register("group_snapshot", """
+    SELECT summary, DATEDIFF(second, refreshed_at, %s::TIMESTAMP_LTZ)
+    FROM   group_summary_snapshot
+    WHERE  group_id = %s
+""")
+
+
+def _group_snapshot_from_row(row: tuple | None, as_of) -> dict | None:
+    """The stored summary document, or None if missing or older than the configured max age."""
+    if not row or row[0] is None or row[1] is None:
+        return None
+    if age_seconds(row[1], as_of) > settings.SNOWFLAKE_GROUP_SNAPSHOT_MAX_AGE_SECONDS:
+        return None
+    return json.loads(row[0]) if isinstance(row[0], str) else row[0]
+
+
+def _snapshots_enabled() -> bool:
+    # The replica doesn't carry snapshots, and local reads are cheap anyway
+    return settings.SNOWFLAKE_GROUP_SNAPSHOTS and not use_local_replica()
+
+
+def _sf_group_snapshot(group_id: str) -> dict | None:
+    """Precomputed summary from group_summary_snapshot (see worker/sync_tasks.py)."""
+    if not _snapshots_enabled():
+        return None
+    as_of = time_bucket()
+    try:
+        return _group_snapshot_from_row(_query_one(_GROUP_SNAPSHOT_SQL, (as_of, group_id)), as_of)
+    except Exception:
+        return None  # e.g. table not created yet — build live
+
+
+async def _sf_group_snapshot_async(group_id: str) -> dict | None:
+    if not _snapshots_enabled():
+        return None
+    as_of = time_bucket()
+    try:
+        return _group_snapshot_from_row(await _query_one_async(_GROUP_SNAPSHOT_SQL, (as_of, group_id)), as_of)
+    except Exception:
+        return None
+
+
+def _group_snapshots_batch_sql(group_ids: list[str], as_of) -> tuple[str, tuple]:
+    id_list, id_params = _id_list(group_ids)
+    return f"""
+        SELECT group_id, summary, DATEDIFF(second, refreshed_at, %s::TIMESTAMP_LTZ)
+        FROM   group_summary_snapshot
+        WHERE  group_id IN ({id_list})
+    """, (as_of, *id_params)
+
+
+def _group_snapshots_from_rows(rows: list[tuple], as_of) -> dict[str, dict]:
+    snapshots = {}
+    for r in rows:
+        doc = _group_snapshot_from_row(r[1:], as_of)
+        if doc is not None:
+            snapshots[str(r[0])] = doc
+    return snapshots
+
+
+def _sf_group_snapshots_batch(group_ids: list[str]) -> dict[str, dict]:
+    """Returns {group_id: summary} for the given groups that have a fresh snapshot."""
+    if not group_ids or not _snapshots_enabled():
+        return {}
+    as_of = time_bucket()
+    try:
+        return _group_snapshots_from_rows(_query(*_group_snapshots_batch_sql(group_ids, as_of)), as_of)
+    except Exception:
+        return {}
+
+
+async def _sf_group_snapshots_batch_async(group_ids: list[str]) -> dict[str, dict]:
+    if not group_ids or not _snapshots_enabled():
+        return {}
+    as_of = time_bucket()
+    try:
+        return _group_snapshots_from_rows(await _query_async(*_group_snapshots_batch_sql(group_ids, as_of)), as_of)
+    except Exception:
+        return {}
+
+
+def _unique(ids) -> list[str]:
+    """*ids* without duplicates, first occurrence order kept."""
+    return list(dict.fromkeys(ids))
+
+
+def _group_summaries(
+    group_ids: list[str],
+    info_by_group: dict,
+    member_ids_by_group: dict,
+    members_by_user: dict,
+) -> dict[str, dict]:
+    return {
+        gid: _group_summary(
+            gid,
+            info_by_group.get(gid, {}),
+            [members_by_user[uid] for uid in member_ids_by_group.get(gid, [])],
+        )
+        for gid in group_ids
+    }
+
+
+# ---------------------------------------------------------------------------
+# Group context text — a header, then one block per member, so the text can
+# be produced (and streamed) a chunk of members at a time
+# ---------------------------------------------------------------------------
+
+def _group_context_header(group_name: str, member_count: int) -> str:
+    return f"Group: {group_name} ({member_count} member{'s' if member_count != 1 else ''})\n"
+
+
+def _member_context_block(m: dict) -> str:
+    lines = ["", f"--- {m['name']} ---"]
+
+    if m["goals"]:
+        lines.append("Goals:")
+        for g in m["goals"]:
+            freq  = f" ({g['frequency']})" if g.get("frequency") else ""
+            comps = g["completed_count"]
+            total = g["total_completions"]
+            lines.append(f"  - {g['title']}{freq}: {comps}/{total} completions")
+    else:
+        lines.append("  No goals recorded.")
+
+    adh = m["adherence"]
+    if adh.get("adherence_7d") is not None:
+        lines.append(
+            f"Adherence: {adh['adherence_7d']}% (7d)  |  {adh['adherence_30d']}% (30d)"
+        )
+
+    streak = m["streak"]
+    if streak.get("current_streak") is not None:
+        lines.append(
+            f"Streak: {streak['current_streak']} day(s) current, "
+            f"{streak['longest_streak']} day(s) longest"
+        )
+
+    risk = m["risk"]
+    if risk.get("risk_level"):
+        lines.append(
+            f"Risk: {risk['risk_level']} (score {risk['risk_score']}, "
+            f"{risk['missed_count_7d']} missed last 7d)"
+        )
+
+    cis = m.get("check_ins", [])
+    if cis:
+        lines.append("Recent check-ins:")
+        for ci in cis[:5]:
+            mood = ci.get("mood", "")
+            ref  = ci.get("reflection", "") or ""
+            line = f"  [{ci.get('date')}] mood {mood}/5"
+            if ref:
+                line += f" — {ref}"
+            lines.append(line)
+
+    return "\n".join(lines) + "\n"
+
+
+def _format_group_context(data: dict) -> str:
+    """Render get_group_member_summaries output as prompt-ready plain text."""
+    return _group_context_header(data["group_name"], data["member_count"]) + "".join(
+        _member_context_block(m) for m in data["members"]
+    )
+
+
+# ---------------------------------------------------------------------------
+# Public service functions
+# ---------------------------------------------------------------------------
+
+@cached("user_summary")
+def get_user_summary(user_id: str) -> dict:
+    """
+    Full summary for a single user:
+      - profile (name, email)
+      - goals list with per-goal completion counts
+      - adherence %, streak, risk from Snowflake metrics tables
+      - recent check-ins
+
+    All data sourced exclusively from Snowflake, in a single round trip
+    when possible (see _USER_SUMMARY_SQL).
+    """
+    try:
+        sections = _sf_user_sections(user_id)
+    except Exception:
+        # e.g. a metrics table that hasn't been created yet — the per-section
+        # helpers degrade to empty metrics individually
+        sections = _sf_user_sections_sequential(user_id)
+    return _user_summary(user_id, sections)
+
+
+@cached("user_goals_detail")
+def get_user_goals_detail(user_id: str, history_limit: int = 30) -> list[dict]:
+    """
+    Detailed per-goal breakdown: completion count, first/last completion
+    date and the *history_limit* most recent completions, all aggregated in
+    Snowflake. Page through a goal's full history with
+    get_goal_completion_history.
+    All data sourced exclusively from Snowflake.
+    """
+    goals = _sf_goals(user_id)
+    completions_by_goal = (
+        _sf_completions_batch([user_id], recent_limit=history_limit) if goals else {}
+    )
+    return _goals_detail(goals, completions_by_goal)
+
+
+@cached("goal_completion_history")
+def get_goal_completion_history(
+    user_id: str, goal_id: str, limit: int = 50, offset: int = 0,
+) -> dict:
+    """
+    Paginated completion history for one of a user's goals, newest first.
+    Returns {goal_id, total, limit, offset, completions}.
+    """
+    return _sf_completion_history(user_id, goal_id, limit=limit, offset=offset)
+
+
+@cached("group_member_summaries")
+def get_group_member_summaries(group_id: str) -> dict:
+    """
+    Group info + a summary for every member.
+
+    Read as one row from group_summary_snapshot when the worker has
+    refreshed it within SNOWFLAKE_GROUP_SNAPSHOT_MAX_AGE_SECONDS; otherwise
+    built live by build_group_member_summaries.
+    """
+    snapshot = _sf_group_snapshot(group_id)
+    if snapshot is not None:
+        return snapshot
+    return build_group_member_summaries(group_id)
+
+
+def build_group_member_summaries(group_id: str) -> dict:
+    """
+    Build a group summary from the source tables (uncached).
+
+    Uses batched Snowflake queries (one per data type) to avoid the
+    per-member N+1 problem that caused 30s timeouts on large groups, and
+    issues the independent batches concurrently (at most
+    SNOWFLAKE_QUERY_CONCURRENCY at a time).
+    """
+    with _group_pool() as pool:
+        group_info_f = pool.submit(_sf_group_info, group_id)
+        member_ids   = pool.submit(_sf_group_member_ids, group_id).result()
+        members      = _sf_member_summaries(member_ids, pool)
+        return _group_summary(group_id, group_info_f.result(), members)
+
+
+def get_group_member_summaries_batch(group_ids: list[str]) -> dict[str, dict]:
+    """
+    get_group_member_summaries for several groups at once.
+    Returns {group_id: summary} in request order, each summary shaped
+    exactly like get_group_member_summaries.
+
+    Groups with a fresh snapshot are read in one query; the rest are built
+    together by build_group_member_summaries_batch.
+    """
+    group_ids = _unique(str(g) for g in group_ids)
+    summaries = _group_member_summaries_batch(sorted(group_ids))
+    return {g: summaries[g] for g in group_ids}
+
+
+@cached("group_member_summaries_batch")
+def _group_member_summaries_batch(group_ids: list[str]) -> dict[str, dict]:
+    """
+    get_group_member_summaries_batch for sorted, distinct *group_ids*, so
+    the cache key doesn't depend on request order or duplicates.
+    """
+    summaries = _sf_group_snapshots_batch(group_ids)
+    missing = [g for g in group_ids if g not in summaries]
+    if missing:
+        summaries.update(build_group_member_summaries_batch(missing))
+    return {g: summaries[g] for g in group_ids}
+
+
+def build_group_member_summaries_batch(group_ids: list[str]) -> dict[str, dict]:
+    """
+    Build several group summaries from the source tables (uncached) with
+    one set of batched queries, however many groups are asked for. A user
+    in more than one of the groups is fetched once.
+    """
+    if not group_ids:
+        return {}
+    with _group_pool() as pool:
+        info_f = pool.submit(_sf_group_info_batch, group_ids)
+        member_ids_by_group = pool.submit(_sf_group_member_ids_batch, group_ids).result()
+        member_ids = _unique(
+            uid for gid in group_ids for uid in member_ids_by_group.get(gid, [])
+        )
+        members = _sf_member_summaries(member_ids, pool)
+        return _group_summaries(
+            group_ids, info_f.result(), member_ids_by_group,
+            {m["user_id"]: m for m in members},
+        )
+
+
 def build_group_context_string(group_id: str) -> tuple[str, str]:
     """
     Plain-text context string for a group, ready to inject into a Gemini prompt.
     Returns (context_string, group_name).
+
+    Served from the result cache via get_group_member_summaries; only the
+    string formatting runs on a cache hit.
     """
-    data       = get_group_member_summaries(group_id)
-    group_name = data["group_name"]
-
-    lines = [
-        f"Group: {group_name} ({data['member_count']} member{'s' if data['member_count'] != 1 else ''})",
-        "",
-    ]
-
-    for m in data["members"]:
-        lines.append(f"--- {m['name']} ---")
-
-        if m["goals"]:
-            lines.append("Goals:")
-            for g in m["goals"]:
-                freq  = f" ({g['frequency']})" if g.get("frequency") else ""
-                comps = g["completed_count"]
-                total = g["total_completions"]
-                lines.append(f"  - {g['title']}{freq}: {comps}/{total} completions")
-        else:
-            lines.append("  No goals recorded.")
-
-        adh = m["adherence"]
-        if adh.get("adherence_7d") is not None:
-            lines.append(
-                f"Adherence: {adh['adherence_7d']}% (7d)  |  {adh['adherence_30d']}% (30d)"
-            )
+    data = get_group_member_summaries(group_id)
+    return _format_group_context(data), data["group_name"]
 
-        streak = m["streak"]
-        if streak.get("current_streak") is not None:
-            lines.append(
-                f"Streak: {streak['current_streak']} day(s) current, "
-                f"{streak['longest_streak']} day(s) longest"
-            )
 
-        risk = m["risk"]
-        if risk.get("risk_level"):
-            lines.append(
-                f"Risk: {risk['risk_level']} (score {risk['risk_score']}, "
-                f"{risk['missed_count_7d']} missed last 7d)"
-            )
+def iter_group_context(group_id: str, chunk_size: int | None = None) -> Iterator[str]:
+    """
+    Same text as build_group_context_string, produced incrementally: the
+    header first, then member blocks as each chunk of *chunk_size* members
+    (default SNOWFLAKE_CONTEXT_CHUNK_SIZE) is fetched.
+
+    Time to first chunk and memory use depend on the chunk size, not the
+    group size. A fresh group_summary_snapshot row is formatted directly.
+    Not cached — callers that want the cached text should use
+    build_group_context_string.
+    """
+    snapshot = _sf_group_snapshot(group_id)
+    if snapshot is not None:
+        yield _format_group_context(snapshot)
+        return
+
+    chunk_size = max(1, chunk_size or settings.SNOWFLAKE_CONTEXT_CHUNK_SIZE)
+    with _group_pool() as pool:
+        group_info_f = pool.submit(_sf_group_info, group_id)
+        member_ids   = pool.submit(_sf_group_member_ids, group_id).result()
+        yield _group_context_header(_group_name(group_info_f.result()), len(member_ids))
 
-        cis = m.get("check_ins", [])
-        if cis:
-            lines.append("Recent check-ins:")
-            for ci in cis[:5]:
-                mood = ci.get("mood", "")
-                ref  = ci.get("reflection", "") or ""
-                line = f"  [{ci.get('date')}] mood {mood}/5"
-                if ref:
-                    line += f" — {ref}"
-                lines.append(line)
+        for start in range(0, len(member_ids), chunk_size):
+            for m in _sf_member_summaries(member_ids[start:start + chunk_size], pool):
+                yield _member_context_block(m)
+
+
+# ---------------------------------------------------------------------------
+# Async public functions — same results and cache entries as the sync ones,
+# for ``async def`` handlers. Queries are submitted with execute_async and
+# awaited without holding a threadpool worker (app/utils/snowflake_async.py).
+# ---------------------------------------------------------------------------
+
+@cached("user_summary")
+async def get_user_summary_async(user_id: str) -> dict:
+    """Async variant of get_user_summary."""
+    try:
+        sections = await _sf_user_sections_async(user_id)
+    except Exception:
+        sections = await asyncio.to_thread(_sf_user_sections_sequential, user_id)
+    return _user_summary(user_id, sections)
+
+
+@cached("user_goals_detail")
+async def get_user_goals_detail_async(user_id: str, history_limit: int = 30) -> list[dict]:
+    """Async variant of get_user_goals_detail."""
+    goals = await _sf_goals_async(user_id)
+    completions_by_goal = (
+        await _sf_completions_batch_async([user_id], recent_limit=history_limit) if goals else {}
+    )
+    return _goals_detail(goals, completions_by_goal)
+
+
+@cached("goal_completion_history")
+async def get_goal_completion_history_async(
+    user_id: str, goal_id: str, limit: int = 50, offset: int = 0,
+) -> dict:
+    """Async variant of get_goal_completion_history."""
+    return await _sf_completion_history_async(user_id, goal_id, limit=limit, offset=offset)
+
+
+@cached("group_member_summaries")
+async def get_group_member_summaries_async(group_id: str) -> dict:
+    """Async variant of get_group_member_summaries (same concurrency cap)."""
+    snapshot = await _sf_group_snapshot_async(group_id)
+    if snapshot is not None:
+        return snapshot
+    group_info, member_ids = await asyncio.gather(
+        _sf_group_info_async(group_id),
+        _sf_group_member_ids_async(group_id),
+    )
+    return _group_summary(group_id, group_info, await _sf_member_summaries_async(member_ids))
 
-        lines.append("")
 
-    return "\n".join(lines), group_name
+async def get_group_member_summaries_batch_async(group_ids: list[str]) -> dict[str, dict]:
+    """Async variant of get_group_member_summaries_batch."""
+    group_ids = _unique(str(g) for g in group_ids)
+    summaries = await _group_member_summaries_batch_async(sorted(group_ids))
+    return {g: summaries[g] for g in group_ids}
+
+
+@cached("group_member_summaries_batch")
+async def _group_member_summaries_batch_async(group_ids: list[str]) -> dict[str, dict]:
+    """Async variant of _group_member_summaries_batch."""
+    summaries = await _sf_group_snapshots_batch_async(group_ids)
+    missing = [g for g in group_ids if g not in summaries]
+    if missing:
+        summaries.update(await build_group_member_summaries_batch_async(missing))
+    return {g: summaries[g] for g in group_ids}
+
+
+async def build_group_member_summaries_batch_async(group_ids: list[str]) -> dict[str, dict]:
+    """Async variant of build_group_member_summaries_batch."""
+    if not group_ids:
+        return {}
+    info_by_group, member_ids_by_group = await asyncio.gather(
+        _sf_group_info_batch_async(group_ids),
+        _sf_group_member_ids_batch_async(group_ids),
+    )
+    member_ids = _unique(uid for gid in group_ids for uid in member_ids_by_group.get(gid, []))
+    members = await _sf_member_summaries_async(member_ids)
+    return _group_summaries(
+        group_ids, info_by_group, member_ids_by_group, {m["user_id"]: m for m in members},
+    )
+
+
+async def build_group_context_string_async(group_id: str) -> tuple[str, str]:
+    """Async variant of build_group_context_string."""
+    data = await get_group_member_summaries_async(group_id)
+    return _format_group_context(data), data["group_name"]
+
+
+async def iter_group_context_async(
+    group_id: str, chunk_size: int | None = None,
+) -> AsyncIterator[str]:
+    """Async variant of iter_group_context."""
+    snapshot = await _sf_group_snapshot_async(group_id)
+    if snapshot is not None:
+        yield _format_group_context(snapshot)
+        return
+
+    chunk_size = max(1, chunk_size or settings.SNOWFLAKE_CONTEXT_CHUNK_SIZE)
+    group_info, member_ids = await asyncio.gather(
+        _sf_group_info_async(group_id),
+        _sf_group_member_ids_async(group_id),
+    )
+    yield _group_context_header(_group_name(group_info), len(member_ids))
+
+    for start in range(0, len(member_ids), chunk_size):
+        for m in await _sf_member_summaries_async(member_ids[start:start + chunk_size]):
+            yield _member_context_block(m)
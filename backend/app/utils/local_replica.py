@@ -0,0 +1,342 @@
+"""
+Optional local DuckDB replica of the Snowflake analytics tables.
+
+For small deployments, offline work and CI, snowflake_service can read from
+an embedded columnar copy instead of paying warehouse latency on every
+request (ANALYTICS_READ_BACKEND=duckdb).
+
+The replica is fed by the Celery worker:
+  - sync_postgres_to_snowflake upserts every synced batch (same rows, same
+    primary keys as the Snowflake MERGE) before advancing the watermark
+  - the metrics tasks copy the latest metrics_* rows out of Snowflake
+
+The worker writes to a private working file (<DUCKDB_REPLICA_PATH>.work)
+and publishes it by copying it over DUCKDB_REPLICA_PATH with an atomic
+rename. API processes hold a read-only connection to the published file and
+reopen it when a newer copy appears, so readers never block the writer and
+never see a half-applied batch.
+
+Needs: pip install duckdb
+
+Usage:
+    from app.utils.local_replica import use_local_replica, get_replica_reader
+
+    if use_local_replica():
+        rows = get_replica_reader().query("SELECT ... WHERE id = %s", (user_id,))
+"""
+
+import functools
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from typing import Any, Optional, Union
+
+from app.config import settings
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+# Metrics tables copied from Snowflake after each metrics run (latest row per
+# user only — that's all the read path looks at)
+REPLICA_METRICS_TABLES = {
+    "metrics_adherence": """
+        SELECT * FROM metrics_adherence
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY metric_date DESC) = 1
+    """,
+    "metrics_streak": "SELECT * FROM metrics_streak",
+    "metrics_risk":   "SELECT * FROM metrics_risk",
+}
+
+# How long the worker waits for another worker process to release the
+# working file before giving up on this run. A sync run holds it for up to
+# its drain budget (drain.max_seconds in worker/sync_config.yaml, 90s by
+# default) plus its last batch and the publish copy.
+_WRITE_LOCK_TIMEOUT = 180.0
+
+# Snowflake result type names (snowflake.connector.constants.FIELD_ID_TO_NAME)
+# -> DuckDB column types; anything unlisted is stored as VARCHAR
+_SNOWFLAKE_TO_DUCKDB = {
+    "REAL":          "DOUBLE",
+    "TEXT":          "VARCHAR",
+    "DATE":          "DATE",
+    "TIMESTAMP":     "TIMESTAMP",
+    "TIMESTAMP_NTZ": "TIMESTAMP",
+    "TIMESTAMP_LTZ": "TIMESTAMPTZ",
+    "TIMESTAMP_TZ":  "TIMESTAMPTZ",
+    "BOOLEAN":       "BOOLEAN",
+}
+
+# Column types the sync declares for its targets (worker/sync_config.yaml)
+# -> DuckDB column types; NUMBER is handled by scale in _sync_duckdb_type
+_SYNC_TO_DUCKDB = {
+    "TIMESTAMP_NTZ": "TIMESTAMP",
+    "DATE":          "DATE",
+    "FLOAT":         "DOUBLE",
+    "BOOLEAN":       "BOOLEAN",
+    "VARIANT":       "JSON",
+}
+
+
+def replica_configured() -> bool:
+    """True when DUCKDB_REPLICA_PATH is set and duckdb is installed."""
+    return bool(settings.DUCKDB_REPLICA_PATH) and duckdb is not None
+
+
+def use_local_replica() -> bool:
+    """True when snowflake_service should read from the local replica."""
+    if settings.ANALYTICS_READ_BACKEND != "duckdb":
+        return False
+    if not replica_configured():
+        _warn_unavailable()
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=1)
+def _warn_unavailable() -> None:
+    logger.warning(
+        "[replica] ANALYTICS_READ_BACKEND=duckdb but %s — reading from Snowflake",
+        "duckdb is not installed" if duckdb is None else "DUCKDB_REPLICA_PATH is not set",
+    )
+
+
+_NAMED_PARAM_RE = re.compile(r"%\((\w+)\)s")
+
+
+@functools.lru_cache(maxsize=256)
+def to_duckdb_sql(sql: str) -> str:
+    """Translate the connector's pyformat binds (%s, %(name)s) to DuckDB's (?, $name)."""
+    return _NAMED_PARAM_RE.sub(r"$\1", sql).replace("%s", "?")
+
+
+# ---------------------------------------------------------------------------
+# Read side (API processes)
+# ---------------------------------------------------------------------------
+
+class ReplicaReader:
+    """Read-only access to the published replica, reopened when it is republished."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stamp: Optional[tuple] = None
+
+    def _connection(self):
+        st = os.stat(self.path)  # FileNotFoundError until the worker first publishes
+        stamp = (st.st_ino, st.st_mtime_ns)
+        with self._lock:
+            if self._conn is None or stamp != self._stamp:
+                # The previous connection is left to the garbage collector so
+                # cursors still reading from it in other threads can finish
+                self._conn = duckdb.connect(self.path, read_only=True)
+                self._stamp = stamp
+            return self._conn
+
+    def query(self, sql: str, params: tuple | dict = ()) -> list[tuple]:
+        """Run a read-only query written for Snowflake's pyformat binds."""
+        cur = self._connection().cursor()
+        try:
+            cur.execute(to_duckdb_sql(sql), params or None)
+            return cur.fetchall()
+        finally:
+            cur.close()
+
+
+@functools.lru_cache(maxsize=1)
+def get_replica_reader() -> ReplicaReader:
+    """Return the process-wide replica reader."""
+    return ReplicaReader(settings.DUCKDB_REPLICA_PATH)
+
+
+# ---------------------------------------------------------------------------
+# Write side (Celery worker)
+# ---------------------------------------------------------------------------
+
+class ReplicaWriter:
+    """
+    Applies worker writes to the working copy; publish() makes them visible.
+
+    The working file is opened on first write and held until publish() or
+    close(). DuckDB allows one writing process per file, so a second worker
+    process waits up to _WRITE_LOCK_TIMEOUT for it. Within a process, writes
+    from concurrent sync threads are serialized.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.work_path = f"{path}.work"
+        self._conn = None
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def _connection(self):
+        if self._conn is None:
+            deadline = time.monotonic() + _WRITE_LOCK_TIMEOUT
+            while True:
+                try:
+                    self._conn = duckdb.connect(self.work_path)
+                    break
+                except duckdb.IOException:
+                    if time.monotonic() >= deadline:
+                        raise
+                    time.sleep(0.5)
+        return self._conn
+
+    def upsert(
+        self, table: str, rows: list[dict[str, Any]], pk: Union[str, list[str]],
+        column_types: Optional[dict[str, str]] = None,
+    ) -> None:
+        """
+        INSERT OR REPLACE already-serialized sync rows into *table*, creating
+        it or adding new columns as needed. *column_types* are the Snowflake
+        types the sync gave the target's columns (worker.sync_utils.column_types_for);
+        columns get the matching DuckDB type, VARCHAR when absent. Values are
+        bound as text and cast by DuckDB on insert. *pk* is a column or, for a
+        composite key, a list of them.
+        """
+        if not rows:
+            return
+        column_types = column_types or {}
+        with self._lock:
+            conn = self._connection()
+            columns = list(rows[0].keys())
+            key = pk if isinstance(pk, str) else ", ".join(pk)
+            col_defs = ", ".join(f"{c} {_sync_duckdb_type(column_types.get(c))}" for c in columns)
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({col_defs}, PRIMARY KEY ({key}))")
+            existing = {
+                r[0] for r in conn.execute(
+                    "SELECT column_name FROM information_schema.columns WHERE table_name = ?", [table],
+                ).fetchall()
+            }
+            for c in columns:
+                if c not in existing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {c} {_sync_duckdb_type(column_types.get(c))}")
+
+            placeholders = ", ".join(["?"] * len(columns))
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                [tuple(_as_text(row.get(c)) for c in columns) for row in rows],
+            )
+            self._dirty = True
+
+    def replace_table(self, table: str, columns: list[tuple[str, str]], rows: list[tuple]) -> None:
+        """Replace *table* wholesale with *rows*; *columns* is [(name, duckdb_type), ...]."""
+        with self._lock:
+            conn = self._connection()
+            col_defs = ", ".join(f"{name} {type_}" for name, type_ in columns)
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                conn.execute(f"CREATE OR REPLACE TABLE {table} ({col_defs})")
+                if rows:
+                    placeholders = ", ".join(["?"] * len(columns))
+                    conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._dirty = True
+
+    def copy_from_snowflake(self, sf_cursor, table: str, sql: str) -> int:
+        """Replace *table* with the result of *sql* run on *sf_cursor*. Returns the row count."""
+        sf_cursor.execute(sql)
+        rows = sf_cursor.fetchall()
+        columns = [(d.name.lower(), _duckdb_type(d)) for d in sf_cursor.description]
+        self.replace_table(table, columns, rows)
+        return len(rows)
+
+    def publish(self) -> None:
+        """Checkpoint the working copy and atomically swap it in for readers."""
+        with self._lock:
+            if self._conn is None:
+                return
+            if self._dirty:
+                self._conn.execute("CHECKPOINT")
+            self._conn.close()
+            self._conn = None
+            if self._dirty:
+                tmp_path = f"{self.path}.tmp"
+                shutil.copyfile(self.work_path, tmp_path)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+                logger.info("[replica] Published %s", self.path)
+
+    def close(self) -> None:
+        """Release the working file without publishing (changes are kept for the next publish)."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def _as_text(val: Any) -> Optional[str]:
+    """Render a serialized sync value the way Snowflake stores it in a VARCHAR column."""
+    if val is None:
+        return None
+    if isinstance(val, bool):
+        return "true" if val else "false"
+    return str(val)
+
+
+def _sync_duckdb_type(sf_type: Optional[str]) -> str:
+    """DuckDB column type for a synced column declared as Snowflake *sf_type*."""
+    if not sf_type:
+        return "VARCHAR"
+    base, _, args = sf_type.upper().partition("(")
+    base = base.strip()
+    if base == "NUMBER":
+        scale = args.rstrip(")").split(",")[1].strip() if "," in args else "0"
+        return "BIGINT" if scale == "0" else "DOUBLE"
+    return _SYNC_TO_DUCKDB.get(base, "VARCHAR")
+
+
+def _duckdb_type(desc) -> str:
+    from snowflake.connector.constants import FIELD_ID_TO_NAME
+
+    name = FIELD_ID_TO_NAME.get(desc.type_code, "TEXT")
+    if name == "FIXED":
+        return "BIGINT" if not desc.scale else "DOUBLE"
+    return _SNOWFLAKE_TO_DUCKDB.get(name, "VARCHAR")
+
+
+def get_replica_writer() -> ReplicaWriter:
+    """Return a writer for the configured replica (one per task run)."""
+    return ReplicaWriter(settings.DUCKDB_REPLICA_PATH)
+
+
+def mirror_metrics_tables(sf_cursor, tables: tuple[str, ...]) -> bool:
+    """
+    Copy the given metrics tables from Snowflake into the replica and
+    publish. Best effort: the copy is a full refresh, so a failed run is
+    repaired by the next one.
+
+    Returns False if the working copy stayed locked by another worker
+    process for _WRITE_LOCK_TIMEOUT, so the caller can try again later
+    instead of leaving the replica stale until the next metrics run.
+    """
+    if not replica_configured():
+        return True
+    writer = get_replica_writer()
+    try:
+        for table in tables:
+            try:
+                n = writer.copy_from_snowflake(sf_cursor, table, REPLICA_METRICS_TABLES[table])
+                logger.info("[replica] Copied %d rows of %s", n, table)
+            except duckdb.IOException as e:
+                logger.warning("[replica] Working copy still locked, %s not copied: %s", table, e)
+                return False
+            except Exception as e:  # noqa: BLE001
+                logger.warning("[replica] Could not copy %s: %s", table, e)
+        writer.publish()
+    except Exception as e:  # noqa: BLE001
+        logger.warning("[replica] Could not publish metrics: %s", e)
+    finally:
+        writer.close()
+    return True
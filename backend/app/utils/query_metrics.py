@@ -0,0 +1,287 @@
+"""
+Instrumentation for every Snowflake statement this process issues.
+
+get_snowflake_connection() returns an InstrumentedConnection whose cursors
+send the current QUERY_TAG with each statement (app/utils/query_tags.py)
+and, with SNOWFLAKE_QUERY_METRICS on, time each execute() and record:
+  - the Snowflake query id (sfqid)
+  - a SQL fingerprint (literals and binds stripped, whitespace collapsed)
+  - elapsed time, rows returned/affected and result bytes downloaded
+  - the calling function (first app/worker frame outside the query helpers)
+
+Each record is logged as a structured line (DEBUG, or WARNING above
+SNOWFLAKE_SLOW_QUERY_MS) and folded into per-fingerprint latency
+histograms plus a rolling window used for the "top slow queries" report
+(GET /snowflake/queries/stats and /snowflake/queries/slow). Stats are
+per process, so worker queries show up in the worker's logs rather than
+the API's report.
+
+Usage:
+    from app.utils.query_metrics import get_query_stats
+
+    get_query_stats().slowest(10)
+"""
+
+import functools
+import hashlib
+import logging
+import re
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Optional
+
+from snowflake.connector.connection import SnowflakeConnection
+from snowflake.connector.cursor import SnowflakeCursor
+
+from app.config import settings
+from app.utils.query_tags import current_query_tag
+
+logger = logging.getLogger(__name__)
+
+# Latency histogram bucket upper bounds, in milliseconds
+_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, float("inf"))
+
+# Frames that are plumbing, not the caller we want to attribute a query to
+_SKIP_MODULES = {"app.database", "app.utils.query_metrics", "app.utils.snowflake_async"}
+_SKIP_FUNCTIONS = {
+    "_query", "_query_one", "_query_grouped",
+    "_query_async", "_query_one_async", "_query_grouped_async",
+}
+_CALLER_PREFIXES = ("app.", "worker.", "scripts.")
+
+
+# ---------------------------------------------------------------------------
+# SQL fingerprinting
+# ---------------------------------------------------------------------------
+
+_STRING_RE  = re.compile(r"'(?:[^']|'')*'")
+_BIND_RE    = re.compile(r"%\(\w+\)s|%s|\?|:\d+\b")
+_NUMBER_RE  = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\b(IN)\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_SPACE_RE   = re.compile(r"\s+")
+
+# Per-call temp tables holding large id lists (snowflake_service._IdTable)
+_ID_TABLE_RE = re.compile(r"\btmp_ids_[0-9a-f]{32}\b")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Collapse *sql* to its shape: literals and bind markers become ``?``,
+    IN-lists of any length become ``(?...)``, per-call id temp tables become
+    ``tmp_ids_?`` and whitespace is squeezed, so the same statement with
+    different values normalizes identically.
+    """
+    text = _STRING_RE.sub("?", sql)
+    text = _BIND_RE.sub("?", text)
+    text = _NUMBER_RE.sub("?", text)
+    text = _IN_LIST_RE.sub(r"\1 (?...)", text)
+    text = _ID_TABLE_RE.sub("tmp_ids_?", text)
+    return _SPACE_RE.sub(" ", text).strip().rstrip(";").strip()
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql: str) -> tuple[str, str]:
+    """Return (fingerprint, normalized_sql) for *sql*."""
+    normalized = normalize_sql(sql)
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16], normalized
+
+
+def caller_name(depth: int = 2) -> str:
+    """``module.function`` of the first application frame above the query helpers."""
+    frame = sys._getframe(depth)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if (
+            (module.startswith(_CALLER_PREFIXES) or module in ("__main__", "mcp_server"))
+            and module not in _SKIP_MODULES
+            and frame.f_code.co_name not in _SKIP_FUNCTIONS
+        ):
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+# ---------------------------------------------------------------------------
+# Stats
+# ---------------------------------------------------------------------------
+
+class QueryStats:
+    """Thread-safe per-fingerprint histograms plus a rolling window of recent queries."""
+
+    def __init__(self, window: int):
+        self._lock = threading.Lock()
+        self._by_fingerprint: dict[str, dict] = {}
+        self._recent: deque = deque(maxlen=window)
+
+    def record(self, entry: dict) -> None:
+        elapsed = entry["elapsed_ms"]
+        with self._lock:
+            agg = self._by_fingerprint.get(entry["fingerprint"])
+            if agg is None:
+                agg = self._by_fingerprint[entry["fingerprint"]] = {
+                    "fingerprint": entry["fingerprint"],
+                    "sql":         entry["sql"],
+                    "count":       0,
+                    "errors":      0,
+                    "total_ms":    0.0,
+                    "max_ms":      0.0,
+                    "rows":        0,
+                    "bytes":       0,
+                    "callers":     set(),
+                    "buckets":     [0] * len(_BUCKETS_MS),
+                }
+            agg["count"] += 1
+            agg["errors"] += entry["error"] is not None
+            agg["total_ms"] += elapsed
+            agg["max_ms"] = max(agg["max_ms"], elapsed)
+            agg["rows"] += entry["rows"] or 0
+            agg["bytes"] += entry["bytes"] or 0
+            if len(agg["callers"]) < 20:
+                agg["callers"].add(entry["caller"])
+            for i, bound in enumerate(_BUCKETS_MS):
+                if elapsed <= bound:
+                    agg["buckets"][i] += 1
+                    break
+            self._recent.append(entry)
+
+    def slowest(self, limit: int = 20) -> list[dict]:
+        """The *limit* slowest queries in the rolling window, slowest first."""
+        with self._lock:
+            recent = list(self._recent)
+        return sorted(recent, key=lambda e: e["elapsed_ms"], reverse=True)[:limit]
+
+    def summary(self) -> list[dict]:
+        """Per-fingerprint totals and cumulative latency histograms, by total time."""
+        with self._lock:
+            aggs = [dict(a, callers=sorted(a["callers"]), buckets=list(a["buckets"]))
+                    for a in self._by_fingerprint.values()]
+        out = []
+        for a in aggs:
+            cumulative, running = [], 0
+            for bound, n in zip(_BUCKETS_MS, a["buckets"]):
+                running += n
+                cumulative.append({"le_ms": "+Inf" if bound == float("inf") else bound, "count": running})
+            out.append({
+                **a,
+                "total_ms": round(a["total_ms"], 1),
+                "max_ms":   round(a["max_ms"], 1),
+                "avg_ms":   round(a["total_ms"] / a["count"], 1) if a["count"] else 0.0,
+                "buckets":  cumulative,
+            })
+        return sorted(out, key=lambda a: a["total_ms"], reverse=True)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._by_fingerprint.clear()
+            self._recent.clear()
+
+
+@functools.lru_cache(maxsize=1)
+def get_query_stats() -> QueryStats:
+    """Return the process-wide query stats."""
+    return QueryStats(window=settings.SNOWFLAKE_QUERY_LOG_WINDOW)
+
+
+def record_query(
+    sql: str,
+    elapsed: float,
+    *,
+    sfqid: Optional[str] = None,
+    rows: Optional[int] = None,
+    nbytes: Optional[int] = None,
+    caller: Optional[str] = None,
+    error: Optional[BaseException] = None,
+) -> None:
+    """Log one finished statement and add it to the stats. *elapsed* is in seconds."""
+    fp, normalized = fingerprint(sql)
+    entry = {
+        "sfqid":       sfqid,
+        "fingerprint": fp,
+        "sql":         normalized[:500],
+        "elapsed_ms":  round(elapsed * 1000, 1),
+        "rows":        rows,
+        "bytes":       nbytes,
+        "caller":      caller or "unknown",
+        "error":       type(error).__name__ if error is not None else None,
+        "at":          time.time(),
+    }
+    get_query_stats().record(entry)
+
+    slow = entry["elapsed_ms"] >= settings.SNOWFLAKE_SLOW_QUERY_MS
+    level = logging.WARNING if slow or error is not None else logging.DEBUG
+    if logger.isEnabledFor(level):
+        logger.log(
+            level,
+            "[query] %s fp=%s sfqid=%s elapsed_ms=%.1f rows=%s bytes=%s caller=%s%s",
+            "slow" if slow else "ok" if error is None else "error",
+            fp, sfqid, entry["elapsed_ms"], rows, nbytes, entry["caller"],
+            f" error={entry['error']}" if error is not None else "",
+            extra={"snowflake_query": entry},
+        )
+
+
+def _result_bytes(cursor: SnowflakeCursor) -> Optional[int]:
+    """Uncompressed size of the downloaded result chunks (None when only inline data came back)."""
+    try:
+        batches = cursor.get_result_batches() or []
+    except Exception:  # noqa: BLE001
+        return None
+    sizes = [b.uncompressed_size for b in batches if b.uncompressed_size is not None]
+    return sum(sizes) if sizes else None
+
+
+# ---------------------------------------------------------------------------
+# Connector hooks
+# ---------------------------------------------------------------------------
+
+class InstrumentedCursor(SnowflakeCursor):
+    """SnowflakeCursor that tags and records every statement it executes."""
+
+    _instrument = True
+
+    def execute(self, command: str, params: Any = None, *args: Any, **kwargs: Any):
+        if self._instrument and not kwargs.get("_is_internal"):
+            tag = current_query_tag()
+            if tag is not None:
+                kwargs["_statement_params"] = {"QUERY_TAG": tag, **(kwargs.get("_statement_params") or {})}
+
+        # Async submissions are recorded when their results arrive
+        # (see app/utils/snowflake_async.py)
+        if (
+            not self._instrument
+            or not settings.SNOWFLAKE_QUERY_METRICS
+            or kwargs.get("_exec_async")
+            or kwargs.get("_is_internal")
+        ):
+            return super().execute(command, params, *args, **kwargs)
+
+        caller = caller_name()
+        t0 = time.perf_counter()
+        try:
+            result = super().execute(command, params, *args, **kwargs)
+        except BaseException as exc:
+            record_query(command, time.perf_counter() - t0,
+                         sfqid=self.sfqid, caller=caller, error=exc)
+            raise
+        record_query(
+            command, time.perf_counter() - t0,
+            sfqid=self.sfqid,
+            rows=self.rowcount,
+            nbytes=_result_bytes(self),
+            caller=caller,
+        )
+        return result
+
+    def get_results_from_sfqid(self, sfqid: str) -> None:
+        super().get_results_from_sfqid(sfqid)
+        # The RESULT_SCAN behind this is bookkeeping, not a query of ours
+        self._inner_cursor._instrument = False
+
+
+class InstrumentedConnection(SnowflakeConnection):
+    """SnowflakeConnection whose cursors are InstrumentedCursors by default."""
+
+    def cursor(self, cursor_class: type[SnowflakeCursor] = InstrumentedCursor) -> SnowflakeCursor:
+        return super().cursor(cursor_class)
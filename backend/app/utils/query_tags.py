@@ -0,0 +1,191 @@
+"""
+Snowflake QUERY_TAG attribution.
+
+Every statement issued through get_snowflake_connection() carries a JSON
+QUERY_TAG describing who asked for it, sent as a statement parameter (no
+extra ALTER SESSION round trip). Pooled sessions are shared, so the tag
+lives in a context variable rather than on the session:
+
+  - API requests:  {"app": "flock", "route": "GET /snowflake/group/{group_id}/members",
+                    "scope": "group:<id>"}            (set by tag_request, app/main.py)
+  - Celery tasks:  {"app": "flock", "task": "worker.sync_tasks.compute_risk_metrics"}
+                                                      (set by worker/celery_app.py)
+  - narrower work adds fields with ``with query_tag(...)`` (e.g. the sync
+    task's table, a Gemini tool call)
+
+credit_report() aggregates INFORMATION_SCHEMA.QUERY_HISTORY_BY_USER by tag
+into elapsed time, bytes scanned and estimated credits
+(GET /snowflake/queries/credits, scripts/query_credit_report.py).
+
+Usage:
+    from app.utils.query_tags import query_tag
+
+    with query_tag(table="check_ins"):
+        cursor.execute(...)
+"""
+
+import contextvars
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Mapping, Optional
+
+from fastapi import Request
+
+from app.database import get_snowflake_pool
+
+_APP = "flock"
+
+# Snowflake rejects tags longer than this
+_MAX_TAG_LENGTH = 2000
+
+_current_tag: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar(
+    "snowflake_query_tag", default=None,
+)
+
+# Path / argument names that identify whose data a request touches, most specific first
+_SCOPE_KEYS = (("group_id", "group"), ("user_id", "user"), ("patient_id", "user"), ("mentor_id", "mentor"))
+
+
+def set_query_tag(fields: Optional[dict]) -> None:
+    """Replace the tag for the current context (None clears it)."""
+    _current_tag.set(dict(fields) if fields else None)
+
+
+@contextmanager
+def query_tag(**fields):
+    """Add *fields* to the tag for statements issued inside the block (None values are skipped)."""
+    fields = {k: v for k, v in fields.items() if v is not None}
+    token = _current_tag.set({**(_current_tag.get() or {}), **fields})
+    try:
+        yield
+    finally:
+        _current_tag.reset(token)
+
+
+def current_query_tag() -> Optional[str]:
+    """The QUERY_TAG string for the current context, or None when untagged."""
+    fields = _current_tag.get()
+    if not fields:
+        return None
+    tag = json.dumps({"app": _APP, **fields}, separators=(",", ":"), default=str)
+    return tag[:_MAX_TAG_LENGTH]
+
+
+def scope_from(params: Mapping) -> Optional[str]:
+    """``group:<id>`` / ``user:<id>`` / ``mentor:<id>`` from request or tool arguments."""
+    for key, kind in _SCOPE_KEYS:
+        if params.get(key):
+            return f"{kind}:{params[key]}"
+    return None
+
+
+async def tag_request(request: Request) -> None:
+    """
+    App-wide dependency: tag Snowflake statements with the matched route
+    template and the user/group scope from its path parameters.
+
+    Async on purpose — a sync dependency runs in a worker thread and its
+    context changes would not reach the endpoint.
+    """
+    route = request.scope.get("route")
+    fields = {"route": f"{request.method} {getattr(route, 'path', request.url.path)}"}
+    scope = scope_from(request.path_params)
+    if scope:
+        fields["scope"] = scope
+    set_query_tag(fields)
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor that runs each task in a copy of the submitter's context (and so its tag)."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+# ---------------------------------------------------------------------------
+# Credit attribution report
+# ---------------------------------------------------------------------------
+
+# Standard warehouse credits per hour by size
+_CREDITS_PER_HOUR = {
+    "X-Small": 1, "Small": 2, "Medium": 4, "Large": 8, "X-Large": 16,
+    "2X-Large": 32, "3X-Large": 64, "4X-Large": 128, "5X-Large": 256, "6X-Large": 512,
+}
+
+_REPORT_KEYS = {
+    "feature": "COALESCE(tag:route::STRING, tag:task::STRING, '(untagged)')"
+               " || COALESCE(' / ' || tag:tool::STRING, '')",
+    "scope":   "COALESCE(tag:scope::STRING, '(none)')",
+    "tag":     "COALESCE(NULLIF(query_tag, ''), '(untagged)')",
+}
+
+# QUERY_HISTORY_BY_USER keeps 7 days and returns at most 10000 rows
+MAX_REPORT_HOURS = 7 * 24
+
+_CREDIT_REPORT_SQL = """
+    WITH q AS (
+        SELECT query_tag,
+               TRY_PARSE_JSON(NULLIF(query_tag, '')) AS tag,
+               warehouse_size,
+               execution_status,
+               total_elapsed_time,
+               execution_time,
+               bytes_scanned
+        FROM TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_USER(
+            USER_NAME => CURRENT_USER(),
+            END_TIME_RANGE_START => DATEADD(hour, -%(hours)s, CURRENT_TIMESTAMP()),
+            RESULT_LIMIT => 10000
+        ))
+    )
+    SELECT {key}                                            AS tag_key,
+           COUNT(*)                                         AS queries,
+           COUNT_IF(execution_status <> 'SUCCESS')          AS failed,
+           SUM(total_elapsed_time) / 1000                   AS elapsed_s,
+           SUM(execution_time) / 1000                       AS execution_s,
+           SUM(bytes_scanned)                               AS bytes_scanned,
+           SUM(execution_time / 3600000 * CASE warehouse_size {credit_cases} ELSE 0 END)
+                                                            AS est_credits
+    FROM   q
+    GROUP  BY 1
+    ORDER  BY est_credits DESC, elapsed_s DESC
+"""
+
+
+def credit_report(hours: int = 24, by: str = "feature") -> list[dict]:
+    """
+    Snowflake usage over the last *hours* grouped by tag *by* ("feature" =
+    route or task, plus the Gemini tool if any; "scope" = user/group;
+    "tag" = the raw tag), most expensive first.
+
+    est_credits charges each query its execution time at its warehouse
+    size's hourly rate. That's an attribution estimate, not a bill: idle
+    time before auto-suspend and cloud-services credits aren't included,
+    and concurrent queries on one warehouse are each charged in full.
+    """
+    if by not in _REPORT_KEYS:
+        raise ValueError(f"by must be one of {sorted(_REPORT_KEYS)}")
+    hours = max(1, min(int(hours), MAX_REPORT_HOURS))
+    credit_cases = " ".join(f"WHEN '{size}' THEN {rate}" for size, rate in _CREDITS_PER_HOUR.items())
+    sql = _CREDIT_REPORT_SQL.format(key=_REPORT_KEYS[by], credit_cases=credit_cases)
+
+    with get_snowflake_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, {"hours": hours})
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+    return [
+        {
+            by:              r[0],
+            "queries":       r[1],
+            "failed":        r[2],
+            "elapsed_s":     round(float(r[3] or 0), 1),
+            "execution_s":   round(float(r[4] or 0), 1),
+            "bytes_scanned": int(r[5] or 0),
+            "est_credits":   round(float(r[6] or 0), 4),
+        }
+        for r in rows
+    ]
@@ -0,0 +1,306 @@
+"""
+Result cache for Snowflake-backed service functions.
+
+Snowflake analytics data only changes when the Celery sync or metrics tasks
+run, so repeated reads between runs can be served from memory.
+
+Invalidation is version-based: every cache key embeds the current *data
+version*, a counter stored in Redis that the worker bumps whenever a sync
+batch advances a watermark in sync_watermarks or a metrics task completes.
+Once the version moves, old entries are simply never looked up again and
+age out of the LRU / expire in Redis. A TTL bounds staleness if the bump is
+ever missed (e.g. Redis unreachable from the worker).
+
+Tiers:
+  1. In-process LRU (always on when the cache is enabled)
+  2. Redis (optional, SNOWFLAKE_CACHE_REDIS=true) — shared across API workers
+
+Usage:
+    from app.utils.result_cache import cached
+
+    @cached("user_summary")
+    def get_user_summary(user_id: str) -> dict: ...
+"""
+
+import asyncio
+import copy
+import functools
+import inspect
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_VERSION_KEY = "snowflake:data_version"
+_VALUE_PREFIX = "snowflake:cache"
+
+
+# ---------------------------------------------------------------------------
+# Redis access (optional — every failure degrades to in-process behaviour)
+# ---------------------------------------------------------------------------
+
+_redis_client = None
+_redis_lock = threading.Lock()
+
+
+def _get_redis():
+    """Return a shared Redis client, or None if Redis is not configured."""
+    global _redis_client
+    if not settings.REDIS_URL:
+        return None
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                import redis
+                _redis_client = redis.Redis.from_url(
+                    settings.REDIS_URL,
+                    socket_timeout=0.5,
+                    socket_connect_timeout=0.5,
+                )
+    return _redis_client
+
+
+# ---------------------------------------------------------------------------
+# Data version
+# ---------------------------------------------------------------------------
+
+_local_version = 0
+_version_cache: tuple[float, str] = (0.0, "")
+_version_lock = threading.Lock()
+
+
+def _fresh_data_version() -> Optional[str]:
+    """The data version if it was read recently enough to reuse (no I/O), else None."""
+    checked_at, version = _version_cache
+    if version and time.monotonic() - checked_at < settings.SNOWFLAKE_CACHE_VERSION_CHECK_SECONDS:
+        return version
+    return None
+
+
+def data_version() -> str:
+    """
+    Current Snowflake data version. Read from Redis at most once every
+    SNOWFLAKE_CACHE_VERSION_CHECK_SECONDS so cache hits stay in-process.
+    The read blocks; async callers go through a worker thread when
+    _fresh_data_version() has nothing.
+    """
+    global _version_cache
+    version = _fresh_data_version()
+    if version:
+        return version
+    now = time.monotonic()
+
+    remote = None
+    try:
+        client = _get_redis()
+        if client is not None:
+            raw = client.get(_VERSION_KEY)
+            remote = raw.decode() if raw else "0"
+    except Exception as e:  # noqa: BLE001
+        logger.debug("[cache] Could not read data version from Redis: %s", e)
+
+    with _version_lock:
+        version = f"{remote or 0}.{_local_version}"
+        _version_cache = (now, version)
+    return version
+
+
+def bump_data_version(reason: str = "") -> None:
+    """
+    Invalidate every cached result by advancing the data version.
+    Called by the worker after a watermark advances or a metrics task
+    completes; also usable from an API process.
+    """
+    global _local_version, _version_cache
+    with _version_lock:
+        _local_version += 1
+        _version_cache = (0.0, "")
+    try:
+        client = _get_redis()
+        if client is not None:
+            client.incr(_VERSION_KEY)
+    except Exception as e:  # noqa: BLE001
+        logger.warning("[cache] Could not bump data version in Redis (%s): %s", reason, e)
+    logger.info("[cache] Data version bumped%s", f" ({reason})" if reason else "")
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+class ResultCache:
+    """Thread-safe LRU with per-entry TTL, optionally backed by Redis."""
+
+    def __init__(self, max_entries: int, ttl: float, use_redis: bool = False):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self._entries: OrderedDict = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "redis_hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        if self.use_redis:
+            try:
+                client = _get_redis()
+                raw = client.get(f"{_VALUE_PREFIX}:{key}") if client is not None else None
+                if raw is not None:
+                    value = json.loads(raw)
+                    self._put_local(key, value)
+                    with self._lock:
+                        self._stats["redis_hits"] += 1
+                    return copy.deepcopy(value)
+            except Exception as e:  # noqa: BLE001
+                logger.debug("[cache] Redis read failed for %s: %s", key, e)
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        self._put_local(key, copy.deepcopy(value))
+        if self.use_redis:
+            try:
+                client = _get_redis()
+                if client is not None:
+                    client.setex(
+                        f"{_VALUE_PREFIX}:{key}",
+                        max(1, int(self.ttl)),
+                        json.dumps(value, default=str),
+                    )
+            except Exception as e:  # noqa: BLE001
+                logger.debug("[cache] Redis write failed for %s: %s", key, e)
+
+    def _put_local(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries":     len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "redis":       self.use_redis,
+                **self._stats,
+            }
+
+
+@functools.lru_cache(maxsize=1)
+def get_result_cache() -> ResultCache:
+    """Return the process-wide result cache."""
+    return ResultCache(
+        max_entries=settings.SNOWFLAKE_CACHE_MAX_ENTRIES,
+        ttl=settings.SNOWFLAKE_CACHE_TTL,
+        use_redis=settings.SNOWFLAKE_CACHE_REDIS,
+    )
+
+
+def cached(namespace: str) -> Callable:
+    """
+    Cache a service function keyed by *namespace*, its arguments and the
+    current data version. Results must be JSON-serialisable when the Redis
+    tier is enabled. Exceptions are never cached.
+
+    Arguments are bound to the signature with defaults applied, so f("u1"),
+    f("u1", 30) and f("u1", limit=30) share an entry. Coroutine functions
+    are supported too; give the sync and async variants of a function the
+    same namespace (and the same signature) and they share entries.
+    """
+    def decorator(fn: Callable) -> Callable:
+        signature = inspect.signature(fn)
+
+        def make_key(args: tuple, kwargs: dict, version: Optional[str] = None) -> Optional[str]:
+            """The cache key, or None if the arguments don't fit fn (the call raises)."""
+            try:
+                bound = signature.bind(*args, **kwargs)
+            except TypeError:
+                return None
+            bound.apply_defaults()
+            parts = []
+            for name, value in bound.arguments.items():
+                kind = signature.parameters[name].kind
+                if kind is inspect.Parameter.VAR_POSITIONAL:
+                    parts.extend(str(v) for v in value)
+                elif kind is inspect.Parameter.VAR_KEYWORD:
+                    parts.extend(f"{k}={v}" for k, v in sorted(value.items()))
+                else:
+                    parts.append(f"{name}={value}")
+            return f"{namespace}:{version or data_version()}:{':'.join(parts)}"
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not settings.SNOWFLAKE_CACHE_ENABLED:
+                    return await fn(*args, **kwargs)
+
+                cache = get_result_cache()
+                # Redis reads block, so keep them off the event loop: the
+                # data version (unless recently read) and, with the Redis
+                # tier, the lookup itself
+                version = _fresh_data_version() or await asyncio.to_thread(data_version)
+                key = make_key(args, kwargs, version)
+                if key is None:
+                    return await fn(*args, **kwargs)
+                if cache.use_redis:
+                    hit = await asyncio.to_thread(cache.get, key)
+                else:
+                    hit = cache.get(key)
+                if hit is not None:
+                    return hit
+
+                result = await fn(*args, **kwargs)
+                if cache.use_redis:
+                    await asyncio.to_thread(cache.set, key, result)
+                else:
+                    cache.set(key, result)
+                return result
+
+            async_wrapper.uncached = fn  # type: ignore[attr-defined]
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not settings.SNOWFLAKE_CACHE_ENABLED:
+                return fn(*args, **kwargs)
+
+            key = make_key(args, kwargs)
+            if key is None:
+                return fn(*args, **kwargs)
+            cache = get_result_cache()
+            hit = cache.get(key)
+            if hit is not None:
+                return hit
+
+            result = fn(*args, **kwargs)
+            cache.set(key, result)
+            return result
+
+        wrapper.uncached = fn  # type: ignore[attr-defined]
+        return wrapper
+    return decorator
@@ -0,0 +1,125 @@
+"""
+Async facade over the Snowflake connector for ``async def`` handlers.
+
+Queries are submitted with ``cursor.execute_async`` and their query id is
+polled from the event loop, so a slow warehouse query holds neither a
+Starlette threadpool worker nor the event loop while it runs. Only the
+short connector calls (submit, status poll, result fetch) hop onto a
+worker thread.
+
+Usage:
+    from app.utils.snowflake_async import query_async, gather_limited
+
+    rows = await query_async("SELECT ... WHERE user_id = %s", (user_id,))
+    a, b = await gather_limited(query_async(sql_a), query_async(sql_b), limit=4)
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+from app.database import get_snowflake_pool
+from app.utils.query_metrics import caller_name, record_query
+
+logger = logging.getLogger(__name__)
+
+# Status polling backs off from _POLL_MIN to _POLL_MAX seconds
+_POLL_MIN = 0.05
+_POLL_MAX = 1.0
+
+
+def _fetchall(cursor) -> list:
+    return cursor.fetchall()
+
+
+async def _wait_for_query(conn, sfqid: str) -> None:
+    """Poll *sfqid* until it finishes; raises the query's error if it failed."""
+    delay = _POLL_MIN
+    while True:
+        status = await asyncio.to_thread(conn.get_query_status_throw_if_error, sfqid)
+        if not conn.is_still_running(status):
+            return
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, _POLL_MAX)
+
+
+def _collect(cursor, sfqid: str, fetch: Callable) -> Any:
+    cursor.get_results_from_sfqid(sfqid)
+    return fetch(cursor)
+
+
+def _abort_quietly(cursor, sfqid: str) -> None:
+    try:
+        cursor.abort_query(sfqid)
+    except Exception as e:  # noqa: BLE001
+        logger.warning("[snowflake_async] Could not abort query %s: %s", sfqid, e)
+
+
+async def query_async(
+    sql: str,
+    params: tuple | dict = (),
+    fetch: Optional[Callable] = None,
+    setup: Optional[Callable] = None,
+    teardown: Optional[Callable] = None,
+) -> Any:
+    """
+    Run a read-only query without blocking a thread while Snowflake works.
+
+    Returns ``fetch(cursor)`` once the results are available — all rows by
+    default; pass e.g. ``snowflake_utils.fetch_grouped`` for grouped rows.
+    *setup* and *teardown*, if given, are called with the cursor (in a
+    worker thread) before the query and after it, on the same session.
+    If the awaiting task is cancelled, the query is aborted server-side.
+    """
+    caller = caller_name()
+    async with get_snowflake_pool().connection_async() as conn:
+        cur = conn.cursor()
+        sfqid = None
+        t0 = time.perf_counter()
+        try:
+            if setup:
+                await asyncio.to_thread(setup, cur)
+            await asyncio.to_thread(cur.execute_async, sql, params)
+            sfqid = cur.sfqid
+            await _wait_for_query(conn, sfqid)
+            result = await asyncio.to_thread(_collect, cur, sfqid, fetch or _fetchall)
+        except BaseException as exc:
+            if isinstance(exc, asyncio.CancelledError) and sfqid:
+                await asyncio.shield(asyncio.to_thread(_abort_quietly, cur, sfqid))
+            record_query(sql, time.perf_counter() - t0, sfqid=sfqid, caller=caller, error=exc)
+            raise
+        else:
+            record_query(sql, time.perf_counter() - t0, sfqid=sfqid, rows=cur.rowcount, caller=caller)
+            return result
+        finally:
+            if teardown:
+                await asyncio.shield(asyncio.to_thread(teardown, cur))
+            cur.close()
+
+
+async def query_one_async(sql: str, params: tuple | dict = ()) -> tuple | None:
+    """Async counterpart of _query_one: first row or None."""
+    rows = await query_async(sql, params)
+    return rows[0] if rows else None
+
+
+async def gather_limited(
+    *aws: Awaitable,
+    limit: Optional[int] = None,
+    return_exceptions: bool = False,
+) -> list:
+    """
+    asyncio.gather with at most *limit* awaitables running at once, so one
+    request can't take every pooled connection.
+    """
+    if not limit:
+        return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+
+    sem = asyncio.Semaphore(limit)
+
+    async def _run(aw: Awaitable):
+        async with sem:
+            return await aw
+
+    return await asyncio.gather(*(_run(aw) for aw in aws), return_exceptions=return_exceptions)
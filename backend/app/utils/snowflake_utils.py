@@ -1,7 +1,79 @@
 """Snowflake database utilities and schema setup."""
 
+import json
 import os
-from app.database import get_snowflake_connection
+from app.config import settings
+from app.database import get_snowflake_connection, get_snowflake_pool
+from app.utils.snowflake_async import query_one_async
+from app.utils.sql_templates import (
+    ADHERENCE_WINDOW_SQL,
+    RISK_COUNTS_SQL,
+    age_seconds,
+    register,
+    time_bucket,
+)
+
+# Optional columnar fetch path — needs: pip install "snowflake-connector-python[pandas]"
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+    pc = None
+
+
+def arrow_fetch_enabled() -> bool:
+    """True when SNOWFLAKE_ARROW_FETCH is set and pyarrow is installed."""
+    return settings.SNOWFLAKE_ARROW_FETCH and pa is not None
+
+
+def group_rows(rows: list[tuple], key_index: int = 0) -> dict[str, list[tuple]]:
+    """Group already-fetched rows by str(row[key_index]), keeping their order."""
+    groups: dict[str, list[tuple]] = {}
+    for row in rows:
+        groups.setdefault(str(row[key_index]), []).append(row)
+    return groups
+
+
+def fetch_grouped(cursor, key_index: int = 0) -> dict[str, list[tuple]]:
+    """
+    Group the rows of an executed cursor by the column at *key_index*.
+
+    Returns {str(key): [row_tuple, ...]} with each group's rows in result
+    order. With the Arrow path enabled, rows are pulled as Arrow record
+    batches and partitioned with vectorized compute (stable sort on the key,
+    then run boundaries), so no per-row Python work happens until the final
+    column-to-list conversion and peak memory is one batch. Otherwise falls
+    back to fetchall() and a Python loop.
+    """
+    if not arrow_fetch_enabled():
+        return group_rows(cursor.fetchall(), key_index)
+
+    groups: dict[str, list[tuple]] = {}
+
+    for batch in cursor.fetch_arrow_batches():
+        n = batch.num_rows
+        if not n:
+            continue
+        keys = batch.column(key_index)
+        if not pa.types.is_string(keys.type):
+            keys = pc.cast(keys, pa.string())
+        order = pc.sort_indices(keys)  # stable: keeps ORDER BY within each key
+        batch = batch.take(order)
+        keys = keys.take(order)
+
+        boundaries = pc.indices_nonzero(
+            pc.not_equal(keys.slice(1), keys.slice(0, n - 1))
+        ).to_pylist()
+        starts = [0] + [i + 1 for i in boundaries]
+        ends = starts[1:] + [n]
+
+        key_values = keys.to_pylist()
+        rows = list(zip(*(col.to_pylist() for col in batch.columns)))
+        for start, end in zip(starts, ends):
+            groups.setdefault(key_values[start], []).extend(rows[start:end])
+
+    return groups
 
 
 def get_snowflake_schemas() -> dict:
@@ -67,11 +139,17 @@ def get_snowflake_schemas() -> dict:
                 checkins_completed_7d INT,
                 checkins_total_7d INT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+                updated_at TIMESTAMP,
                 PRIMARY KEY (user_id, metric_date),
                 FOREIGN KEY (user_id) REFERENCES dim_users(user_id)
             );
         """,
         
+        # Tables created before updated_at existed
+        "metrics_adherence_updated_at": """
+            ALTER TABLE metrics_adherence ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+        """,
+        
         "metrics_streak": """
             CREATE TABLE IF NOT EXISTS metrics_streak (
                 user_id STRING,
@@ -98,26 +176,40 @@ def get_snowflake_schemas() -> dict:
             );
         """,
         
-        "view_mentor_dashboard": """
-            CREATE OR REPLACE VIEW mentor_dashboard AS
-            SELECT
-                u.mentor_id,
-                u.user_id,
-                u.name,
-                COALESCE(ma.adherence_7d, 0) as adherence_7d,
-                COALESCE(ma.adherence_30d, 0) as adherence_30d,
-                COALESCE(ms.current_streak, 0) as current_streak,
-                COALESCE(mr.risk_level, 'unknown') as risk_level,
-                COALESCE(mr.risk_score, 0) as risk_score,
-                mr.missed_count_7d,
-                mr.last_checkin_days_ago,
-                ma.metric_date
-            FROM dim_users u
-            LEFT JOIN metrics_adherence ma ON u.user_id = ma.user_id
-            LEFT JOIN metrics_streak ms ON u.user_id = ms.user_id
-            LEFT JOIN metrics_risk mr ON u.user_id = mr.user_id
-            WHERE u.mentor_id IS NOT NULL
-            ORDER BY mr.risk_score DESC, ma.adherence_7d ASC;
+        # One row per patient, rebuilt by the metrics tasks
+        # (refresh_mentor_dashboard_latest) — replaces the mentor_dashboard
+        # view, which joined every historical metrics_adherence row.
+        "mentor_dashboard_latest": """
+            CREATE TABLE IF NOT EXISTS mentor_dashboard_latest (
+                mentor_id STRING,
+                user_id STRING,
+                name STRING,
+                adherence_7d FLOAT,
+                adherence_30d FLOAT,
+                current_streak INT,
+                risk_level STRING,
+                risk_score FLOAT,
+                missed_count_7d INT,
+                last_checkin_days_ago INT,
+                metric_date DATE,
+                refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+                PRIMARY KEY (user_id)
+            )
+            CLUSTER BY (mentor_id);
+        """,
+        
+        # One get_group_member_summaries document per group, rebuilt by the
+        # worker (refresh_group_summary_snapshots). snapshot_version orders
+        # overlapping refreshes: a row is only replaced by a newer run.
+        "group_summary_snapshot": """
+            CREATE TABLE IF NOT EXISTS group_summary_snapshot (
+                group_id STRING,
+                summary VARIANT,
+                member_count INT,
+                snapshot_version NUMBER,
+                refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP(),
+                PRIMARY KEY (group_id)
+            );
         """
     }
 
@@ -143,36 +235,149 @@ def initialize_snowflake_schema():
         conn.close()
 
 
+_REFRESH_MENTOR_DASHBOARD_SQL = """
+    INSERT OVERWRITE INTO mentor_dashboard_latest (
+        mentor_id, user_id, name, adherence_7d, adherence_30d, current_streak,
+        risk_level, risk_score, missed_count_7d, last_checkin_days_ago,
+        metric_date, refreshed_at
+    )
+    SELECT
+        u.mentor_id,
+        u.user_id,
+        u.name,
+        COALESCE(ma.adherence_7d, 0),
+        COALESCE(ma.adherence_30d, 0),
+        COALESCE(ms.current_streak, 0),
+        COALESCE(mr.risk_level, 'unknown'),
+        COALESCE(mr.risk_score, 0),
+        mr.missed_count_7d,
+        mr.last_checkin_days_ago,
+        ma.metric_date,
+        CURRENT_TIMESTAMP()
+    FROM dim_users u
+    LEFT JOIN (
+        SELECT user_id, adherence_7d, adherence_30d, metric_date
+        FROM metrics_adherence
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY metric_date DESC) = 1
+    ) ma ON u.user_id = ma.user_id
+    LEFT JOIN metrics_streak ms ON u.user_id = ms.user_id
+    LEFT JOIN metrics_risk mr ON u.user_id = mr.user_id
+    WHERE u.mentor_id IS NOT NULL
+"""
+
+
+def refresh_mentor_dashboard_latest(cursor) -> None:
+    """
+    Rebuild mentor_dashboard_latest from the newest metrics row per patient.
+
+    Runs on the caller's cursor so it commits together with the metrics
+    write; INSERT OVERWRITE swaps the contents atomically, so readers never
+    see a half-built table.
+    """
+    cursor.execute(_REFRESH_MENTOR_DASHBOARD_SQL)
+
+
+_GROUP_SNAPSHOT_MERGE_SQL = """
+    MERGE INTO group_summary_snapshot t
+    USING (
+        SELECT group_id, PARSE_JSON(summary) AS summary, member_count
+        FROM staging_group_summary_snapshot
+    ) s
+    ON t.group_id = s.group_id
+    WHEN MATCHED AND t.snapshot_version < %(version)s THEN UPDATE SET
+        summary          = s.summary,
+        member_count     = s.member_count,
+        snapshot_version = %(version)s,
+        refreshed_at     = CURRENT_TIMESTAMP()
+    WHEN NOT MATCHED THEN INSERT
+        (group_id, summary, member_count, snapshot_version, refreshed_at)
+        VALUES (s.group_id, s.summary, s.member_count, %(version)s, CURRENT_TIMESTAMP())
+"""
+
+
+def write_group_summary_snapshots(cursor, summaries: list[dict], version: int) -> None:
+    """
+    Upsert get_group_member_summaries documents into group_summary_snapshot.
+
+    Rows already written by a newer refresh (higher *version*) are left
+    alone. Runs on the caller's cursor; the caller commits.
+    """
+    cursor.execute(get_snowflake_schemas()["group_summary_snapshot"])
+    if not summaries:
+        return
+    cursor.execute(
+        "CREATE OR REPLACE TEMPORARY TABLE staging_group_summary_snapshot "
+        "(group_id VARCHAR, summary VARCHAR, member_count INT)"
+    )
+    cursor.executemany(
+        "INSERT INTO staging_group_summary_snapshot (group_id, summary, member_count) "
+        "VALUES (%s, %s, %s)",
+        [(s["group_id"], json.dumps(s, default=str), s["member_count"]) for s in summaries],
+    )
+    cursor.execute(_GROUP_SNAPSHOT_MERGE_SQL, {"version": version})
+
+
+def _adherence_params(user_id: str, days: int) -> dict:
+    return {"user_id": user_id, "days": int(days), "as_of": time_bucket()}
+
+
+def _adherence_result(result) -> dict:
+    return {
+        "total_checkins": result[0] if result else 0,
+        "completed": result[1] if result else 0,
+        "adherence_percent": result[2] if result else 0.0
+    }
+
+
+def _risk_result(row) -> dict:
+    """Score risk from a RISK_COUNTS_SQL row (missed_7d, missed_3d, days_since_checkin)."""
+    missed_7d = row[0] if row else 0
+    days_since_checkin = row[2] if row and row[2] else None
+    
+    # Determine risk level
+    risk_level = "low"
+    risk_score = 0.0
+    
+    if missed_7d >= 4:
+        risk_level = "high"
+        risk_score = 0.8 + (min(missed_7d - 4, 3) * 0.05)
+    elif missed_7d >= 2:
+        risk_level = "medium"
+        risk_score = 0.5 + (missed_7d * 0.1)
+    
+    if days_since_checkin and days_since_checkin > 3:
+        risk_level = "high"
+        risk_score = max(risk_score, 0.7)
+    
+    return {
+        "risk_level": risk_level,
+        "risk_score": min(risk_score, 1.0),
+        "missed_count_7d": missed_7d,
+        "days_since_last_checkin": days_since_checkin or 999
+    }
+
+
 def compute_adherence_metrics(user_id: str, days: int = 7):
     """
     Compute adherence score for a user over N days.
     
     Returns percentage of completed check-ins.
     """
-    conn = get_snowflake_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute(f"""
-            SELECT
-                COUNT(*) as total,
-                SUM(CASE WHEN completed THEN 1 ELSE 0 END) as completed,
-                ROUND(100.0 * SUM(CASE WHEN completed THEN 1 ELSE 0 END) / 
-                      NULLIF(COUNT(*), 0), 2) as adherence_pct
-            FROM fact_checkins
-            WHERE user_id = %s
-            AND timestamp >= DATEADD(day, -{days}, CURRENT_TIMESTAMP());
-        """, (user_id,))
-        
-        result = cursor.fetchone()
-        return {
-            "total_checkins": result[0] if result else 0,
-            "completed": result[1] if result else 0,
-            "adherence_percent": result[2] if result else 0.0
-        }
-    finally:
-        cursor.close()
-        conn.close()
+    with get_snowflake_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(ADHERENCE_WINDOW_SQL, _adherence_params(user_id, days))
+            result = cursor.fetchone()
+        finally:
+            cursor.close()
+
+    return _adherence_result(result)
+
+
+async def compute_adherence_metrics_async(user_id: str, days: int = 7):
+    """Async variant of compute_adherence_metrics (see app/utils/snowflake_async.py)."""
+    result = await query_one_async(ADHERENCE_WINDOW_SQL, _adherence_params(user_id, days))
+    return _adherence_result(result)
 
 
 def detect_risk_patterns(user_id: str):
@@ -181,79 +386,124 @@ def detect_risk_patterns(user_id: str):
     
     Returns: risk_level, missed_count, last_checkin_days_ago
     """
-    conn = get_snowflake_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Check 7-day missed count
-        cursor.execute("""
-            SELECT COUNT(*) as missed_count
-            FROM fact_checkins
-            WHERE user_id = %s
-            AND completed = FALSE
-            AND timestamp >= DATEADD(day, -7, CURRENT_TIMESTAMP());
-        """, (user_id,))
-        
-        missed_7d = cursor.fetchone()[0]
-        
-        # Check last checkin date
-        cursor.execute("""
-            SELECT DATEDIFF(day, MAX(timestamp), CURRENT_TIMESTAMP()) as days_ago
-            FROM fact_checkins
-            WHERE user_id = %s;
-        """, (user_id,))
-        
-        result = cursor.fetchone()
-        days_since_checkin = result[0] if result and result[0] else None
-        
-        # Determine risk level
-        risk_level = "low"
-        risk_score = 0.0
-        
-        if missed_7d >= 4:
-            risk_level = "high"
-            risk_score = 0.8 + (min(missed_7d - 4, 3) * 0.05)
-        elif missed_7d >= 2:
-            risk_level = "medium"
-            risk_score = 0.5 + (missed_7d * 0.1)
-        
-        if days_since_checkin and days_since_checkin > 3:
-            risk_level = "high"
-            risk_score = max(risk_score, 0.7)
-        
-        return {
-            "risk_level": risk_level,
-            "risk_score": min(risk_score, 1.0),
-            "missed_count_7d": missed_7d,
-            "days_since_last_checkin": days_since_checkin or 999
+    with get_snowflake_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(RISK_COUNTS_SQL, {"user_id": user_id, "as_of": time_bucket()})
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+
+    return _risk_result(row)
+
+
+async def detect_risk_patterns_async(user_id: str):
+    """Async variant of detect_risk_patterns."""
+    row = await query_one_async(RISK_COUNTS_SQL, {"user_id": user_id, "as_of": time_bucket()})
+    return _risk_result(row)
+
+
+# Latest precomputed 7-day adherence and risk for one user, with each
+# section's age in seconds at as_of (NULL when the user has no row yet).
+_PRECOMPUTED_METRICS_SQL = register("precomputed_metrics", """
+    SELECT
+        a.adherence_7d,
+        a.checkins_completed_7d,
+        a.checkins_total_7d,
+        DATEDIFF(second, COALESCE(a.updated_at, a.metric_date::TIMESTAMP), %(as_of)s::TIMESTAMP_LTZ),
+        r.risk_level,
+        r.risk_score,
+        r.missed_count_7d,
+        r.last_checkin_days_ago,
+        DATEDIFF(second, r.last_evaluated, %(as_of)s::TIMESTAMP_LTZ)
+    FROM (SELECT %(user_id)s AS user_id) u
+    LEFT JOIN (
+        SELECT * FROM metrics_adherence
+        WHERE user_id = %(user_id)s
+        ORDER BY metric_date DESC
+        LIMIT 1
+    ) a ON a.user_id = u.user_id
+    LEFT JOIN metrics_risk r ON r.user_id = u.user_id
+""")
+
+
+def _precomputed_result(row, as_of) -> dict:
+    """
+    Shape a _PRECOMPUTED_METRICS_SQL row like compute_adherence_metrics /
+    detect_risk_patterns. A section is None when its row is missing.
+    """
+    adherence = risk = None
+    adherence_age = risk_age = None
+    if row and row[0] is not None:
+        adherence = {
+            "total_checkins": row[2] or 0,
+            "completed": row[1] or 0,
+            "adherence_percent": row[0],
         }
-    finally:
-        cursor.close()
-        conn.close()
+        adherence_age = age_seconds(row[3], as_of)
+    if row and row[4] is not None:
+        risk = {
+            "risk_level": row[4],
+            "risk_score": row[5],
+            "missed_count_7d": row[6],
+            "days_since_last_checkin": row[7] if row[7] is not None else 999,
+        }
+        risk_age = age_seconds(row[8], as_of)
+    return {
+        "adherence": adherence,
+        "adherence_age_seconds": adherence_age,
+        "risk": risk,
+        "risk_age_seconds": risk_age,
+    }
 
 
-def get_goals_context_snowflake(user_id: str) -> str | None:
+def get_precomputed_metrics(user_id: str) -> dict:
     """
-    Get goals and check-ins context for a user from Snowflake (for AI coach).
-    Returns a formatted string or None if Snowflake unavailable / empty.
+    Read a user's latest 7-day adherence and risk from metrics_adherence /
+    metrics_risk (written by the Celery metrics tasks) in one query.
+
+    Returns {"adherence", "adherence_age_seconds", "risk", "risk_age_seconds"};
+    sections the tasks haven't produced yet are None.
     """
-    try:
-        conn = get_snowflake_connection()
+    as_of = time_bucket()
+    with get_snowflake_pool().connection() as conn:
         cursor = conn.cursor()
         try:
-            cursor.execute("""
-                SELECT goal_id, title, category, frequency, created_at
-                FROM dim_goals WHERE user_id = %s ORDER BY created_at DESC
-            """, (user_id,))
-            goals_rows = cursor.fetchall()
-            cursor.execute("""
-                SELECT goal_id, completed, timestamp
-                FROM fact_checkins WHERE user_id = %s ORDER BY timestamp DESC LIMIT 50
-            """, (user_id,))
-            checkins_rows = cursor.fetchall()
+            cursor.execute(_PRECOMPUTED_METRICS_SQL, {"user_id": user_id, "as_of": as_of})
+            row = cursor.fetchone()
         finally:
             cursor.close()
-            conn.close()
+    return _precomputed_result(row, as_of)
+
+
+async def get_precomputed_metrics_async(user_id: str) -> dict:
+    """Async variant of get_precomputed_metrics."""
+    as_of = time_bucket()
+    row = await query_one_async(_PRECOMPUTED_METRICS_SQL, {"user_id": user_id, "as_of": as_of})
+    return _precomputed_result(row, as_of)
+
+
+def get_goals_context_snowflake(user_id: str) -> str | None:
+    """
+    Get goals and check-ins context for a user from Snowflake (for AI coach).
+    Returns a formatted string or None if Snowflake unavailable / empty.
+    """
+    try:
+        with get_snowflake_pool().connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT goal_id, title, category, frequency, created_at
+                    FROM dim_goals WHERE user_id = %s ORDER BY created_at DESC
+                """, (user_id,))
+                goals_rows = cursor.fetchall()
+                cursor.execute("""
+                    SELECT goal_id, completed, timestamp
+                    FROM fact_checkins WHERE user_id = %s ORDER BY timestamp DESC LIMIT 50
+                """, (user_id,))
+                checkins_rows = cursor.fetchall()
+            finally:
+                cursor.close()
 
         lines = [f"User ID: {user_id}", ""]
         if goals_rows:
@@ -275,40 +525,44 @@ def get_goals_context_snowflake(user_id: str) -> str | None:
 
 
 def get_mentor_patient_metrics(mentor_id: str):
-    """Get aggregated metrics for all patients of a mentor."""
-    conn = get_snowflake_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("""
-            SELECT
-                user_id,
-                name,
-                adherence_7d,
-                current_streak,
-                risk_level,
-                risk_score,
-                missed_count_7d,
-                last_checkin_days_ago
-            FROM mentor_dashboard
-            WHERE mentor_id = %s
-            ORDER BY risk_score DESC;
-        """, (mentor_id,))
-        
-        results = cursor.fetchall()
-        return [
-            {
-                "user_id": r[0],
-                "name": r[1],
-                "adherence_7d": r[2],
-                "current_streak": r[3],
-                "risk_level": r[4],
-                "risk_score": r[5],
-                "missed_count_7d": r[6],
-                "days_since_checkin": r[7]
-            }
-            for r in results
-        ]
-    finally:
-        cursor.close()
-        conn.close()
+    """
+    Get the latest metrics for all patients of a mentor.
+
+    Reads mentor_dashboard_latest (one row per patient, clustered on
+    mentor_id), so the cost doesn't grow with metrics history.
+    """
+    with get_snowflake_pool().connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT
+                    user_id,
+                    name,
+                    adherence_7d,
+                    current_streak,
+                    risk_level,
+                    risk_score,
+                    missed_count_7d,
+                    last_checkin_days_ago
+                FROM mentor_dashboard_latest
+                WHERE mentor_id = %s
+                ORDER BY risk_score DESC, adherence_7d ASC;
+            """, (mentor_id,))
+            
+            results = cursor.fetchall()
+        finally:
+            cursor.close()
+
+    return [
+        {
+            "user_id": r[0],
+            "name": r[1],
+            "adherence_7d": r[2],
+            "current_streak": r[3],
+            "risk_level": r[4],
+            "risk_score": r[5],
+            "missed_count_7d": r[6],
+            "days_since_checkin": r[7]
+        }
+        for r in results
+    ]
@@ -0,0 +1,185 @@
+"""
+Snowflake warmup and keepalive.
+
+The first analytics request after a deploy pays for login, warehouse
+resume and session setup. start_warmup(), called at API process start,
+does that work in a background thread instead:
+
+  1. opens SNOWFLAKE_WARMUP_CONNECTIONS pooled sessions and runs a cheap
+     query on each
+  2. resumes the warehouse (best effort — needs OPERATE on it); startup
+     only, until the first warmup succeeds
+
+and then keeps the sessions hot. They are created with
+client_session_keep_alive (app/database.py), and every
+SNOWFLAKE_KEEPALIVE_INTERVAL seconds the idle pool is warmed again with
+``SELECT 1``, so idle and lifetime eviction never leave it empty. That
+query runs without a warehouse, so the keepalive never resumes one and
+auto-suspend still applies between requests. While requests are using the
+pool the re-warm is skipped — traffic keeps it hot.
+
+warmup_status() backs GET /ready: not ready until the first warmup has
+succeeded, and again whenever a re-warm fails.
+
+Usage:
+    from app.utils.snowflake_warmup import start_warmup, warmup_status
+
+    start_warmup()
+    warmup_status()["ready"]
+"""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+from app.config import settings
+from app.database import get_snowflake_pool
+from app.utils.local_replica import use_local_replica
+
+logger = logging.getLogger(__name__)
+
+# Retry delay while cold (the keepalive interval applies once warm)
+_RETRY_SECONDS = 15.0
+
+_RESUME_WAREHOUSE_SQL = "ALTER WAREHOUSE IDENTIFIER(%s) RESUME IF SUSPENDED"
+
+
+class _WarmupState:
+    """Thread-safe warm/cold state reported by the readiness endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = "cold"        # cold | warm | disabled
+        self.connections = 0
+        self.warmed_at: Optional[float] = None
+        self.last_duration_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.keepalives = 0
+
+    def update(self, **fields) -> None:
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def record_keepalive(self) -> None:
+        with self._lock:
+            self.keepalives += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "state":            self.state,
+                "ready":            self.state in ("warm", "disabled"),
+                "connections":      self.connections,
+                "warmed_at":        self.warmed_at,
+                "last_duration_ms": self.last_duration_ms,
+                "last_error":       self.last_error,
+                "keepalives":       self.keepalives,
+            }
+
+
+_state = _WarmupState()
+_stop = threading.Event()
+_thread: Optional[threading.Thread] = None
+_thread_lock = threading.Lock()
+
+
+def warmup_enabled() -> bool:
+    """False when warmup is switched off, Snowflake isn't configured, or reads go to the local replica."""
+    return (
+        settings.SNOWFLAKE_WARMUP
+        and bool(settings.SNOWFLAKE_ACCOUNT)
+        and not use_local_replica()
+    )
+
+
+def warm_up(resume_warehouse: bool = False) -> bool:
+    """
+    Open and exercise the warm set of pooled sessions now, and with
+    *resume_warehouse* also resume the warehouse. Returns True on success.
+    """
+    pool = get_snowflake_pool()
+    t0 = time.perf_counter()
+    try:
+        count = pool.warm(settings.SNOWFLAKE_WARMUP_CONNECTIONS)
+        if resume_warehouse and settings.SNOWFLAKE_WAREHOUSE:
+            _resume_warehouse(pool)
+    except Exception as e:  # noqa: BLE001
+        # Warn on the first failure, not on every retry while Snowflake stays unreachable
+        first_failure = _state.snapshot()["last_error"] is None
+        _state.update(state="cold", connections=0, last_error=f"{type(e).__name__}: {e}"[:500])
+        logger.log(
+            logging.WARNING if first_failure else logging.DEBUG,
+            "[warmup] Snowflake warmup failed: %s", e,
+        )
+        return False
+
+    elapsed_ms = round((time.perf_counter() - t0) * 1000, 1)
+    if _state.snapshot()["state"] != "warm":
+        logger.info("[warmup] %d Snowflake session(s) warm in %.0fms", count, elapsed_ms)
+    _state.update(
+        state="warm",
+        connections=count,
+        warmed_at=time.time(),
+        last_duration_ms=elapsed_ms,
+        last_error=None,
+    )
+    return True
+
+
+def _resume_warehouse(pool) -> None:
+    try:
+        with pool.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(_RESUME_WAREHOUSE_SQL, (settings.SNOWFLAKE_WAREHOUSE,))
+            finally:
+                cur.close()
+    except Exception as e:  # noqa: BLE001
+        # Usually missing OPERATE privilege; the first real query resumes it instead
+        logger.debug("[warmup] Could not resume warehouse %s: %s", settings.SNOWFLAKE_WAREHOUSE, e)
+
+
+def _keepalive_loop() -> None:
+    # Resume the warehouse only until the startup warmup has succeeded; a
+    # periodic resume would keep it running (and billing) around the clock
+    started = warm_up(resume_warehouse=True)
+    while True:
+        warm = _state.snapshot()["state"] == "warm"
+        if _stop.wait(settings.SNOWFLAKE_KEEPALIVE_INTERVAL if warm else _RETRY_SECONDS):
+            return
+        if warm and get_snowflake_pool().stats()["in_use"] > 0:
+            continue  # in use right now — already hot
+        ok = warm_up(resume_warehouse=not started)
+        started = started or ok
+        if ok and warm:
+            _state.record_keepalive()
+
+
+def start_warmup() -> None:
+    """Warm the Snowflake pool in the background and keep it warm (idempotent per process)."""
+    global _thread
+    if not warmup_enabled():
+        _state.update(state="disabled")
+        return
+    with _thread_lock:
+        if _thread is not None and _thread.is_alive():
+            return
+        _stop.clear()
+        _thread = threading.Thread(target=_keepalive_loop, name="sf-warmup", daemon=True)
+        _thread.start()
+
+
+def stop_warmup() -> None:
+    """Stop the keepalive thread (called before the pool is closed)."""
+    _stop.set()
+
+
+def warmup_status() -> dict:
+    """Warm/cold state of the Snowflake read path plus the pool's open/idle counts."""
+    status = _state.snapshot()
+    if status["state"] != "disabled":
+        pool = get_snowflake_pool().stats()
+        status["pool"] = {"open": pool["open"], "idle": pool["idle"], "in_use": pool["in_use"]}
+    return status
@@ -0,0 +1,156 @@
+"""
+Shared, result-cache-friendly SQL templates for the analytics reads.
+
+Snowflake answers a repeated query from its persisted result cache (no
+warehouse time, no recompile) only when the query text is identical and
+contains no runtime functions such as CURRENT_TIMESTAMP(). So the
+templates here:
+
+  - bind every value (%(name)s) instead of interpolating it into the text
+  - measure "last N days" from a bound ``as_of``: the current time
+    truncated to a SNOWFLAKE_TIME_BUCKET_SECONDS bucket (time_bucket()),
+    so every call in the same bucket renders the same statement
+  - are registered once, by name, and shared by the API helpers
+    (app/utils/snowflake_utils.py) and the Celery metrics tasks
+    (worker/sync_tasks.py) — a risk read made by the API in the same
+    bucket as the risk task's is served from the task's result
+
+A cached result is dropped as soon as the underlying table changes, so
+bucketing only moves the edge of a window, never serves stale rows. Ages
+computed against ``as_of`` are corrected back to "now" with age_seconds().
+
+Usage:
+    from app.utils.sql_templates import ADHERENCE_WINDOW_SQL, time_bucket
+
+    cursor.execute(ADHERENCE_WINDOW_SQL, {"user_id": uid, "days": 7, "as_of": time_bucket()})
+"""
+
+import textwrap
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.config import settings
+
+SQL_TEMPLATES: dict[str, str] = {}
+
+
+def register(name: str, sql: str) -> str:
+    """Add *sql* to the registry under *name* and return its normalized text."""
+    sql = textwrap.dedent(sql).strip()
+    if SQL_TEMPLATES.get(name, sql) != sql:
+        raise ValueError(f"SQL template {name!r} is already registered with different text")
+    SQL_TEMPLATES[name] = sql
+    return sql
+
+
+def sql_template(name: str) -> str:
+    """The registered template *name* (KeyError if unknown)."""
+    return SQL_TEMPLATES[name]
+
+
+def time_bucket(now: Optional[datetime] = None) -> datetime:
+    """
+    *now* (default: the current UTC time) truncated to the configured
+    bucket. Bind it as ``as_of`` wherever a query needs the current time.
+    """
+    now = now or datetime.now(timezone.utc)
+    bucket = int(settings.SNOWFLAKE_TIME_BUCKET_SECONDS)
+    epoch = int(now.timestamp())
+    if bucket > 0:
+        epoch -= epoch % bucket
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+def age_seconds(age_at_bucket: Optional[float], as_of: datetime) -> Optional[float]:
+    """Turn an age measured against *as_of* into an age measured against now."""
+    if age_at_bucket is None:
+        return None
+    return age_at_bucket + max(0.0, (datetime.now(timezone.utc) - as_of).total_seconds())
+
+
+# ---------------------------------------------------------------------------
+# Templates shared by the API and the metrics tasks
+# ---------------------------------------------------------------------------
+
+# Check-in adherence over the *days* days before as_of
+ADHERENCE_WINDOW_SQL = register("adherence_window", """
+    SELECT
+        COUNT(*) AS total,
+        SUM(CASE WHEN completed THEN 1 ELSE 0 END) AS completed,
+        ROUND(100.0 * SUM(CASE WHEN completed THEN 1 ELSE 0 END) /
+              NULLIF(COUNT(*), 0), 2) AS adherence_pct
+    FROM fact_checkins
+    WHERE user_id = %(user_id)s
+    AND timestamp >= DATEADD(day, -%(days)s, %(as_of)s::TIMESTAMP_LTZ)
+""")
+
+# Inputs to the risk score: missed check-ins in the last 7 and 3 days, and
+# whole days since the last check-in (NULL when there is none)
+RISK_COUNTS_SQL = register("risk_counts", """
+    SELECT
+        COUNT(CASE WHEN completed = FALSE AND
+                   timestamp >= DATEADD(day, -7, %(as_of)s::TIMESTAMP_LTZ)
+              THEN 1 END) AS missed_7d,
+        COUNT(CASE WHEN completed = FALSE AND
+                   timestamp >= DATEADD(day, -3, %(as_of)s::TIMESTAMP_LTZ)
+              THEN 1 END) AS missed_3d,
+        DATEDIFF(day, MAX(timestamp), %(as_of)s::TIMESTAMP_LTZ) AS days_since_checkin
+    FROM fact_checkins
+    WHERE user_id = %(user_id)s
+""")
+
+
+def _adherence_merge_sql(column: str, with_counts: bool) -> str:
+    # The 7-day pass also stores the raw counts so the API can serve
+    # adherence from metrics_adherence (analytics_service)
+    counts = ["checkins_completed_7d", "checkins_total_7d"] if with_counts else []
+    set_counts = "".join(f", {c} = sa.{c}" for c in counts)
+    ins_counts = "".join(f", {c}" for c in counts)
+    val_counts = "".join(f", sa.{c}" for c in counts)
+    window = textwrap.indent(ADHERENCE_WINDOW_SQL, " " * 16)
+    return f"""
+        MERGE INTO metrics_adherence ma
+        USING (
+            SELECT
+                %(user_id)s AS user_id,
+                %(as_of)s::TIMESTAMP_LTZ::DATE AS metric_date,
+                w.adherence_pct AS adherence,
+                w.completed AS checkins_completed_7d,
+                w.total AS checkins_total_7d
+            FROM (
+{window}
+            ) w
+        ) sa
+        ON ma.user_id = sa.user_id AND ma.metric_date = sa.metric_date
+        WHEN MATCHED THEN UPDATE SET
+            {column} = sa.adherence{set_counts},
+            updated_at = CURRENT_TIMESTAMP()
+        WHEN NOT MATCHED THEN INSERT
+            (user_id, metric_date, {column}{ins_counts}, updated_at)
+            VALUES (sa.user_id, sa.metric_date, sa.adherence{val_counts}, CURRENT_TIMESTAMP())
+    """
+
+
+# {days: MERGE of that window's adherence into metrics_adherence}
+ADHERENCE_MERGE_SQL = {
+    days: register(f"adherence_merge_{days}d", _adherence_merge_sql(f"adherence_{days}d", days == 7))
+    for days in (7, 30, 90)
+}
+
+RISK_MERGE_SQL = register("risk_merge", """
+    MERGE INTO metrics_risk mr
+    USING (SELECT %(user_id)s AS user_id) sr
+    ON mr.user_id = sr.user_id
+    WHEN MATCHED THEN UPDATE SET
+        risk_level = %(risk_level)s,
+        risk_score = %(risk_score)s,
+        missed_count_7d = %(missed_7d)s,
+        missed_count_3d = %(missed_3d)s,
+        last_checkin_days_ago = %(days_since)s,
+        last_evaluated = CURRENT_TIMESTAMP()
+    WHEN NOT MATCHED THEN INSERT
+        (user_id, risk_level, risk_score, missed_count_7d,
+         missed_count_3d, last_checkin_days_ago)
+        VALUES (sr.user_id, %(risk_level)s, %(risk_score)s, %(missed_7d)s,
+                %(missed_3d)s, %(days_since)s)
+""")
@@ -6,8 +6,10 @@ MCP-compatible LLM) can fetch user and group context on demand.
 
 Tools:
   - get_user_summary      : profile, goals, completions, adherence, streak, risk
-  - get_user_goals        : per-goal breakdown with full check-in history
+  - get_user_goals        : per-goal breakdown with recent check-in history
+  - get_goal_history      : one page of a goal's full completion history
   - get_group_members     : all members of a group with their summaries
+  - get_groups_members    : the same for several groups in one call
   - get_group_context     : pre-formatted plain-text context string for a group
 
 Run with:
@@ -104,8 +106,9 @@ def get_user_goals(user_id: str) -> str:
     Fetch a detailed per-goal breakdown for a user.
 
     For each goal returns: title, frequency, total check-ins, completed count,
-    missed count, completion rate (%), and the full check-in history with
-    timestamps and completion status.
+    missed count, completion rate (%), first/last completion dates, and the
+    most recent check-ins with timestamps and completion status. Use
+    get_goal_history to page further back.
 
     Use this when the user asks for detailed goal-level analysis, trends over
     time, or which specific goals they are struggling with.
@@ -120,6 +123,31 @@ def get_user_goals(user_id: str) -> str:
         return str(e)
 
 
+@mcp.tool()
+def get_goal_history(user_id: str, goal_id: str, limit: int = 50, offset: int = 0) -> str:
+    """
+    Fetch one page of a goal's completion history, newest first.
+
+    Returns {goal_id, total, limit, offset, completions}. Use this only when
+    the recent history from get_user_goals is not enough — e.g. the user asks
+    about a specific period months ago.
+
+    Args:
+        user_id: The UUID of the user who owns the goal.
+        goal_id: The UUID of the goal (from get_user_goals).
+        limit:   Page size (max 500).
+        offset:  Number of most-recent completions to skip.
+    """
+    try:
+        data = _get(
+            f"/snowflake/user/{user_id}/goals/{goal_id}/completions"
+            f"?limit={limit}&offset={offset}"
+        )
+        return json.dumps(data, indent=2, default=str)
+    except RuntimeError as e:
+        return str(e)
+
+
 @mcp.tool()
 def get_group_members(group_id: str) -> str:
     """
@@ -142,6 +170,28 @@ def get_group_members(group_id: str) -> str:
         return str(e)
 
 
+@mcp.tool()
+def get_groups_members(group_ids: list[str]) -> str:
+    """
+    Fetch structured member data for several groups at once.
+
+    Returns a JSON object mapping each group_id to the same structure
+    get_group_members returns. Prefer this over calling get_group_members
+    repeatedly when you need more than one group (e.g. a mentor's or
+    coach's groups).
+
+    Args:
+        group_ids: UUIDs of the groups (from Supabase groups table), at most 50.
+    """
+    try:
+        import urllib.parse
+        query = urllib.parse.urlencode([("group_ids", g) for g in group_ids])
+        data = _get(f"/snowflake/groups/members?{query}")
+        return json.dumps(data, indent=2, default=str)
+    except RuntimeError as e:
+        return str(e)
+
+
 @mcp.tool()
 def get_group_context(group_id: str) -> str:
     """
@@ -0,0 +1,37 @@
+"""Print Snowflake spend by QUERY_TAG (route / task, user / group scope) from QUERY_HISTORY."""
+
+import argparse
+
+from app.utils.query_tags import MAX_REPORT_HOURS, credit_report
+
+
+def print_report(hours: int, by: str, limit: int):
+    """
+    Print the most expensive tags over the last *hours*.
+
+    Same data as GET /snowflake/queries/credits; see credit_report for how
+    credits are estimated.
+    """
+    rows = credit_report(hours=hours, by=by)
+    if not rows:
+        print(f"No Snowflake queries in the last {hours}h.")
+        return
+
+    total_credits = sum(r["est_credits"] for r in rows) or 1.0
+    print(f"Snowflake usage by {by}, last {hours}h ({len(rows)} tags)\n")
+    print(f"{'credits':>9} {'share':>6} {'queries':>8} {'failed':>6} {'exec s':>9} {'GB scanned':>11}  {by}")
+    for r in rows[:limit]:
+        print(
+            f"{r['est_credits']:>9.4f} {100 * r['est_credits'] / total_credits:>5.1f}% "
+            f"{r['queries']:>8} {r['failed']:>6} {r['execution_s']:>9.1f} "
+            f"{r['bytes_scanned'] / 1e9:>11.3f}  {r[by]}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hours", type=int, default=24, help=f"look-back window (max {MAX_REPORT_HOURS})")
+    parser.add_argument("--by", choices=("feature", "scope", "tag"), default="feature")
+    parser.add_argument("--limit", type=int, default=30, help="rows to print")
+    args = parser.parse_args()
+    print_report(args.hours, args.by, args.limit)
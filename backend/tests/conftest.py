@@ -0,0 +1,75 @@
+"""
+Shared fixtures for the app tests.
+
+``fake_snowflake`` stands in for a snowflake-connector connection: its
+cursors record every statement instead of reaching an account.
+"""
+
+import pytest
+from snowflake.connector.errors import OperationalError
+
+
+class FakeSnowflakeCursor:
+    def __init__(self, conn: "FakeSnowflakeConnection"):
+        self.conn = conn
+        self.sfqid = "q1"
+        self.rowcount = 0
+
+    def execute(self, sql, params=()):
+        if self.conn.broken:
+            raise OperationalError(msg="connection reset")
+        self.conn.executed.append((" ".join(sql.split()), params or ()))
+
+    execute_async = execute
+
+    def get_results_from_sfqid(self, sfqid):
+        pass
+
+    def fetchone(self):
+        return self.conn.rows[0] if self.conn.rows else None
+
+    def fetchall(self):
+        return list(self.conn.rows)
+
+    def close(self):
+        pass
+
+
+class FakeSnowflakeConnection:
+    """
+    Records [(sql, params)] run by its cursors in *executed*, whitespace
+    collapsed; pass one list to several connections to share the log.
+    Every query returns *rows*. Setting *broken* makes execute raise
+    OperationalError, like a dropped session.
+    """
+
+    def __init__(self, executed: list = None, rows: list = None):
+        self.executed = executed if executed is not None else []
+        self.rows = [(1,)] if rows is None else rows
+        self.closed = False
+        self.broken = False
+
+    @property
+    def statements(self) -> list:
+        return [sql for sql, _ in self.executed]
+
+    def cursor(self):
+        return FakeSnowflakeCursor(self)
+
+    def get_query_status_throw_if_error(self, sfqid):
+        return "SUCCESS"
+
+    def is_still_running(self, status):
+        return False
+
+    def is_closed(self):
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_snowflake():
+    """FakeSnowflakeConnection, for tests to build connections with."""
+    return FakeSnowflakeConnection
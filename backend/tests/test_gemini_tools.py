@@ -0,0 +1,30 @@
+"""
+Unit tests for Gemini tool dispatch (app/services/gemini_service.py).
+The Snowflake service calls are mocked.
+"""
+
+from unittest.mock import patch
+
+from app.services import snowflake_service
+from app.services.gemini_service import _dispatch_tool
+
+
+class TestGroupContextTool:
+    def test_uses_the_cached_context_build(self):
+        with patch.object(
+            snowflake_service, "build_group_context_string", return_value=("context", "Group"),
+        ) as build, patch.object(snowflake_service, "iter_group_context") as stream:
+            assert _dispatch_tool("get_group_context", {"group_id": "g1"}) == "context"
+        build.assert_called_once_with("g1")
+        stream.assert_not_called()
+
+    def test_errors_are_returned_to_the_model(self):
+        with patch.object(
+            snowflake_service, "build_group_context_string", side_effect=RuntimeError("down"),
+        ):
+            assert _dispatch_tool("get_group_context", {"group_id": "g1"}) == (
+                "Tool error (get_group_context): down"
+            )
+
+    def test_unknown_tool(self):
+        assert _dispatch_tool("nope", {}) == "Unknown tool: nope"
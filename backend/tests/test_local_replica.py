@@ -0,0 +1,74 @@
+"""
+Unit tests for the worker-side metrics mirror of the local DuckDB replica
+(app/utils/local_replica.py).
+"""
+
+from unittest.mock import MagicMock, patch
+
+import duckdb
+import pytest
+
+from app.config import settings
+from app.utils import local_replica
+from app.utils.local_replica import mirror_metrics_tables
+
+
+def _sf_cursor(rows: list[tuple]) -> MagicMock:
+    cursor = MagicMock()
+    cursor.fetchall.return_value = rows
+    user_id, risk_score = MagicMock(type_code=2, scale=None), MagicMock(type_code=0, scale=2)
+    user_id.name, risk_score.name = "USER_ID", "RISK_SCORE"  # TEXT, FIXED(.., 2)
+    cursor.description = [user_id, risk_score]
+    return cursor
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch):
+    path = str(tmp_path / "replica.duckdb")
+    monkeypatch.setattr(settings, "DUCKDB_REPLICA_PATH", path)
+    monkeypatch.setattr(local_replica, "replica_configured", lambda: True)
+    return path
+
+
+class TestMirrorMetricsTables:
+    def test_copies_and_publishes(self, replica):
+        assert mirror_metrics_tables(_sf_cursor([("u1", 0.5)]), ("metrics_risk",)) is True
+
+        conn = duckdb.connect(replica, read_only=True)
+        try:
+            assert conn.execute("SELECT user_id, risk_score FROM metrics_risk").fetchall() == [("u1", 0.5)]
+        finally:
+            conn.close()
+
+    def test_reports_a_locked_working_copy(self, replica):
+        locked = duckdb.IOException("Could not set lock on file")
+        with patch.object(local_replica.ReplicaWriter, "_connection", side_effect=locked):
+            assert mirror_metrics_tables(_sf_cursor([("u1", 0.5)]), ("metrics_risk",)) is False
+
+    def test_other_copy_errors_are_best_effort(self, replica):
+        cursor = _sf_cursor([])
+        cursor.execute.side_effect = RuntimeError("warehouse suspended")
+        assert mirror_metrics_tables(cursor, ("metrics_risk",)) is True
+
+    def test_no_replica_configured(self, monkeypatch):
+        monkeypatch.setattr(local_replica, "replica_configured", lambda: False)
+        cursor = MagicMock()
+        assert mirror_metrics_tables(cursor, ("metrics_risk",)) is True
+        cursor.execute.assert_not_called()
+
+
+class TestUpsert:
+    def test_composite_key_keeps_rows_sharing_one_column(self, tmp_path):
+        writer = local_replica.ReplicaWriter(str(tmp_path / "replica.duckdb"))
+        rows = [
+            {"group_id": "g1", "user_id": "u1", "role": "member"},
+            {"group_id": "g2", "user_id": "u1", "role": "member"},
+        ]
+        try:
+            writer.upsert("fact_group_members", rows, ["group_id", "user_id"])
+            writer.upsert("fact_group_members", [dict(rows[0], role="admin")], ["group_id", "user_id"])
+            assert writer._connection().execute(
+                "SELECT group_id, role FROM fact_group_members ORDER BY group_id"
+            ).fetchall() == [("g1", "admin"), ("g2", "member")]
+        finally:
+            writer.close()
@@ -0,0 +1,126 @@
+"""
+Unit tests for SQL fingerprinting and the per-fingerprint stats
+(app/utils/query_metrics.py).
+"""
+
+import pytest
+
+from app.utils.query_metrics import QueryStats, fingerprint, normalize_sql
+
+
+def _entry(sql: str, elapsed_ms: float, **overrides) -> dict:
+    fp, normalized = fingerprint(sql)
+    entry = {
+        "sfqid": None, "fingerprint": fp, "sql": normalized,
+        "elapsed_ms": elapsed_ms, "rows": 1, "bytes": None,
+        "caller": "app.test", "error": None, "at": 0.0,
+    }
+    entry.update(overrides)
+    return entry
+
+
+# ---------------------------------------------------------------------------
+# normalize_sql
+# ---------------------------------------------------------------------------
+
+class TestNormalizeSql:
+    @pytest.mark.parametrize("sql", [
+        "SELECT * FROM t WHERE id = %s",
+        "SELECT * FROM t WHERE id = %(user_id)s",
+        "SELECT * FROM t WHERE id = ?",
+        "SELECT * FROM t WHERE id = :1",
+        "SELECT * FROM t WHERE id = 'abc'",
+        "SELECT * FROM t WHERE id = 42",
+        "SELECT * FROM t WHERE id = -4.5",
+    ])
+    def test_literals_and_binds_become_placeholders(self, sql):
+        assert normalize_sql(sql) == "SELECT * FROM t WHERE id = ?"
+
+    def test_quotes_escaped_inside_strings(self):
+        assert normalize_sql("SELECT 'it''s', 'x' FROM t") == "SELECT ?, ? FROM t"
+
+    def test_identifiers_with_digits_are_kept(self):
+        assert normalize_sql("SELECT adherence_7d, t1.col2 FROM t1") == (
+            "SELECT adherence_7d, t1.col2 FROM t1"
+        )
+
+    def test_casts_are_not_binds(self):
+        assert normalize_sql("SELECT value::VARCHAR FROM t") == "SELECT value::VARCHAR FROM t"
+
+    @pytest.mark.parametrize("in_list", ["%s", "%s, %s", "%s,%s,%s", "'a', 'b'", "1, 2, 3"])
+    def test_in_lists_of_any_length_collapse(self, in_list):
+        assert normalize_sql(f"SELECT * FROM t WHERE id IN ({in_list})") == (
+            "SELECT * FROM t WHERE id IN (?...)"
+        )
+
+    def test_in_list_keeps_its_keyword_case(self):
+        assert normalize_sql("select * from t where id in (%s, %s)") == (
+            "select * from t where id in (?...)"
+        )
+
+    def test_function_arguments_are_not_in_lists(self):
+        assert normalize_sql("SELECT COALESCE(%s, %s)") == "SELECT COALESCE(?, ?)"
+
+    def test_id_temp_tables_collapse(self):
+        a = "SELECT id FROM tmp_ids_" + "0" * 32
+        b = "SELECT id FROM tmp_ids_" + "f" * 32
+        assert normalize_sql(a) == normalize_sql(b) == "SELECT id FROM tmp_ids_?"
+
+    def test_whitespace_and_trailing_semicolon(self):
+        assert normalize_sql("\n  SELECT  *\n\tFROM t ;  ") == "SELECT * FROM t"
+
+
+# ---------------------------------------------------------------------------
+# fingerprint
+# ---------------------------------------------------------------------------
+
+class TestFingerprint:
+    def test_same_shape_same_fingerprint(self):
+        a, _ = fingerprint("SELECT * FROM t WHERE id IN (%s) AND d > '2024-01-01'")
+        b, _ = fingerprint("SELECT *\nFROM t\nWHERE id IN (%s, %s, %s) AND d > '2025-06-30';")
+        assert a == b
+
+    def test_different_shape_different_fingerprint(self):
+        a, _ = fingerprint("SELECT * FROM t WHERE id = %s")
+        b, _ = fingerprint("SELECT * FROM u WHERE id = %s")
+        assert a != b
+
+    def test_returns_normalized_text(self):
+        fp, normalized = fingerprint("SELECT 1")
+        assert normalized == "SELECT ?"
+        assert len(fp) == 16 and int(fp, 16) >= 0
+
+
+# ---------------------------------------------------------------------------
+# QueryStats
+# ---------------------------------------------------------------------------
+
+class TestQueryStats:
+    def test_variants_of_one_statement_aggregate_together(self):
+        stats = QueryStats(window=10)
+        stats.record(_entry("SELECT * FROM t WHERE id = 1", 5.0))
+        stats.record(_entry("SELECT * FROM t WHERE id = 2", 15.0, error="ProgrammingError"))
+
+        (agg,) = stats.summary()
+        assert agg["count"] == 2
+        assert agg["errors"] == 1
+        assert agg["total_ms"] == 20.0
+        assert agg["max_ms"] == 15.0
+        assert agg["avg_ms"] == 10.0
+
+    def test_histogram_is_cumulative(self):
+        stats = QueryStats(window=10)
+        for ms in (5.0, 20.0, 20.0, 99999.0):
+            stats.record(_entry("SELECT 1", ms))
+
+        buckets = {b["le_ms"]: b["count"] for b in stats.summary()[0]["buckets"]}
+        assert buckets[10] == 1
+        assert buckets[25] == 3
+        assert buckets[30000] == 3
+        assert buckets["+Inf"] == 4
+
+    def test_slowest_uses_the_rolling_window(self):
+        stats = QueryStats(window=2)
+        for ms in (50.0, 10.0, 20.0):
+            stats.record(_entry("SELECT 1", ms))
+        assert [e["elapsed_ms"] for e in stats.slowest()] == [20.0, 10.0]
@@ -0,0 +1,243 @@
+"""
+Unit tests for the version-keyed result cache (app/utils/result_cache.py).
+
+Redis is switched off (no REDIS_URL), so only the in-process tier and the
+local part of the data version are exercised.
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.config import settings
+from app.utils import result_cache
+from app.utils.result_cache import ResultCache, bump_data_version, cached, data_version
+
+
+@pytest.fixture(autouse=True)
+def _local_cache(monkeypatch):
+    """A fresh in-process cache per test, no Redis."""
+    monkeypatch.setattr(settings, "REDIS_URL", "")
+    monkeypatch.setattr(settings, "SNOWFLAKE_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "SNOWFLAKE_CACHE_VERSION_CHECK_SECONDS", 60.0)
+    cache = ResultCache(max_entries=16, ttl=60.0)
+    monkeypatch.setattr(result_cache, "get_result_cache", lambda: cache)
+    monkeypatch.setattr(result_cache, "_version_cache", (0.0, ""))
+    return cache
+
+
+def _counting(namespace: str = "test"):
+    calls = []
+
+    @cached(namespace)
+    def fn(*args, **kwargs):
+        calls.append((args, kwargs))
+        return {"n": len(calls)}
+
+    return fn, calls
+
+
+# ---------------------------------------------------------------------------
+# Keys
+# ---------------------------------------------------------------------------
+
+class TestKeys:
+    def test_same_arguments_hit(self):
+        fn, calls = _counting()
+        assert fn("u1", limit=5) == fn("u1", limit=5)
+        assert len(calls) == 1
+
+    def test_keyword_order_does_not_matter(self):
+        fn, calls = _counting()
+        fn("u1", a=1, b=2)
+        fn("u1", b=2, a=1)
+        assert len(calls) == 1
+
+    def test_different_arguments_miss(self):
+        fn, calls = _counting()
+        fn("u1")
+        fn("u2")
+        fn("u1", limit=5)
+        assert len(calls) == 3
+
+    def test_namespaces_are_separate(self):
+        fn_a, calls_a = _counting("a")
+        fn_b, calls_b = _counting("b")
+        fn_a("u1")
+        fn_b("u1")
+        assert len(calls_a) == len(calls_b) == 1
+
+    def test_positional_keyword_and_default_calls_share_an_entry(self):
+        calls = []
+
+        @cached("detail")
+        def fn(user_id, history_limit=30):
+            calls.append((user_id, history_limit))
+            return {"n": len(calls)}
+
+        fn("u1")
+        fn("u1", 30)
+        fn("u1", history_limit=30)
+        fn(user_id="u1")
+        assert calls == [("u1", 30)]
+        assert result_cache.get_result_cache().stats()["entries"] == 1
+
+        fn("u1", 10)
+        assert len(calls) == 2
+
+    def test_arguments_that_do_not_fit_still_raise(self):
+        @cached("detail")
+        def fn(user_id):
+            return {"user": user_id}
+
+        with pytest.raises(TypeError):
+            fn("u1", "extra")
+
+    def test_hits_are_copies(self):
+        fn, _ = _counting()
+        fn("u1")["n"] = 99
+        assert fn("u1") == {"n": 1}
+
+
+# ---------------------------------------------------------------------------
+# Invalidation
+# ---------------------------------------------------------------------------
+
+class TestInvalidation:
+    def test_version_bump_invalidates(self):
+        fn, calls = _counting()
+        before = data_version()
+        fn("u1")
+        bump_data_version("test")
+
+        assert data_version() != before
+        assert fn("u1") == {"n": 2}
+        assert len(calls) == 2
+
+    def test_entries_expire_after_ttl(self):
+        cache = ResultCache(max_entries=4, ttl=0.01)
+        cache.set("k", {"v": 1})
+        assert cache.get("k") == {"v": 1}
+        time.sleep(0.02)
+        assert cache.get("k") is None
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResultCache(max_entries=2, ttl=60.0)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        assert cache.stats()["evictions"] == 1
+
+    def test_exceptions_are_not_cached(self):
+        calls = []
+
+        @cached("failing")
+        def fn():
+            calls.append(1)
+            raise RuntimeError("snowflake down")
+
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                fn()
+        assert len(calls) == 2
+
+
+# ---------------------------------------------------------------------------
+# Async wrapper
+# ---------------------------------------------------------------------------
+
+class TestAsync:
+    def test_stale_version_is_read_off_the_event_loop(self):
+        threads = []
+
+        def fake_version():
+            threads.append(threading.current_thread())
+            return "7.0"
+
+        @cached("async")
+        async def fn(user_id):
+            return {"user": user_id}
+
+        async def run():
+            return await fn("u1"), threading.current_thread()
+
+        with patch.object(result_cache, "data_version", fake_version):
+            result, loop_thread = asyncio.run(run())
+
+        assert result == {"user": "u1"}
+        assert threads and all(t is not loop_thread for t in threads)
+
+    def test_fresh_version_needs_no_thread_hop(self):
+        data_version()  # now fresh
+
+        @cached("async")
+        async def fn(user_id):
+            return {"user": user_id}
+
+        with patch.object(result_cache.asyncio, "to_thread") as to_thread:
+            assert asyncio.run(fn("u1")) == {"user": "u1"}
+        to_thread.assert_not_called()
+
+    def test_sync_and_async_share_entries(self):
+        calls = []
+
+        @cached("shared")
+        def sync_fn(user_id):
+            calls.append("sync")
+            return {"user": user_id}
+
+        @cached("shared")
+        async def async_fn(user_id):
+            calls.append("async")
+            return {"user": user_id}
+
+        sync_fn("u1")
+        assert asyncio.run(async_fn("u1")) == {"user": "u1"}
+        assert calls == ["sync"]
+
+    def test_sync_default_and_async_keyword_share_entries(self):
+        calls = []
+
+        @cached("shared")
+        def sync_fn(user_id, history_limit=30):
+            calls.append("sync")
+            return {"user": user_id}
+
+        @cached("shared")
+        async def async_fn(user_id, history_limit=30):
+            calls.append("async")
+            return {"user": user_id}
+
+        sync_fn("u1")
+        asyncio.run(async_fn("u1", history_limit=30))
+        sync_fn("u1", 30)
+        assert calls == ["sync"]
+
+
+# ---------------------------------------------------------------------------
+# Group batch keys
+# ---------------------------------------------------------------------------
+
+class TestGroupBatchKey:
+    def test_order_and_duplicates_share_an_entry(self):
+        from app.services import snowflake_service as svc
+
+        def build(group_ids):
+            return {g: {"group_id": g} for g in group_ids}
+
+        with patch.object(svc, "_sf_group_snapshots_batch", return_value={}), \
+             patch.object(svc, "build_group_member_summaries_batch", side_effect=build) as built:
+            first = svc.get_group_member_summaries_batch(["g2", "g1"])
+            second = svc.get_group_member_summaries_batch(["g1", "g2", "g1"])
+
+        built.assert_called_once_with(["g1", "g2"])
+        # Each caller still gets its own request order
+        assert list(first) == ["g2", "g1"]
+        assert list(second) == ["g1", "g2"]
@@ -0,0 +1,119 @@
+"""
+Unit tests for large id lists in the batched Snowflake queries
+(app/services/snowflake_service.py): above SNOWFLAKE_IN_LIST_THRESHOLD the
+ids are loaded into a session temp table instead of the statement text.
+"""
+
+import asyncio
+import json
+from contextlib import asynccontextmanager, contextmanager
+from unittest.mock import patch
+
+import pytest
+
+from app.config import settings
+from app.services import snowflake_service as svc
+
+
+class _FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+        self.log = conn.executed
+
+    @contextmanager
+    def connection(self):
+        yield self.conn
+
+    @asynccontextmanager
+    async def connection_async(self):
+        yield self.conn
+
+
+@pytest.fixture
+def pool(monkeypatch, fake_snowflake):
+    monkeypatch.setattr(settings, "SNOWFLAKE_IN_LIST_THRESHOLD", 3)
+    monkeypatch.setattr(svc, "_ID_TABLE_CHUNK", 2)
+    monkeypatch.setattr(svc, "use_local_replica", lambda: False)
+    fake = _FakePool(fake_snowflake(rows=[]))
+    with patch.object(svc, "get_snowflake_pool", return_value=fake), \
+         patch("app.utils.snowflake_async.get_snowflake_pool", return_value=fake):
+        yield fake
+
+
+def _ids(n: int) -> list[str]:
+    return [f"00000000-0000-0000-0000-{i:012d}" for i in range(n)]
+
+
+class TestIdList:
+    def test_small_lists_use_placeholders(self, pool):
+        sql, params = svc._id_list(_ids(3))
+        assert sql == "%s, %s, %s"
+        assert params == tuple(_ids(3))
+
+    def test_large_lists_read_a_temp_table(self, pool):
+        sql, params = svc._id_list(_ids(4))
+        (table,) = params
+        assert isinstance(table, svc._IdTable)
+        assert sql == f"SELECT id FROM {table.name}"
+        assert table.ids == _ids(4)
+
+    def test_statement_size_does_not_grow_with_ids(self, pool):
+        small, _ = svc._profiles_batch_sql(_ids(4))
+        large, _ = svc._profiles_batch_sql(_ids(5000))
+        assert len(small) == len(large)
+
+    def test_completions_select_goals_by_owner(self, pool):
+        sql, params = svc._completions_batch_sql(_ids(2), recent_limit=5)
+        assert "goal_id IN (SELECT id FROM dim_goals WHERE user_id IN (%s, %s))" in sql
+        assert params == (5, *_ids(2))
+
+
+class TestQuery:
+    def _assert_temp_table_round_trip(self, log, ids):
+        create, *inserts, query, drop = log
+        name = create[0].split()[-3]
+        assert create[0] == f"CREATE TEMPORARY TABLE {name} (id VARCHAR)"
+
+        # Chunked loads; the ids travel only in the INSERT binds
+        assert len(inserts) == 3
+        loaded = []
+        for sql, (payload,) in inserts:
+            assert sql.startswith(f"INSERT INTO {name} SELECT value::VARCHAR")
+            loaded.extend(json.loads(payload))
+        assert loaded == ids
+
+        assert f"SELECT id FROM {name}" in query[0]
+        assert not any(i in query[0] for i in ids)
+        assert drop == (f"DROP TABLE IF EXISTS {name}", ())
+        return query
+
+    def test_sync_query_loads_and_drops_the_temp_table(self, pool):
+        ids = _ids(5)
+        svc._sf_check_ins_batch(ids, limit_per_user=7)
+        query = self._assert_temp_table_round_trip(pool.log, ids)
+        # The marker is taken out; the other binds keep their order
+        assert query[1] == (7,)
+
+    def test_async_query_loads_and_drops_the_temp_table(self, pool):
+        ids = _ids(5)
+        asyncio.run(svc._sf_profiles_batch_async(ids))
+        query = self._assert_temp_table_round_trip(pool.log, ids)
+        assert query[1] == ()
+
+    def test_temp_table_is_dropped_when_the_query_fails(self, pool):
+        cursor_cls = type(pool.conn.cursor())
+        original = cursor_cls.execute
+
+        def execute(self, sql, params=()):
+            original(self, sql, params)
+            if sql.lstrip().startswith("SELECT"):
+                raise RuntimeError("boom")
+
+        with patch.object(cursor_cls, "execute", execute):
+            with pytest.raises(RuntimeError):
+                svc._query(*svc._profiles_batch_sql(_ids(4)))
+        assert pool.log[-1][0].startswith("DROP TABLE IF EXISTS tmp_ids_")
+
+    def test_small_lists_run_a_single_statement(self, pool):
+        svc._sf_profiles_batch(_ids(2))
+        assert len(pool.log) == 1
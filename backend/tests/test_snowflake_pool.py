@@ -0,0 +1,221 @@
+"""
+Unit tests for SnowflakeConnectionPool (app/database.py).
+
+The pool is given a fake ``connect`` — no Snowflake account required.
+"""
+
+import threading
+import time
+
+import pytest
+from snowflake.connector.errors import OperationalError, ProgrammingError
+
+from app.database import SnowflakeConnectionPool
+
+
+@pytest.fixture
+def make_pool(fake_snowflake):
+    """Build a pool over fake connections; returns it plus the list of every connection it opened."""
+    def build(**kwargs) -> tuple[SnowflakeConnectionPool, list]:
+        opened = []
+
+        def connect():
+            conn = fake_snowflake()
+            opened.append(conn)
+            return conn
+
+        kwargs.setdefault("timeout", 1.0)
+        return SnowflakeConnectionPool(connect=connect, **kwargs), opened
+    return build
+
+
+# ---------------------------------------------------------------------------
+# Reuse and exhaustion
+# ---------------------------------------------------------------------------
+
+class TestCheckout:
+    def test_returned_connection_is_reused(self, make_pool):
+        pool, opened = make_pool(max_size=2)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            pass
+
+        assert second is first
+        assert len(opened) == 1
+        assert pool.stats()["checkouts"] == 2
+        assert pool.stats()["idle"] == 1
+
+    def test_times_out_when_exhausted(self, make_pool):
+        pool, opened = make_pool(max_size=1, timeout=0.05)
+        with pool.connection():
+            with pytest.raises(TimeoutError):
+                with pool.connection():
+                    pass
+
+        assert len(opened) == 1
+        assert pool.stats()["timeouts"] == 1
+        assert pool.stats()["in_use"] == 0
+
+    def test_waiter_gets_connection_when_released(self, make_pool):
+        pool, opened = make_pool(max_size=1, timeout=2.0)
+        held = threading.Event()
+        release = threading.Event()
+
+        def holder():
+            with pool.connection():
+                held.set()
+                release.wait(1.0)
+
+        t = threading.Thread(target=holder)
+        t.start()
+        held.wait(1.0)
+        threading.Timer(0.05, release.set).start()
+        with pool.connection() as conn:
+            assert conn is opened[0]
+        t.join()
+
+        assert pool.stats()["waits"] == 1
+        assert len(opened) == 1
+
+    def test_failed_connect_frees_its_slot(self):
+        def connect():
+            raise OperationalError(msg="login failed")
+
+        pool = SnowflakeConnectionPool(connect=connect, max_size=1, timeout=0.05)
+        for _ in range(2):
+            with pytest.raises(OperationalError):
+                with pool.connection():
+                    pass
+        assert pool.stats()["open"] == 0
+
+
+# ---------------------------------------------------------------------------
+# Eviction and health checks
+# ---------------------------------------------------------------------------
+
+class TestEviction:
+    def test_idle_connections_past_idle_timeout_are_closed(self, make_pool):
+        pool, opened = make_pool(max_size=2, idle_timeout=0.01)
+        with pool.connection():
+            pass
+        time.sleep(0.02)
+
+        assert pool.evict_idle() == 1
+        assert opened[0].closed
+        assert pool.stats()["open"] == 0
+
+    def test_connection_past_max_lifetime_is_not_returned(self, make_pool):
+        pool, opened = make_pool(max_size=2, max_lifetime=0.01)
+        with pool.connection():
+            time.sleep(0.02)
+        with pool.connection() as conn:
+            pass
+
+        assert opened[0].closed
+        assert conn is opened[1]
+
+    def test_failed_health_check_discards_and_reconnects(self, make_pool):
+        pool, opened = make_pool(max_size=1, ping_after=0.0)
+        with pool.connection():
+            pass
+        opened[0].broken = True
+
+        with pool.connection() as conn:
+            assert conn is opened[1]
+
+        assert opened[0].closed
+        assert pool.stats()["health_check_failures"] == 1
+
+    def test_closed_idle_connection_is_replaced(self, make_pool):
+        pool, opened = make_pool(max_size=1)
+        with pool.connection():
+            pass
+        opened[0].closed = True
+
+        with pool.connection() as conn:
+            assert conn is opened[1]
+
+
+# ---------------------------------------------------------------------------
+# Errors raised by borrowers
+# ---------------------------------------------------------------------------
+
+class TestReleaseOnError:
+    def test_session_error_discards_connection(self, make_pool):
+        pool, opened = make_pool(max_size=1)
+        with pytest.raises(OperationalError):
+            with pool.connection():
+                raise OperationalError(msg="socket closed")
+
+        assert opened[0].closed
+        assert pool.stats()["discarded_on_error"] == 1
+        with pool.connection() as conn:
+            assert conn is opened[1]
+
+    def test_sql_error_keeps_connection(self, make_pool):
+        pool, opened = make_pool(max_size=1)
+        with pytest.raises(ProgrammingError):
+            with pool.connection():
+                raise ProgrammingError(msg="invalid identifier")
+
+        assert not opened[0].closed
+        with pool.connection() as conn:
+            assert conn is opened[0]
+
+    def test_application_error_keeps_connection(self, make_pool):
+        pool, opened = make_pool(max_size=1)
+        with pytest.raises(ValueError):
+            with pool.connection():
+                raise ValueError("bad row")
+
+        assert not opened[0].closed
+        assert pool.stats()["idle"] == 1
+
+
+# ---------------------------------------------------------------------------
+# close()
+# ---------------------------------------------------------------------------
+
+class TestClose:
+    def test_close_with_connections_checked_out(self, make_pool):
+        pool, opened = make_pool(max_size=2)
+        with pool.connection():
+            pass  # opened[0] goes back to idle
+        with pool.connection() as held:
+            assert held is opened[0]
+            with pool.connection():
+                pass  # opened[1] idle
+            pool.close()
+            assert opened[1].closed       # idle ones close immediately
+            assert not held.closed        # the borrowed one is left alone
+
+        # ...and is closed, not pooled, when it comes back
+        assert held.closed
+        stats = pool.stats()
+        assert stats["closed"] and stats["open"] == 0
+
+        with pytest.raises(RuntimeError):
+            with pool.connection():
+                pass
+
+    def test_close_wakes_waiters(self, make_pool):
+        pool, _ = make_pool(max_size=1, timeout=5.0)
+        errors = []
+
+        def waiter():
+            try:
+                with pool.connection():
+                    pass
+            except Exception as e:  # noqa: BLE001
+                errors.append(e)
+
+        with pool.connection():
+            t = threading.Thread(target=waiter)
+            t.start()
+            time.sleep(0.05)
+            pool.close()
+            t.join(1.0)
+
+        assert not t.is_alive()
+        assert len(errors) == 1 and isinstance(errors[0], RuntimeError)
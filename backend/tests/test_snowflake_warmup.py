@@ -0,0 +1,89 @@
+"""
+Unit tests for the Snowflake warmup / keepalive (app/utils/snowflake_warmup.py).
+
+The pool is a real SnowflakeConnectionPool over fake connections that
+record the statements they run.
+"""
+
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from app.config import settings
+from app.database import SnowflakeConnectionPool
+from app.utils import snowflake_warmup
+
+
+@pytest.fixture
+def executed(monkeypatch, fake_snowflake):
+    """Every statement the warmup runs, across the pool's connections."""
+    executed: list = []
+    pool = SnowflakeConnectionPool(connect=lambda: fake_snowflake(executed), max_size=2)
+    monkeypatch.setattr(settings, "SNOWFLAKE_WAREHOUSE", "ANALYTICS_WH")
+    monkeypatch.setattr(settings, "SNOWFLAKE_WARMUP_CONNECTIONS", 2)
+    monkeypatch.setattr(snowflake_warmup, "_state", snowflake_warmup._WarmupState())
+    with patch.object(snowflake_warmup, "get_snowflake_pool", return_value=pool):
+        yield executed
+
+
+def _statements(executed: list) -> list:
+    return [sql for sql, _ in executed]
+
+
+def _resumes(executed: list) -> int:
+    return sum("RESUME" in sql for sql in _statements(executed))
+
+
+class TestWarmUp:
+    def test_startup_warmup_resumes_the_warehouse(self, executed):
+        assert snowflake_warmup.warm_up(resume_warehouse=True)
+        assert _statements(executed).count("SELECT 1") == 2
+        assert _resumes(executed) == 1
+        assert snowflake_warmup.warmup_status()["ready"]
+
+    def test_rewarm_only_pings(self, executed):
+        assert snowflake_warmup.warm_up()
+        assert _statements(executed) == ["SELECT 1", "SELECT 1"]
+
+
+class TestKeepaliveLoop:
+    def _run(self, monkeypatch, warm_ups: int) -> None:
+        """Run the loop until warm_up has been called *warm_ups* times."""
+        monkeypatch.setattr(settings, "SNOWFLAKE_KEEPALIVE_INTERVAL", 0.001)
+        monkeypatch.setattr(snowflake_warmup, "_RETRY_SECONDS", 0.001)
+        stop = threading.Event()
+        monkeypatch.setattr(snowflake_warmup, "_stop", stop)
+        real = snowflake_warmup.warm_up
+        calls = []
+
+        def counting(*args, **kwargs):
+            calls.append(kwargs)
+            result = real(*args, **kwargs)
+            if len(calls) >= warm_ups:
+                stop.set()
+            return result
+
+        monkeypatch.setattr(snowflake_warmup, "warm_up", counting)
+        snowflake_warmup._keepalive_loop()
+
+    def test_keepalive_never_resumes_the_warehouse(self, executed, monkeypatch):
+        self._run(monkeypatch, warm_ups=5)
+        assert _resumes(executed) == 1
+        assert _statements(executed).count("SELECT 1") == 10
+        assert snowflake_warmup.warmup_status()["keepalives"] == 4
+
+    def test_resume_is_retried_until_startup_succeeds(self, executed, monkeypatch):
+        attempts = iter([False, True])
+        pool = snowflake_warmup.get_snowflake_pool()
+        real_warm = pool.warm
+
+        def flaky_warm(count):
+            if not next(attempts, True):
+                raise ConnectionError("login failed")
+            return real_warm(count)
+
+        with patch.object(pool, "warm", side_effect=flaky_warm):
+            self._run(monkeypatch, warm_ups=4)
+        # Failed first attempt: no resume; the retry that succeeds resumes once
+        assert _resumes(executed) == 1
@@ -0,0 +1,126 @@
+"""
+Unit tests for the shared SQL templates and time bucketing
+(app/utils/sql_templates.py).
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.config import settings
+from app.utils import sql_templates
+from app.utils.sql_templates import (
+    ADHERENCE_MERGE_SQL,
+    ADHERENCE_WINDOW_SQL,
+    RISK_COUNTS_SQL,
+    age_seconds,
+    register,
+    sql_template,
+    time_bucket,
+)
+
+UTC = timezone.utc
+
+
+@pytest.fixture
+def hourly(monkeypatch):
+    monkeypatch.setattr(settings, "SNOWFLAKE_TIME_BUCKET_SECONDS", 3600)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """A scratch copy of the template registry."""
+    monkeypatch.setattr(sql_templates, "SQL_TEMPLATES", dict(sql_templates.SQL_TEMPLATES))
+    return sql_templates.SQL_TEMPLATES
+
+
+# ---------------------------------------------------------------------------
+# time_bucket / age_seconds
+# ---------------------------------------------------------------------------
+
+class TestTimeBucket:
+    def test_truncates_to_the_bucket(self, hourly):
+        assert time_bucket(datetime(2024, 5, 1, 12, 34, 56, 789, tzinfo=UTC)) == (
+            datetime(2024, 5, 1, 12, 0, tzinfo=UTC)
+        )
+
+    def test_same_bucket_same_value(self, hourly):
+        a = time_bucket(datetime(2024, 5, 1, 12, 0, 0, tzinfo=UTC))
+        b = time_bucket(datetime(2024, 5, 1, 12, 59, 59, 999999, tzinfo=UTC))
+        c = time_bucket(datetime(2024, 5, 1, 13, 0, 0, tzinfo=UTC))
+        assert a == b
+        assert c - a == timedelta(hours=1)
+
+    def test_other_timezones_come_back_in_utc(self, hourly):
+        local = datetime(2024, 5, 1, 14, 34, tzinfo=timezone(timedelta(hours=2)))
+        bucket = time_bucket(local)
+        assert bucket == datetime(2024, 5, 1, 12, 0, tzinfo=UTC)
+        assert bucket.tzinfo == UTC
+
+    def test_zero_bucket_keeps_whole_seconds(self, monkeypatch):
+        monkeypatch.setattr(settings, "SNOWFLAKE_TIME_BUCKET_SECONDS", 0)
+        assert time_bucket(datetime(2024, 5, 1, 12, 34, 56, 789, tzinfo=UTC)) == (
+            datetime(2024, 5, 1, 12, 34, 56, tzinfo=UTC)
+        )
+
+    def test_defaults_to_now(self, hourly):
+        before = datetime.now(UTC)
+        bucket = time_bucket()
+        assert timedelta(0) <= before - bucket < timedelta(hours=1, seconds=1)
+
+
+class TestAgeSeconds:
+    def test_none_stays_none(self):
+        assert age_seconds(None, datetime.now(UTC)) is None
+
+    def test_adds_the_time_since_as_of(self):
+        as_of = datetime.now(UTC) - timedelta(minutes=10)
+        assert age_seconds(30.0, as_of) == pytest.approx(630.0, abs=5)
+
+    def test_as_of_in_the_future_adds_nothing(self):
+        assert age_seconds(30.0, datetime.now(UTC) + timedelta(minutes=10)) == 30.0
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+class TestRegister:
+    def test_normalizes_and_stores(self, registry):
+        sql = register("test_select", """
+            SELECT 1
+            FROM   t
+        """)
+        assert sql == "SELECT 1\nFROM   t"
+        assert sql_template("test_select") == sql
+
+    def test_same_text_again_is_fine(self, registry):
+        first = register("test_select", "SELECT 1")
+        assert register("test_select", "  SELECT 1\n") == first
+
+    def test_different_text_under_one_name_is_rejected(self, registry):
+        register("test_select", "SELECT 1")
+        with pytest.raises(ValueError, match="test_select"):
+            register("test_select", "SELECT 2")
+        assert sql_template("test_select") == "SELECT 1"
+
+    def test_unknown_name(self, registry):
+        with pytest.raises(KeyError):
+            sql_template("no_such_template")
+
+
+class TestTemplates:
+    @pytest.mark.parametrize("sql", [ADHERENCE_WINDOW_SQL, RISK_COUNTS_SQL])
+    def test_reads_have_no_runtime_functions(self, sql):
+        # Snowflake's result cache skips statements that use them
+        for fn in ("CURRENT_TIMESTAMP", "CURRENT_DATE", "SYSDATE", "GETDATE"):
+            assert fn not in sql.upper()
+        assert "%(as_of)s" in sql
+
+    def test_merges_embed_the_shared_window(self):
+        window_lines = ADHERENCE_WINDOW_SQL.splitlines()
+        for days, sql in ADHERENCE_MERGE_SQL.items():
+            assert f"adherence_{days}d = sa.adherence" in sql
+            assert all(line.strip() in sql for line in window_lines)
+        assert "checkins_total_7d = sa.checkins_total_7d" in ADHERENCE_MERGE_SQL[7]
+        assert "checkins_total_7d = sa." not in ADHERENCE_MERGE_SQL[30]
@@ -3,6 +3,7 @@
 import os
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import task_postrun, task_prerun
 
 celery = Celery(
     "goal_tracking",
@@ -68,4 +69,16 @@ celery.conf.beat_schedule = {
 
 # Task time limits
 celery.conf.task_time_limit = 30 * 60  # Hard limit: 30 minutes
-celery.conf.task_soft_time_limit = 25 * 60  # Soft limit: 25 minutes
\ No newline at end of file
+celery.conf.task_soft_time_limit = 25 * 60  # Soft limit: 25 minutes
+
+@task_prerun.connect
+def _tag_snowflake_queries(task=None, **_kwargs):
+    """Tag this task's Snowflake statements with its name (see app/utils/query_tags.py)."""
+    from app.utils.query_tags import set_query_tag
+    set_query_tag({"task": task.name})
+
+
+@task_postrun.connect
+def _untag_snowflake_queries(**_kwargs):
+    from app.utils.query_tags import set_query_tag
+    set_query_tag(None)
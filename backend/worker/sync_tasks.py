@@ -5,16 +5,44 @@ sync_postgres_to_snowflake
   - Config-driven: reads worker/sync_config.yaml for table list
   - Incremental: uses a watermark (updated_at / created_at) so only changed
     rows are fetched each run
-  - Resumable: watermark state is persisted in the sync_watermarks Postgres
-    table; a failed run resumes from the last successful watermark
+  - Resumable and exact: the position is a keyset cursor — (watermark, pk)
+    of the last row synced — persisted in the sync_watermarks Postgres
+    table, so rows sharing a timestamp across a batch boundary are neither
+    skipped nor re-read, and a failed run resumes from the last committed
+    batch
   - Idempotent: Snowflake writes use MERGE so re-running a batch is safe
+  - Typed: target columns get the types declared per table in the config
+    (TIMESTAMP_NTZ, DATE, NUMBER, BOOLEAN, VARIANT, ...), so analytics
+    reads prune and aggregate on native values; new source columns are
+    added to the target in place
+  - Parallel: tables sync concurrently on a bounded thread pool, each on
+    its own Snowflake session, so one slow table doesn't hold up the rest;
+    a table with parallel_ranges can also split a large backlog into
+    disjoint watermark ranges synced concurrently
+  - Draining: a table behind by more than one batch keeps syncing batch
+    after batch (each committed and watermarked) until caught up or the
+    run's time / row budget is spent; the result reports throughput and
+    the remaining lag
+  - With DUCKDB_REPLICA_PATH set, each batch is also upserted into the
+    local DuckDB replica (app/utils/local_replica.py), published at the
+    end of the run
 
 compute_adherence_scores / compute_risk_metrics
-  - Unchanged analytics tasks that operate entirely inside Snowflake
+  - Analytics tasks that operate entirely inside Snowflake; each finishes
+    by rebuilding mentor_dashboard_latest and queueing
+    refresh_group_summary_snapshots
+
+refresh_group_summary_snapshots
+  - Materializes one get_group_member_summaries document per group into
+    group_summary_snapshot, so group reads are a single-row lookup. Runs for
+    every group after the metrics tasks, and for just the groups a sync
+    batch touched after each sync run
 """
 
+import json
 import logging
 import os
+import threading
 import time
 from datetime import datetime, timezone
 from pathlib import Path
@@ -23,13 +51,33 @@ import yaml
 from celery import Task
 from worker.celery_app import celery
 from app.database import get_snowflake_connection
+from app.services.snowflake_service import build_group_member_summaries_batch
 from app.supabase_client import get_supabase_client
+from app.utils.local_replica import get_replica_writer, mirror_metrics_tables, replica_configured
+from app.utils.query_tags import ContextThreadPoolExecutor, query_tag
+from app.utils.result_cache import bump_data_version
+from app.utils.snowflake_utils import (
+    refresh_mentor_dashboard_latest,
+    write_group_summary_snapshots,
+)
+from app.utils.sql_templates import (
+    ADHERENCE_MERGE_SQL,
+    RISK_COUNTS_SQL,
+    RISK_MERGE_SQL,
+    time_bucket,
+)
 from worker.sync_utils import (
-    fetch_changed_rows,
-    get_watermark,
-    max_watermark_from_rows,
+    EPOCH,
+    column_types_for,
+    count_rows_since,
+    decode_key,
+    get_sync_position,
+    iter_changed_batches,
+    keyset_position,
     set_watermark,
+    stream_changed_batches,
     upsert_to_snowflake,
+    watermark_span,
 )
 
 logger = logging.getLogger(__name__)
@@ -46,6 +94,390 @@ def _load_config() -> dict:
 # Main sync task
 # ---------------------------------------------------------------------------
 
+class _DrainBudget:
+    """Time / row budget shared by every table in one sync run (thread-safe)."""
+
+    def __init__(self, max_seconds: float, max_rows: int):
+        self.deadline = time.monotonic() + max_seconds
+        self.rows_left = max_rows
+        self._lock = threading.Lock()
+
+    def spend(self, rows: int) -> None:
+        with self._lock:
+            self.rows_left -= rows
+
+    def exhausted(self) -> bool:
+        return self.rows_left <= 0 or time.monotonic() >= self.deadline
+
+
+class _KeysetProgress:
+    """
+    Where each of one table's key ranges has got to in a run, and the
+    table cursor persisted in sync_watermarks (thread-safe).
+
+    Range i holds the keys after its start position with watermark up to
+    bounds[i]; the last range is open-ended (bound None). The ranges are
+    consecutive and disjoint, so the persisted cursor is the position of
+    the first unfinished range: a range that finishes ahead of an earlier
+    one is read again next run if the earlier one fails, which the MERGE
+    makes harmless.
+    """
+
+    def __init__(self, supabase, source: str, start: tuple, bounds: list):
+        self._supabase = supabase
+        self._source = source
+        self.bounds = bounds
+        self._positions = [start] + [(b, None) for b in bounds[:-1]]
+        self._done = [False] * len(bounds)
+        self._saved = start
+        self.rows = 0
+        self.batches = 0
+        self._lock = threading.Lock()
+
+    def start(self, index: int) -> tuple:
+        return self._positions[index]
+
+    def cursor(self) -> tuple:
+        with self._lock:
+            return self._cursor()
+
+    def _cursor(self) -> tuple:
+        for position, done in zip(self._positions, self._done):
+            if not done:
+                return position
+        return self._positions[-1]
+
+    def advance(self, index: int, position, rows: int) -> None:
+        """Record a committed batch of range *index* ending at *position*."""
+        with self._lock:
+            if position is not None:
+                self._positions[index] = position
+            self.rows += rows
+            self.batches += 1
+            self._save(rows)
+
+    def finish(self, index: int) -> None:
+        """Range *index* has no rows left."""
+        with self._lock:
+            self._done[index] = True
+            self._save(0)
+
+    def _save(self, rows: int) -> None:
+        # Under the lock, so cursors are written in the order they advance
+        cursor = self._cursor()
+        if cursor != self._saved:
+            set_watermark(
+                self._supabase, self._source,
+                new_watermark=cursor[0],
+                last_key=cursor[1],
+                rows_processed=rows,
+                status="ok",
+            )
+            self._saved = cursor
+
+
+_READERS = ("postgrest", "psycopg")
+_LOADERS = ("auto", "insert", "stage")
+
+
+def _changed_batches(
+    supabase, reader: str, source: str, watermark_col: str, pk: str,
+    start: tuple, until, batch_size: int,
+):
+    """Batches of rows after the keyset position *start* (up to *until*), read the way the table's config asks."""
+    since, after_key = start
+    if reader == "psycopg":
+        return stream_changed_batches(
+            source, watermark_col, since, batch_size, pk=pk, after_key=after_key, until=until,
+        )
+    if reader == "postgrest":
+        return iter_changed_batches(
+            supabase, source, watermark_col, since, batch_size, pk=pk, after_key=after_key, until=until,
+        )
+    raise ValueError(f"Unknown reader {reader!r} for {source} (expected one of {', '.join(_READERS)})")
+
+
+def _split_bounds(supabase, source: str, watermark_col: str, start: tuple, batch_size: int, parts: int) -> list:
+    """
+    Upper watermark bounds that split *source*'s pending rows into up to
+    *parts* ranges, evenly spaced in time between the oldest pending and
+    the newest row; the last bound is None (open-ended). A single range
+    unless the estimated backlog is at least a batch per range.
+    """
+    if parts < 2:
+        return [None]
+    since = start[0]
+    remaining = count_rows_since(supabase, source, watermark_col, since)
+    if not remaining or remaining < parts * batch_size:
+        return [None]
+    span = watermark_span(supabase, source, watermark_col, since)
+    if span is None:
+        return [None]
+    oldest, newest = span
+    step = (newest - oldest) / parts
+    bounds = sorted({oldest + step * k for k in range(1, parts)})
+    return [b for b in bounds if b >= since] + [None]
+
+
+def _sync_range(
+    supabase,
+    replica,
+    tbl: dict,
+    opts: dict,
+    progress: _KeysetProgress,
+    index: int,
+    budget: _DrainBudget,
+    drain: bool,
+    touched_users: set[str],
+    touched_groups: set[str],
+) -> bool:
+    """
+    Sync range *index* of a table batch after batch, on its own Snowflake
+    session, until it is exhausted (returns True) or *budget* runs out
+    (False); with *drain* off, one batch only. Each batch is committed
+    before *progress* records it.
+    """
+    source = tbl["source"]
+    target = tbl["target"]
+    pk = tbl["pk"]
+    watermark_col = tbl["watermark_column"]
+    batch_size = opts["batch_size"]
+    label = source if len(progress.bounds) == 1 else f"{source}[{index + 1}/{len(progress.bounds)}]"
+
+    sf_conn = None
+    batch_iter = None
+    try:
+        sf_conn = get_snowflake_connection()
+        sf_cursor = sf_conn.cursor()
+
+        batch_iter = _changed_batches(
+            supabase, opts["reader"], source, watermark_col, pk,
+            progress.start(index), progress.bounds[index], batch_size,
+        )
+        batches = 0
+        for rows in batch_iter:
+            # Write to Snowflake
+            bulk = opts["loader"] == "stage" or (
+                opts["loader"] == "auto" and len(rows) >= opts["stage_threshold"]
+            )
+            column_types = column_types_for(list(rows[0]), tbl.get("columns"), rows)
+            with query_tag(table=target, loader="stage" if bulk else "insert"):
+                upsert_to_snowflake(sf_cursor, target, rows, pk, bulk=bulk, column_types=column_types)
+                sf_conn.commit()
+            if target == "fact_goal_completions":
+                # Completions carry only goal_id; their owners' group
+                # snapshots count them. Resolved before the cursor moves so
+                # a failed lookup is retried with the batch.
+                goal_ids = {str(row["goal_id"]) for row in rows if row.get("goal_id")}
+                touched_users.update(_lookup_ids(sf_cursor, _GOAL_OWNERS_SQL, goal_ids))
+            if replica:
+                # Before the cursor moves, so a failed replica write
+                # is retried with the batch next run
+                replica.upsert(target, rows, pk, column_types=column_types)
+
+            # Advance the keyset cursor to the batch's last row
+            position = keyset_position(rows, watermark_col, pk)
+            progress.advance(index, position, len(rows))
+
+            for row in rows:
+                if row.get("user_id"):
+                    touched_users.add(str(row["user_id"]))
+                if row.get("group_id"):
+                    touched_groups.add(str(row["group_id"]))
+            # Profiles and groups are keyed by their own id
+            if target == "dim_profiles":
+                touched_users.update(str(row[pk]) for row in rows)
+            if target == "dim_groups":
+                touched_groups.update(str(row[pk]) for row in rows)
+
+            batches += 1
+            budget.spend(len(rows))
+            logger.info(
+                "[sync]   %s batch %d: %d rows (position: %s)", label, batches, len(rows), position,
+            )
+
+            if len(rows) < batch_size:
+                break
+            if not drain or budget.exhausted():
+                return False
+
+        progress.finish(index)
+        return True
+
+    finally:
+        if batch_iter is not None:
+            batch_iter.close()  # ends the Postgres stream if the budget cut it short
+        if sf_conn:
+            try:
+                sf_conn.close()
+            except Exception:  # noqa: BLE001
+                pass
+
+
+def _sync_table(
+    supabase,
+    replica,
+    tbl: dict,
+    defaults: dict,
+    budget: _DrainBudget,
+    drain: bool,
+    touched_users: set[str],
+    touched_groups: set[str],
+) -> dict:
+    """
+    Sync one table until it is caught up or *budget* runs out (see
+    _sync_range). Returns the table's entry for the run summary; the user
+    and group ids it touched are added to *touched_users* / *touched_groups*.
+
+    The table resumes from its keyset cursor. With parallel_ranges > 1 and
+    a backlog of at least a batch per range, the pending rows are split
+    into that many disjoint watermark ranges synced concurrently, each on
+    its own Postgres read and Snowflake session.
+
+    Errors are recorded in sync_watermarks.last_error and reported in the
+    entry instead of raised, so one table can't abort the others.
+    """
+    source = tbl["source"]
+    target = tbl["target"]
+    watermark_col = tbl["watermark_column"]
+    opts = {
+        "batch_size":      tbl.get("batch_size", defaults["batch_size"]),
+        "reader":          tbl.get("reader", defaults["reader"]),
+        "loader":          tbl.get("loader", defaults["loader"]),
+        "stage_threshold": defaults["stage_threshold_rows"],
+    }
+    parts = max(1, int(tbl.get("parallel_ranges", 1)))
+
+    t0 = time.monotonic()
+    logger.info(
+        "[sync] Table %s → %s (watermark: %s, reader: %s)", source, target, watermark_col, opts["reader"],
+    )
+
+    progress = None
+    try:
+        if opts["loader"] not in _LOADERS:
+            raise ValueError(
+                f"Unknown loader {opts['loader']!r} for {source} (expected one of {', '.join(_LOADERS)})"
+            )
+        start = get_sync_position(supabase, source)
+        if start[1] is not None and decode_key(tbl["pk"], start[1]) is None:
+            # Saved under a different key (e.g. before the table's pk became
+            # composite); rows merged on the old key may have collapsed, so
+            # sync the table again from the start
+            logger.warning(
+                "[sync]   %s: saved key %r does not match pk %s; resyncing from the start",
+                source, start[1], tbl["pk"],
+            )
+            start = (EPOCH, None)
+        logger.debug("[sync]   Last position: %s", start)
+
+        bounds = _split_bounds(supabase, source, watermark_col, start, opts["batch_size"], parts) if drain else [None]
+        progress = _KeysetProgress(supabase, source, start, bounds)
+
+        if len(bounds) == 1:
+            caught_up = _sync_range(
+                supabase, replica, tbl, opts, progress, 0, budget, drain, touched_users, touched_groups,
+            )
+        else:
+            logger.info("[sync]   %s: splitting the backlog into %d ranges", source, len(bounds))
+            # (range index, touched user ids, touched group ids) — merged
+            # into the table's sets once every range is done
+            jobs = [(i, set(), set()) for i in range(len(bounds))]
+            with ContextThreadPoolExecutor(max_workers=len(bounds), thread_name_prefix=f"sync-{source}") as pool:
+                futures = [
+                    pool.submit(
+                        _sync_range, supabase, replica, tbl, opts, progress, i,
+                        budget, drain, users, groups,
+                    )
+                    for i, users, groups in jobs
+                ]
+                done, errors = [], []
+                for f in futures:
+                    try:
+                        done.append(f.result())
+                    except Exception as e:  # noqa: BLE001
+                        errors.append(e)
+            for _, users, groups in jobs:
+                touched_users.update(users)
+                touched_groups.update(groups)
+            if errors:
+                raise errors[0]
+            caught_up = all(done)
+
+        synced = progress.rows
+        cursor = progress.cursor()
+        elapsed = time.monotonic() - t0
+        entry = {
+            "table":        source,
+            "rows":         synced,
+            "batches":      progress.batches,
+            "status":       "ok" if synced else "idle",
+            "caught_up":    caught_up,
+            "elapsed_s":    round(elapsed, 2),
+            "rows_per_sec": round(synced / elapsed, 1) if elapsed > 0 else None,
+        }
+        if len(bounds) > 1:
+            entry["ranges"] = len(bounds)
+
+        if not synced:
+            logger.info("[sync]   %s: no new rows — idle", source)
+            set_watermark(
+                supabase, source,
+                new_watermark=cursor[0],
+                last_key=cursor[1],
+                rows_processed=0,
+                status="idle",
+            )
+            return entry
+
+        if not caught_up:
+            # Stopped on the budget: estimate how far behind the table still is
+            entry["lag_seconds"] = round(max(0.0, (datetime.now(tz=timezone.utc) - cursor[0]).total_seconds()), 1)
+            try:
+                remaining = count_rows_since(supabase, source, watermark_col, cursor[0])
+            except Exception as e:  # noqa: BLE001
+                logger.debug("[sync]   Could not count remaining rows of %s: %s", source, e)
+                remaining = None
+            entry["remaining_rows"] = remaining
+            if remaining is not None and entry["rows_per_sec"]:
+                entry["eta_seconds"] = round(remaining / entry["rows_per_sec"], 1)
+        else:
+            entry["lag_seconds"] = 0.0
+            entry["remaining_rows"] = 0
+
+        logger.info(
+            "[sync]   %s: synced %d rows in %d batch(es), %.2fs (%s)",
+            source, synced, progress.batches, elapsed,
+            "caught up" if caught_up else f"~{entry['remaining_rows']} rows behind",
+        )
+        return entry
+
+    except Exception as tbl_err:  # noqa: BLE001
+        elapsed = time.monotonic() - t0
+        logger.exception("[sync]   Error syncing %s after %.2fs: %s", source, elapsed, tbl_err)
+        try:
+            # Keep the cursor where the committed batches left it
+            since, last_key = progress.cursor() if progress else get_sync_position(supabase, source)
+            set_watermark(
+                supabase, source,
+                new_watermark=since,
+                last_key=last_key,
+                rows_processed=0,
+                status="error",
+                error=str(tbl_err)[:2000],
+            )
+        except Exception:  # noqa: BLE001
+            pass  # don't let watermark write failure mask original error
+        # Batches committed before the error stay synced
+        return {
+            "table":   source,
+            "rows":    progress.rows if progress else 0,
+            "batches": progress.batches if progress else 0,
+            "status":  "error",
+            "error":   str(tbl_err),
+        }
+
+
 @celery.task(
     bind=True,
     name="worker.sync_tasks.sync_postgres_to_snowflake",
@@ -56,12 +488,28 @@ def sync_postgres_to_snowflake(self: Task):
     """
     Incremental Postgres → Snowflake sync driven by sync_config.yaml.
 
+    Tables are synced concurrently (up to max_parallel_tables, each on its
+    own Snowflake session), so run time is bounded by the slowest table.
     For each enabled table:
-      1. Read last_watermark from sync_watermarks (default: epoch)
-      2. Fetch rows WHERE watermark_col > last_watermark (up to batch_size)
-      3. MERGE rows into the Snowflake target table
-      4. Advance the watermark to max(watermark_col) in the batch
-      5. If no rows, record an idle run and move on
+      1. Read the cursor (last_watermark, last_key) from sync_watermarks
+         (default: epoch)
+      2. Fetch rows WHERE (watermark_col, pk) > cursor in that order (up
+         to batch_size), through PostgREST or streamed over psycopg
+         (per-table reader)
+      3. MERGE rows into the Snowflake target table, loading the staging
+         table by bound INSERTs or, for large batches, PUT + COPY INTO
+      4. Advance the cursor to the (watermark_col, pk) of the batch's last row
+      5. Repeat from 2 until a batch comes back short (caught up) or the
+         run's drain budget (time / rows, sync_config.yaml) is spent
+      6. If no rows, record an idle run and move on
+
+    With parallel_ranges, steps 2-5 run concurrently over disjoint
+    watermark ranges and the cursor only moves past a range once every
+    range before it has finished.
+
+    Every table gets at least one batch per run, even once the budget is
+    spent. The result reports per-table and whole-run throughput, plus the
+    remaining lag of tables the budget stopped.
 
     On transient errors the task retries with exponential backoff.
     Per-table errors are recorded in sync_watermarks.last_error and do not
@@ -69,97 +517,78 @@ def sync_postgres_to_snowflake(self: Task):
     """
     config = _load_config()
     tables = [t for t in config.get("tables", []) if t.get("enabled", True)]
-    default_batch = config.get("default_batch_size", 1000)
+    # Per-table settings fall back to these
+    defaults = {
+        "batch_size":           config.get("default_batch_size", 1000),
+        "reader":               config.get("default_reader", "postgrest"),
+        "loader":               config.get("default_loader", "auto"),
+        "stage_threshold_rows": config.get("stage_threshold_rows", 5000),
+    }
+    max_parallel = max(1, min(int(config.get("max_parallel_tables", 4)), len(tables) or 1))
+    drain_cfg = config.get("drain") or {}
+    drain = drain_cfg.get("enabled", True)
+    budget = _DrainBudget(
+        max_seconds=drain_cfg.get("max_seconds", 90),
+        max_rows=drain_cfg.get("max_rows", 100_000),
+    )
 
     run_start = datetime.now(tz=timezone.utc)
-    logger.info("[sync] Starting run at %s for %d tables", run_start.isoformat(), len(tables))
+    run_t0 = time.monotonic()
+    logger.info(
+        "[sync] Starting run at %s for %d tables (%d in parallel)",
+        run_start.isoformat(), len(tables), max_parallel,
+    )
 
     supabase = get_supabase_client()
-    sf_conn = None
+    replica = get_replica_writer() if replica_configured() else None
 
     try:
-        sf_conn = get_snowflake_connection()
-        sf_cursor = sf_conn.cursor()
-
-        summary = []
-
-        for tbl in tables:
-            source = tbl["source"]
-            target = tbl["target"]
-            pk = tbl["pk"]
-            watermark_col = tbl["watermark_column"]
-            batch_size = tbl.get("batch_size", default_batch)
-
-            t0 = time.monotonic()
-            logger.info("[sync] Table %s → %s (watermark: %s)", source, target, watermark_col)
-
-            try:
-                last_wm = get_watermark(supabase, source)
-                logger.debug("[sync]   Last watermark: %s", last_wm)
-
-                rows = fetch_changed_rows(
-                    supabase,
-                    source_table=source,
-                    watermark_column=watermark_col,
-                    since=last_wm,
-                    batch_size=batch_size,
+        # (table config, touched user ids, touched group ids) — each table
+        # collects into its own sets, merged once every table is done
+        jobs = [(tbl, set(), set()) for tbl in tables]
+        with ContextThreadPoolExecutor(max_workers=max_parallel, thread_name_prefix="sync") as pool:
+            futures = [
+                pool.submit(
+                    _sync_table, supabase, replica, tbl, defaults,
+                    budget, drain, users, groups,
                 )
+                for tbl, users, groups in jobs
+            ]
+            summary = [f.result() for f in futures]  # config order
 
-                if not rows:
-                    logger.info("[sync]   No new rows — idle")
-                    set_watermark(
-                        supabase, source,
-                        new_watermark=last_wm,
-                        rows_processed=0,
-                        status="idle",
-                    )
-                    summary.append({"table": source, "rows": 0, "status": "idle"})
-                    continue
-
-                # Write to Snowflake
-                upsert_to_snowflake(sf_cursor, target, rows, pk)
-                sf_conn.commit()
-
-                # Advance watermark
-                new_wm = max_watermark_from_rows(rows, watermark_col)
-                if new_wm is None:
-                    new_wm = last_wm  # defensive fallback
-
-                set_watermark(
-                    supabase, source,
-                    new_watermark=new_wm,
-                    rows_processed=len(rows),
-                    status="ok",
-                )
+        touched_users: set[str] = set().union(*(users for _, users, _ in jobs))
+        touched_groups: set[str] = set().union(*(groups for _, _, groups in jobs))
 
-                elapsed = time.monotonic() - t0
-                logger.info(
-                    "[sync]   Synced %d rows in %.2fs (new watermark: %s)",
-                    len(rows), elapsed, new_wm,
-                )
-                summary.append({"table": source, "rows": len(rows), "status": "ok"})
-
-            except Exception as tbl_err:  # noqa: BLE001
-                elapsed = time.monotonic() - t0
-                logger.exception("[sync]   Error syncing %s after %.2fs: %s", source, elapsed, tbl_err)
-                try:
-                    set_watermark(
-                        supabase, source,
-                        new_watermark=get_watermark(supabase, source),
-                        rows_processed=0,
-                        status="error",
-                        error=str(tbl_err)[:2000],
-                    )
-                except Exception:  # noqa: BLE001
-                    pass  # don't let watermark write failure mask original error
-                summary.append({"table": source, "rows": 0, "status": "error", "error": str(tbl_err)})
+        if summary and all(r["status"] == "error" for r in summary):
+            # Nothing got through (e.g. Snowflake or Supabase unreachable) —
+            # retry the run rather than wait for the next beat
+            raise RuntimeError(f"every table failed; first error: {summary[0]['error']}")
 
         total_rows = sum(r["rows"] for r in summary)
+        if total_rows:
+            # Watermarks advanced — cached Snowflake summaries are now stale
+            bump_data_version("sync")
+            if touched_users or touched_groups:
+                refresh_group_summary_snapshots.delay(
+                    group_ids=sorted(touched_groups), user_ids=sorted(touched_users),
+                )
+        run_elapsed = time.monotonic() - run_t0
+        behind = [r["table"] for r in summary if r["status"] != "error" and not r.get("caught_up")]
         logger.info(
-            "[sync] Run complete. %d tables processed, %d total rows synced.",
-            len(summary), total_rows,
+            "[sync] Run complete. %d tables processed, %d total rows synced in %.1fs%s.",
+            len(summary), total_rows, run_elapsed,
+            f" — still behind: {', '.join(behind)}" if behind else "",
         )
-        return {"status": "ok", "run_at": run_start.isoformat(), "tables": summary}
+        return {
+            "status":       "ok",
+            "run_at":       run_start.isoformat(),
+            "elapsed_s":    round(run_elapsed, 2),
+            "rows":         total_rows,
+            "rows_per_sec": round(total_rows / run_elapsed, 1) if run_elapsed > 0 else None,
+            "caught_up":    not behind,
+            "behind":       behind,
+            "tables":       summary,
+        }
 
     except Exception as exc:  # noqa: BLE001
         logger.exception("[sync] Fatal error during sync run: %s", exc)
@@ -170,15 +599,17 @@ def sync_postgres_to_snowflake(self: Task):
         return {"status": "fatal_error", "error": str(exc)}
 
     finally:
-        if sf_conn:
+        if replica:
             try:
-                sf_conn.close()
-            except Exception:  # noqa: BLE001
-                pass
+                replica.publish()
+            except Exception as e:  # noqa: BLE001
+                logger.warning("[sync] Could not publish local replica: %s", e)
+            finally:
+                replica.close()
 
 
 # ---------------------------------------------------------------------------
-# Adherence scoring (Snowflake-only, unchanged from original)
+# Adherence scoring (Snowflake-only)
 # ---------------------------------------------------------------------------
 
 @celery.task(
@@ -199,28 +630,21 @@ def compute_adherence_scores(self: Task):
         cursor.execute("SELECT DISTINCT user_id FROM fact_checkins")
         user_ids = cursor.fetchall()
 
+        # One bucketed as_of for the whole run: every user is scored over
+        # the same windows, with the same statement text the API uses
+        as_of = time_bucket()
         for (user_id,) in user_ids:
-            for days, col in [(7, "adherence_7d"), (30, "adherence_30d"), (90, "adherence_90d")]:
-                cursor.execute(f"""
-                    MERGE INTO metrics_adherence ma
-                    USING (
-                        SELECT
-                            '{user_id}' as user_id,
-                            CURRENT_DATE() as metric_date,
-                            ROUND(100.0 * SUM(CASE WHEN completed THEN 1 ELSE 0 END) /
-                                  NULLIF(COUNT(*), 0), 2) as adherence
-                        FROM fact_checkins
-                        WHERE user_id = '{user_id}'
-                        AND timestamp >= DATEADD(day, -{days}, CURRENT_TIMESTAMP())
-                    ) sa
-                    ON ma.user_id = sa.user_id AND ma.metric_date = sa.metric_date
-                    WHEN MATCHED THEN UPDATE SET {col} = sa.adherence
-                    WHEN NOT MATCHED THEN INSERT
-                        (user_id, metric_date, {col})
-                        VALUES (sa.user_id, sa.metric_date, sa.adherence)
-                """)
+            for days in (7, 30, 90):
+                cursor.execute(
+                    ADHERENCE_MERGE_SQL[days],
+                    {"user_id": user_id, "days": days, "as_of": as_of},
+                )
 
+        refresh_mentor_dashboard_latest(cursor)
         conn.commit()
+        _mirror_or_requeue(cursor, ("metrics_adherence", "metrics_streak"))
+        bump_data_version("adherence")
+        refresh_group_summary_snapshots.delay()
         logger.info("[adherence] Done. %d users processed.", len(user_ids))
         return {"status": "success", "users_processed": len(user_ids)}
 
@@ -230,7 +654,7 @@ def compute_adherence_scores(self: Task):
 
 
 # ---------------------------------------------------------------------------
-# Risk metrics (Snowflake-only, unchanged from original)
+# Risk metrics (Snowflake-only)
 # ---------------------------------------------------------------------------
 
 @celery.task(
@@ -252,20 +676,9 @@ def compute_risk_metrics(self: Task):
         cursor.execute("SELECT DISTINCT user_id FROM fact_checkins")
         user_ids = cursor.fetchall()
 
+        as_of = time_bucket()
         for (user_id,) in user_ids:
-            cursor.execute("""
-                SELECT
-                    COUNT(CASE WHEN completed = FALSE AND
-                               timestamp >= DATEADD(day, -7, CURRENT_TIMESTAMP())
-                          THEN 1 END) as missed_7d,
-                    COUNT(CASE WHEN completed = FALSE AND
-                               timestamp >= DATEADD(day, -3, CURRENT_TIMESTAMP())
-                          THEN 1 END) as missed_3d,
-                    DATEDIFF(day, MAX(timestamp), CURRENT_TIMESTAMP()) as days_since_checkin
-                FROM fact_checkins
-                WHERE user_id = %s
-            """, (user_id,))
-
+            cursor.execute(RISK_COUNTS_SQL, {"user_id": user_id, "as_of": as_of})
             result = cursor.fetchone()
             missed_7d, missed_3d, days_since = result
 
@@ -283,30 +696,153 @@ def compute_risk_metrics(self: Task):
                 risk_level = "high"
                 risk_score = max(risk_score, 0.7)
 
-            cursor.execute("""
-                MERGE INTO metrics_risk mr
-                USING (SELECT %s as user_id) sr
-                ON mr.user_id = sr.user_id
-                WHEN MATCHED THEN UPDATE SET
-                    risk_level = %s,
-                    risk_score = %s,
-                    missed_count_7d = %s,
-                    missed_count_3d = %s,
-                    last_checkin_days_ago = %s,
-                    last_evaluated = CURRENT_TIMESTAMP()
-                WHEN NOT MATCHED THEN INSERT
-                    (user_id, risk_level, risk_score, missed_count_7d,
-                     missed_count_3d, last_checkin_days_ago)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                user_id, risk_level, min(risk_score, 1.0), missed_7d, missed_3d, days_since or 999,
-                user_id, risk_level, min(risk_score, 1.0), missed_7d, missed_3d, days_since or 999,
-            ))
+            cursor.execute(RISK_MERGE_SQL, {
+                "user_id":    user_id,
+                "risk_level": risk_level,
+                "risk_score": min(risk_score, 1.0),
+                "missed_7d":  missed_7d,
+                "missed_3d":  missed_3d,
+                "days_since": days_since or 999,
+            })
 
+        refresh_mentor_dashboard_latest(cursor)
         conn.commit()
+        _mirror_or_requeue(cursor, ("metrics_risk",))
+        bump_data_version("risk")
+        refresh_group_summary_snapshots.delay()
         logger.info("[risk] Done. %d users processed.", len(user_ids))
         return {"status": "success", "users_processed": len(user_ids)}
 
     finally:
         cursor.close()
         conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Local replica metrics mirror
+# ---------------------------------------------------------------------------
+
+# Delay before a metrics mirror that found the replica locked tries again
+_MIRROR_RETRY_SECONDS = 60
+
+
+def _mirror_or_requeue(cursor, tables: tuple[str, ...]) -> None:
+    """Mirror *tables* into the replica, or queue mirror_replica_metrics if it is locked."""
+    if not mirror_metrics_tables(cursor, tables):
+        mirror_replica_metrics.apply_async(args=[list(tables)], countdown=_MIRROR_RETRY_SECONDS)
+
+
+@celery.task(
+    bind=True,
+    name="worker.sync_tasks.mirror_replica_metrics",
+    max_retries=5,
+    default_retry_delay=_MIRROR_RETRY_SECONDS,
+)
+def mirror_replica_metrics(self: Task, tables):
+    """
+    Copy metrics *tables* from Snowflake into the local replica. Queued by
+    the metrics tasks when a long sync run held the replica's working copy;
+    retries until it is free.
+    """
+    conn = get_snowflake_connection()
+    cursor = conn.cursor()
+    try:
+        if not mirror_metrics_tables(cursor, tuple(tables)):
+            raise self.retry()
+        # Replica-backed reads may have cached the previous metrics
+        bump_data_version("replica")
+        return {"status": "success", "tables": list(tables)}
+    finally:
+        cursor.close()
+        conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Group summary snapshots
+# ---------------------------------------------------------------------------
+
+# Groups built per set of batched queries; a failure only loses its chunk
+_SNAPSHOT_GROUPS_PER_BATCH = 20
+
+# Ids per lookup statement below; the connector inlines the JSON bind, so
+# this keeps each statement's text to ~200 KB
+_ID_LOOKUP_CHUNK = 5000
+
+_GROUPS_OF_USERS_SQL = """
+    SELECT DISTINCT group_id
+    FROM   fact_group_members
+    WHERE  user_id IN (SELECT value::VARCHAR FROM TABLE(FLATTEN(INPUT => PARSE_JSON(%s))))
+"""
+
+_GOAL_OWNERS_SQL = """
+    SELECT DISTINCT user_id
+    FROM   dim_goals
+    WHERE  id IN (SELECT value::VARCHAR FROM TABLE(FLATTEN(INPUT => PARSE_JSON(%s))))
+"""
+
+
+def _lookup_ids(cursor, sql: str, ids) -> set[str]:
+    """First-column values of *sql* run over *ids* (bound as one JSON array per chunk)."""
+    ids = sorted(ids)
+    found: set[str] = set()
+    for start in range(0, len(ids), _ID_LOOKUP_CHUNK):
+        cursor.execute(sql, (json.dumps(ids[start:start + _ID_LOOKUP_CHUNK]),))
+        found.update(str(r[0]) for r in cursor.fetchall() if r[0] is not None)
+    return found
+
+
+@celery.task(
+    bind=True,
+    name="worker.sync_tasks.refresh_group_summary_snapshots",
+)
+def refresh_group_summary_snapshots(self: Task, group_ids=None, user_ids=None):
+    """
+    Rebuild group_summary_snapshot rows from the source tables.
+
+    With no arguments every group in dim_groups is rebuilt and snapshots of
+    deleted groups are dropped. Otherwise only *group_ids* plus the groups
+    containing any of *user_ids* are rebuilt. A group that fails to build
+    keeps its previous row, which readers stop using once it is older than
+    SNOWFLAKE_GROUP_SNAPSHOT_MAX_AGE_SECONDS.
+    """
+    full = group_ids is None and user_ids is None
+    # Later refreshes must win over earlier ones that finish after them
+    version = time.time_ns() // 1_000_000
+
+    conn = get_snowflake_connection()
+    cursor = conn.cursor()
+
+    try:
+        if full:
+            cursor.execute("SELECT id FROM dim_groups")
+            targets = {str(r[0]) for r in cursor.fetchall()}
+        else:
+            targets = set(group_ids or [])
+            if user_ids:
+                targets.update(_lookup_ids(cursor, _GROUPS_OF_USERS_SQL, user_ids))
+
+        logger.info("[snapshots] Rebuilding %d group summaries...", len(targets))
+        ordered = sorted(targets)
+        summaries, failed = [], 0
+        for start in range(0, len(ordered), _SNAPSHOT_GROUPS_PER_BATCH):
+            chunk = ordered[start:start + _SNAPSHOT_GROUPS_PER_BATCH]
+            try:
+                summaries.extend(build_group_member_summaries_batch(chunk).values())
+            except Exception as e:  # noqa: BLE001
+                failed += len(chunk)
+                logger.warning("[snapshots]   Could not build groups %s..: %s", chunk[0], e)
+
+        write_group_summary_snapshots(cursor, summaries, version)
+        if full:
+            cursor.execute(
+                "DELETE FROM group_summary_snapshot WHERE group_id NOT IN (SELECT id FROM dim_groups)"
+            )
+        conn.commit()
+        if summaries:
+            bump_data_version("group_snapshots")
+        logger.info("[snapshots] Done. %d written, %d failed.", len(summaries), failed)
+        return {"status": "success", "groups_written": len(summaries), "groups_failed": failed}
+
+    finally:
+        cursor.close()
+        conn.close()
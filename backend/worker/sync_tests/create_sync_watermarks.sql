@@ -4,12 +4,16 @@
 CREATE TABLE IF NOT EXISTS public.sync_watermarks (
     source_table    TEXT        PRIMARY KEY,
     last_watermark  TIMESTAMPTZ NOT NULL DEFAULT '1970-01-01T00:00:00Z',
+    last_key        TEXT,       -- pk of the last row synced at last_watermark (JSON array for a composite pk)
     last_run        TIMESTAMPTZ,
     last_status     TEXT        NOT NULL DEFAULT 'pending',
     last_error      TEXT,
     rows_processed  INTEGER     NOT NULL DEFAULT 0
 );
 
+-- Tables created before the sync tracked keys
+ALTER TABLE public.sync_watermarks ADD COLUMN IF NOT EXISTS last_key TEXT;
+
 -- Optional: let the anon key read/write this table (needed by supabase-py)
 -- If your project uses RLS you must add policies; otherwise grant is enough.
 ALTER TABLE public.sync_watermarks ENABLE ROW LEVEL SECURITY;
@@ -0,0 +1,409 @@
+"""
+Unit tests for the orchestration helpers in sync_tasks.py.
+
+Snowflake, Supabase and Celery are mocked; no database or broker required.
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from worker import sync_tasks
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+class _FakeSnowflake:
+    """Connection + cursor answering lookups by statement from *answers* {substring: rows}."""
+
+    def __init__(self, answers: dict):
+        self.answers = answers
+        self.executed = []
+        self._last = []
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+        self._last = next((rows for key, rows in self.answers.items() if key in sql), [])
+
+    def fetchall(self):
+        return self._last
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Local replica metrics mirror
+# ---------------------------------------------------------------------------
+
+class TestMirrorOrRequeue:
+    def test_mirrored_metrics_are_not_requeued(self):
+        with patch.object(sync_tasks, "mirror_metrics_tables", return_value=True), \
+             patch.object(sync_tasks.mirror_replica_metrics, "apply_async") as requeue:
+            sync_tasks._mirror_or_requeue(MagicMock(), ("metrics_risk",))
+        requeue.assert_not_called()
+
+    def test_locked_replica_is_requeued(self):
+        with patch.object(sync_tasks, "mirror_metrics_tables", return_value=False), \
+             patch.object(sync_tasks.mirror_replica_metrics, "apply_async") as requeue:
+            sync_tasks._mirror_or_requeue(MagicMock(), ("metrics_adherence", "metrics_streak"))
+        requeue.assert_called_once_with(
+            args=[["metrics_adherence", "metrics_streak"]],
+            countdown=sync_tasks._MIRROR_RETRY_SECONDS,
+        )
+
+
+# ---------------------------------------------------------------------------
+# Group snapshots after a completion-only sync
+# ---------------------------------------------------------------------------
+
+_COMPLETIONS = {
+    "source": "goal_completions",
+    "target": "fact_goal_completions",
+    "pk": "id",
+    "watermark_column": "created_at",
+    "batch_size": 100,
+    "reader": "postgrest",
+}
+
+
+class TestCompletionSnapshots:
+    def _sync_completions(self, snowflake, rows):
+        """Run the sync task over goal_completions only; returns the queued snapshot refresh kwargs."""
+        config = {"tables": [_COMPLETIONS], "drain": {"max_seconds": 60, "max_rows": 1000}}
+        with patch.object(sync_tasks, "_load_config", return_value=config), \
+             patch.object(sync_tasks, "get_supabase_client"), \
+             patch.object(sync_tasks, "replica_configured", return_value=False), \
+             patch.object(sync_tasks, "get_sync_position", return_value=(T0, None)), \
+             patch.object(sync_tasks, "set_watermark"), \
+             patch.object(sync_tasks, "iter_changed_batches", return_value=(b for b in [rows])), \
+             patch.object(sync_tasks, "get_snowflake_connection", return_value=snowflake), \
+             patch.object(sync_tasks, "upsert_to_snowflake"), \
+             patch.object(sync_tasks, "bump_data_version"), \
+             patch.object(sync_tasks.refresh_group_summary_snapshots, "delay") as refresh:
+            result = sync_tasks.sync_postgres_to_snowflake.run()
+        assert result["status"] == "ok"
+        refresh.assert_called_once()
+        return refresh.call_args.kwargs
+
+    def test_completion_sync_marks_the_goal_owner(self):
+        snowflake = _FakeSnowflake({"FROM   dim_goals": [("owner-1",)]})
+        rows = [
+            {"id": "c1", "goal_id": "goal-1", "date": "2024-01-02", "created_at": "2024-01-02T00:00:00+00:00"},
+            {"id": "c2", "goal_id": "goal-1", "date": "2024-01-03", "created_at": "2024-01-03T00:00:00+00:00"},
+        ]
+        queued = self._sync_completions(snowflake, rows)
+
+        assert queued == {"group_ids": [], "user_ids": ["owner-1"]}
+        lookup = [params for sql, params in snowflake.executed if "FROM   dim_goals" in sql]
+        assert lookup == [('["goal-1"]',)]
+
+    def test_completion_sync_refreshes_the_owners_group_snapshot(self):
+        rows = [{"id": "c1", "goal_id": "goal-1", "date": "2024-01-02",
+                 "created_at": "2024-01-02T00:00:00+00:00"}]
+        queued = self._sync_completions(_FakeSnowflake({"FROM   dim_goals": [("owner-1",)]}), rows)
+
+        snowflake = _FakeSnowflake({"FROM   fact_group_members": [("group-1",)]})
+        summary = {"group_id": "group-1", "members": [{"user_id": "owner-1"}]}
+        with patch.object(sync_tasks, "get_snowflake_connection", return_value=snowflake), \
+             patch.object(sync_tasks, "build_group_member_summaries_batch",
+                          return_value={"group-1": summary}) as build, \
+             patch.object(sync_tasks, "write_group_summary_snapshots") as write, \
+             patch.object(sync_tasks, "bump_data_version"):
+            result = sync_tasks.refresh_group_summary_snapshots.run(**queued)
+
+        build.assert_called_once_with(["group-1"])
+        assert write.call_args.args[1] == [summary]
+        assert result["groups_written"] == 1
+
+    def test_owner_lookups_are_chunked(self):
+        snowflake = _FakeSnowflake({})
+        with patch.object(sync_tasks, "_ID_LOOKUP_CHUNK", 2):
+            sync_tasks._lookup_ids(snowflake, sync_tasks._GOAL_OWNERS_SQL, {"a", "b", "c"})
+        assert [params for _, params in snowflake.executed] == [('["a", "b"]',), ('["c"]',)]
+
+
+# ---------------------------------------------------------------------------
+# Parallel key ranges: splitting, progress and the drain budget
+# ---------------------------------------------------------------------------
+
+def _at(seconds: float) -> datetime:
+    return T0 + timedelta(seconds=seconds)
+
+
+def _rows(*seconds, prefix="r") -> list:
+    return [
+        {"id": f"{prefix}{s}", "user_id": "u1", "created_at": _at(s).isoformat()}
+        for s in seconds
+    ]
+
+
+_CHECK_INS = {
+    "source": "check_ins",
+    "target": "fact_check_ins",
+    "pk": "id",
+    "watermark_column": "created_at",
+}
+_OPTS = {"batch_size": 2, "reader": "postgrest", "loader": "insert", "stage_threshold": 1000}
+
+
+class TestSplitBounds:
+    def _split(self, remaining, span, parts=3, batch_size=10, since=T0):
+        with patch.object(sync_tasks, "count_rows_since", return_value=remaining), \
+             patch.object(sync_tasks, "watermark_span", return_value=span):
+            return sync_tasks._split_bounds(MagicMock(), "check_ins", "created_at", (since, None), batch_size, parts)
+
+    def test_one_part_is_one_range(self):
+        assert self._split(1000, (_at(0), _at(90)), parts=1) == [None]
+
+    def test_small_backlog_is_one_range(self):
+        assert self._split(29, (_at(0), _at(90))) == [None]
+
+    def test_even_time_split(self):
+        assert self._split(30, (_at(0), _at(90))) == [_at(30), _at(60), None]
+
+    def test_uneven_span(self):
+        bounds = self._split(1000, (_at(0), _at(10)))
+        step = timedelta(seconds=10) / 3
+        assert bounds == [T0 + step, T0 + step * 2, None]
+        assert bounds[0] < bounds[1] < _at(10)
+
+    def test_one_timestamp_collapses_to_one_bounded_range(self):
+        # Every pending row shares a watermark: the first range takes them all
+        assert self._split(1000, (_at(5), _at(5))) == [_at(5), None]
+
+    def test_no_span(self):
+        assert self._split(1000, None) == [None]
+
+
+class TestKeysetProgress:
+    def _progress(self, bounds):
+        return sync_tasks._KeysetProgress(MagicMock(), "check_ins", (T0, None), bounds)
+
+    def test_ranges_start_at_the_previous_bound(self):
+        progress = self._progress([_at(30), _at(60), None])
+        assert [progress.start(i) for i in range(3)] == [(T0, None), (_at(30), None), (_at(60), None)]
+
+    def test_cursor_follows_a_single_range(self):
+        progress = self._progress([None])
+        with patch.object(sync_tasks, "set_watermark") as save:
+            progress.advance(0, (_at(1), "r1"), 2)
+            progress.advance(0, (_at(2), "r2"), 2)
+        assert progress.cursor() == (_at(2), "r2")
+        assert [c.kwargs["last_key"] for c in save.call_args_list] == ["r1", "r2"]
+        assert (progress.rows, progress.batches) == (4, 2)
+
+    def test_later_ranges_do_not_move_the_cursor(self):
+        progress = self._progress([_at(30), _at(60), None])
+        with patch.object(sync_tasks, "set_watermark") as save:
+            progress.advance(1, (_at(40), "r40"), 2)
+            progress.advance(2, (_at(70), "r70"), 2)
+            progress.finish(2)
+        assert progress.cursor() == (T0, None)
+        save.assert_not_called()
+
+    def test_cursor_stops_at_the_first_unfinished_range(self):
+        progress = self._progress([_at(30), _at(60), None])
+        with patch.object(sync_tasks, "set_watermark") as save:
+            progress.advance(0, (_at(10), "r10"), 2)
+            progress.advance(1, (_at(40), "r40"), 2)
+            progress.finish(0)
+            progress.finish(2)
+        # Range 1 never finished (e.g. it failed): nothing past it is committed
+        assert progress.cursor() == (_at(40), "r40")
+        assert save.call_args.kwargs["new_watermark"] == _at(40)
+        assert save.call_args.kwargs["last_key"] == "r40"
+
+    def test_all_finished(self):
+        progress = self._progress([_at(30), None])
+        with patch.object(sync_tasks, "set_watermark"):
+            progress.advance(0, (_at(10), "r10"), 1)
+            progress.finish(0)
+            progress.advance(1, (_at(50), "r50"), 1)
+            progress.finish(1)
+        assert progress.cursor() == (_at(50), "r50")
+
+    def test_empty_later_range_keeps_the_bound(self):
+        progress = self._progress([_at(30), None])
+        with patch.object(sync_tasks, "set_watermark"):
+            progress.advance(0, (_at(10), "r10"), 1)
+            progress.finish(0)
+            progress.finish(1)
+        assert progress.cursor() == (_at(30), None)
+
+
+class TestDrainBudget:
+    def test_row_budget(self):
+        budget = sync_tasks._DrainBudget(max_seconds=60, max_rows=5)
+        budget.spend(4)
+        assert not budget.exhausted()
+        budget.spend(1)
+        assert budget.exhausted()
+
+    def test_time_budget(self):
+        assert sync_tasks._DrainBudget(max_seconds=0, max_rows=100).exhausted()
+
+    def test_shared_between_threads(self):
+        budget = sync_tasks._DrainBudget(max_seconds=60, max_rows=1000)
+        threads = [threading.Thread(target=lambda: [budget.spend(1) for _ in range(100)]) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert budget.rows_left == 0 and budget.exhausted()
+
+
+class TestRanges:
+    """_sync_range / _sync_table over fake readers; Snowflake is mocked out."""
+
+    def _batches(self, by_start: dict, failing: tuple = ()):
+        """A _changed_batches stand-in: batches per range start; starts in *failing* raise after them."""
+        closed = []
+
+        def changed_batches(supabase, reader, source, col, pk, start, until, batch_size):
+            def gen():
+                try:
+                    yield from by_start[start]
+                    if start in failing:
+                        raise ConnectionError("stream reset")
+                finally:
+                    closed.append(start)
+            return gen()
+
+        return changed_batches, closed
+
+    def test_budget_stops_a_range_after_its_batch(self):
+        batches, closed = self._batches({(T0, None): [_rows(1, 2), _rows(3, 4), _rows(5)]})
+        progress = sync_tasks._KeysetProgress(MagicMock(), "check_ins", (T0, None), [None])
+        budget = sync_tasks._DrainBudget(max_seconds=60, max_rows=2)
+        with patch.object(sync_tasks, "_changed_batches", side_effect=batches), \
+             patch.object(sync_tasks, "get_snowflake_connection", return_value=_FakeSnowflake({})), \
+             patch.object(sync_tasks, "upsert_to_snowflake") as upsert, \
+             patch.object(sync_tasks, "set_watermark"):
+            caught_up = sync_tasks._sync_range(
+                MagicMock(), None, _CHECK_INS, _OPTS, progress, 0, budget, True, set(), set(),
+            )
+        assert caught_up is False
+        assert upsert.call_count == 1
+        assert progress.cursor() == (_at(2), "r2")
+        assert closed == [(T0, None)]  # the reader is closed early
+
+    def test_short_batch_finishes_the_range(self):
+        batches, _ = self._batches({(T0, None): [_rows(1, 2), _rows(3)]})
+        progress = sync_tasks._KeysetProgress(MagicMock(), "check_ins", (T0, None), [None])
+        budget = sync_tasks._DrainBudget(max_seconds=60, max_rows=100)
+        with patch.object(sync_tasks, "_changed_batches", side_effect=batches), \
+             patch.object(sync_tasks, "get_snowflake_connection", return_value=_FakeSnowflake({})), \
+             patch.object(sync_tasks, "upsert_to_snowflake"), \
+             patch.object(sync_tasks, "set_watermark"):
+            assert sync_tasks._sync_range(
+                MagicMock(), None, _CHECK_INS, _OPTS, progress, 0, budget, True, set(), set(),
+            )
+        assert progress.cursor() == (_at(3), "r3")
+        assert progress.rows == 3
+
+    def test_auto_loader_stages_batches_at_the_threshold(self):
+        batches, _ = self._batches({(T0, None): [_rows(1, 2), _rows(3)]})
+        progress = sync_tasks._KeysetProgress(MagicMock(), "check_ins", (T0, None), [None])
+        opts = dict(_OPTS, loader="auto", stage_threshold=2)
+        with patch.object(sync_tasks, "_changed_batches", side_effect=batches), \
+             patch.object(sync_tasks, "get_snowflake_connection", return_value=_FakeSnowflake({})), \
+             patch.object(sync_tasks, "upsert_to_snowflake") as upsert, \
+             patch.object(sync_tasks, "set_watermark"):
+            sync_tasks._sync_range(
+                MagicMock(), None, _CHECK_INS, opts, progress, 0,
+                sync_tasks._DrainBudget(max_seconds=60, max_rows=100), True, set(), set(),
+            )
+        assert [c.kwargs["bulk"] for c in upsert.call_args_list] == [True, False]
+
+    def test_failed_load_does_not_move_the_cursor(self):
+        batches, _ = self._batches({(T0, None): [_rows(1, 2)]})
+        progress = sync_tasks._KeysetProgress(MagicMock(), "check_ins", (T0, None), [None])
+        failed = RuntimeError("COPY INTO staging_fact_check_ins loaded 1 rows (table has 1), expected 2")
+        with patch.object(sync_tasks, "_changed_batches", side_effect=batches), \
+             patch.object(sync_tasks, "get_snowflake_connection", return_value=_FakeSnowflake({})), \
+             patch.object(sync_tasks, "upsert_to_snowflake", side_effect=failed), \
+             patch.object(sync_tasks, "set_watermark") as save:
+            with pytest.raises(RuntimeError):
+                sync_tasks._sync_range(
+                    MagicMock(), None, _CHECK_INS, dict(_OPTS, loader="stage"), progress, 0,
+                    sync_tasks._DrainBudget(max_seconds=60, max_rows=100), True, set(), set(),
+                )
+        save.assert_not_called()
+        assert progress.cursor() == (T0, None)
+        assert progress.rows == 0
+
+    def test_failed_range_holds_back_the_committed_cursor(self):
+        bounds = [_at(30), _at(60), None]
+        batches, _ = self._batches(
+            {
+                (T0, None):      [_rows(10, 20), _rows(25)],
+                (_at(30), None): [_rows(40, 45)],            # then the stream fails
+                (_at(60), None): [_rows(70, 80), _rows(90)],
+            },
+            failing=((_at(30), None),),
+        )
+        table = dict(_CHECK_INS, batch_size=2, parallel_ranges=3)
+        defaults = {"batch_size": 2, "reader": "postgrest", "loader": "insert", "stage_threshold_rows": 1000}
+        with patch.object(sync_tasks, "get_sync_position", return_value=(T0, None)), \
+             patch.object(sync_tasks, "_split_bounds", return_value=bounds), \
+             patch.object(sync_tasks, "_changed_batches", side_effect=batches), \
+             patch.object(sync_tasks, "get_snowflake_connection", side_effect=lambda: _FakeSnowflake({})), \
+             patch.object(sync_tasks, "upsert_to_snowflake"), \
+             patch.object(sync_tasks, "set_watermark") as save:
+            entry = sync_tasks._sync_table(
+                MagicMock(), None, table, defaults,
+                sync_tasks._DrainBudget(max_seconds=60, max_rows=1000), True, set(), set(),
+            )
+
+        assert entry["status"] == "error"
+        assert entry["rows"] == 8  # everything read was committed
+        # Range 0 is done and range 1 got to r45: nothing of range 2 may be skipped
+        for c in save.call_args_list:
+            assert c.kwargs["new_watermark"] <= _at(45)
+        final = save.call_args.kwargs
+        assert (final["new_watermark"], final["last_key"], final["status"]) == (_at(45), "r45", "error")
+
+
+class TestSavedKeyFormat:
+    """A cursor saved under another pk (user_id before group_members' key became composite) restarts the table."""
+
+    _GROUP_MEMBERS = {
+        "source": "group_members",
+        "target": "fact_group_members",
+        "pk": ["group_id", "user_id"],
+        "watermark_column": "joined_at",
+    }
+    _DEFAULTS = {"batch_size": 2, "reader": "postgrest", "loader": "insert", "stage_threshold_rows": 1000}
+
+    def _start(self, saved):
+        starts = []
+
+        def changed_batches(supabase, reader, source, col, pk, start, until, batch_size):
+            starts.append(start)
+            return (rows for rows in ())
+
+        with patch.object(sync_tasks, "get_sync_position", return_value=saved), \
+             patch.object(sync_tasks, "_changed_batches", side_effect=changed_batches), \
+             patch.object(sync_tasks, "get_snowflake_connection", return_value=_FakeSnowflake({})), \
+             patch.object(sync_tasks, "set_watermark"):
+            entry = sync_tasks._sync_table(
+                MagicMock(), None, self._GROUP_MEMBERS, self._DEFAULTS,
+                sync_tasks._DrainBudget(max_seconds=60, max_rows=1000), False, set(), set(),
+            )
+        assert entry["status"] != "error"
+        return starts
+
+    def test_old_single_column_key_resyncs_from_the_start(self):
+        assert self._start((_at(50), "u1")) == [(sync_tasks.EPOCH, None)]
+
+    def test_composite_key_resumes(self):
+        assert self._start((_at(50), '["g1", "u1"]')) == [(_at(50), '["g1", "u1"]')]
@@ -2,21 +2,40 @@
 Unit tests for watermark helpers in sync_utils.py.
 
 These tests use only stdlib / pure-Python objects — no database required.
-The Postgres calls are mocked via supabase-py's Client interface.
+The Postgres calls are mocked via supabase-py's Client interface, or a fake
+psycopg connection for the streaming reader.
 """
 
+import glob
+import gzip
+import os
 import uuid
 from datetime import datetime, timezone, timedelta
-from unittest.mock import MagicMock, call
+from unittest.mock import MagicMock, call, patch
 
+import psycopg
 import pytest
 
+from worker import sync_utils
 from worker.sync_utils import (
     EPOCH,
+    _cast_from_text,
+    _csv_field,
     _serialize_value,
+    column_types_for,
+    count_rows_since,
+    decode_key,
+    encode_key,
+    fetch_changed_rows,
+    iter_changed_batches,
+    get_sync_position,
     get_watermark,
+    keyset_position,
     max_watermark_from_rows,
     set_watermark,
+    stage_load_rows,
+    stream_changed_batches,
+    upsert_to_snowflake,
 )
 
 
@@ -41,6 +60,8 @@ def _make_supabase_read(data: list) -> MagicMock:
     chain.limit.return_value = chain
     chain.order.return_value = chain
     chain.gt.return_value = chain
+    chain.or_.return_value = chain
+    chain.lte.return_value = chain
 
     supabase = MagicMock()
     supabase.table.return_value = chain
@@ -180,6 +201,15 @@ class TestSetWatermark:
         assert payload["rows_processed"] == 10
         assert payload["last_watermark"] == wm.isoformat()
 
+    def test_upsert_payload_carries_last_key(self):
+        supabase = _make_supabase_write()
+        wm = datetime(2026, 2, 15, 8, 0, 0, tzinfo=timezone.utc)
+
+        set_watermark(supabase, "check_ins", wm, rows_processed=5, last_key="abc")
+
+        payload = supabase.table.return_value.upsert.call_args[0][0]
+        assert payload["last_key"] == "abc"
+
     def test_passes_error_string(self):
         supabase = _make_supabase_write()
         wm = datetime(2026, 2, 15, 8, 0, 0, tzinfo=timezone.utc)
@@ -243,3 +273,485 @@ class TestMaxWatermarkFromRows:
         ]
         result = max_watermark_from_rows(rows, "updated_at")
         assert result == dt2
+
+
+# ---------------------------------------------------------------------------
+# count_rows_since
+# ---------------------------------------------------------------------------
+
+class TestCountRowsSince:
+    def test_returns_estimated_count(self):
+        supabase = _make_supabase_read([])
+        supabase.table.return_value.execute.return_value.count = 4200
+        since = datetime(2026, 2, 1, tzinfo=timezone.utc)
+
+        assert count_rows_since(supabase, "check_ins", "created_at", since) == 4200
+
+        chain = supabase.table.return_value
+        supabase.table.assert_called_once_with("check_ins")
+        chain.select.assert_called_once_with("*", count="estimated", head=True)
+        chain.gt.assert_called_once_with("created_at", since.isoformat())
+
+
+# ---------------------------------------------------------------------------
+# iter_changed_batches
+# ---------------------------------------------------------------------------
+
+def _rows(start: int, n: int) -> list:
+    return [
+        {"id": str(i), "created_at": f"2026-01-01T00:00:{i:02d}"}
+        for i in range(start, start + n)
+    ]
+
+
+class TestIterChangedBatches:
+    def test_pages_from_each_batch_max_until_short_batch(self):
+        pages = [_rows(0, 2), _rows(2, 2), _rows(4, 1)]
+        with patch("worker.sync_utils.fetch_changed_rows", side_effect=pages) as fetch:
+            batches = list(iter_changed_batches(MagicMock(), "check_ins", "created_at", EPOCH, 2))
+
+        assert batches == pages
+        assert fetch.call_count == 3
+        assert fetch.call_args_list[1][0][3] == datetime(2026, 1, 1, 0, 0, 1, tzinfo=timezone.utc)
+
+    def test_keyset_pages_through_rows_sharing_a_timestamp(self):
+        tied = [{"id": f"k{i}", "created_at": "2026-01-01T00:00:00"} for i in range(5)]
+        pages = [tied[:2], tied[2:4], tied[4:]]
+        with patch("worker.sync_utils.fetch_changed_rows", side_effect=pages) as fetch:
+            batches = list(iter_changed_batches(MagicMock(), "check_ins", "created_at", EPOCH, 2, pk="id"))
+
+        assert batches == pages
+        tie = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        assert fetch.call_args_list[1][0][3] == tie
+        assert fetch.call_args_list[1][1]["after_key"] == "k1"
+        assert fetch.call_args_list[2][1]["after_key"] == "k3"
+
+    def test_composite_key_keeps_ties_across_a_batch_boundary(self):
+        # Same joined_at and user_id in two groups: a user_id-only cursor
+        # would skip the second row
+        tied = [
+            {"group_id": "g1", "user_id": "u1", "joined_at": "2026-01-01T00:00:00"},
+            {"group_id": "g2", "user_id": "u1", "joined_at": "2026-01-01T00:00:00"},
+        ]
+        pages = [tied[:1], tied[1:], []]
+        with patch("worker.sync_utils.fetch_changed_rows", side_effect=pages) as fetch:
+            batches = list(iter_changed_batches(
+                MagicMock(), "group_members", "joined_at", EPOCH, 1, pk=["group_id", "user_id"],
+            ))
+
+        assert batches == pages[:2]
+        assert fetch.call_args_list[1][1]["after_key"] == '["g1", "u1"]'
+
+    def test_stops_when_full_batch_cannot_advance_watermark(self):
+        stuck = [{"id": str(i), "created_at": "2026-01-01T00:00:00"} for i in range(2)]
+        since = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        with patch("worker.sync_utils.fetch_changed_rows", return_value=stuck) as fetch:
+            batches = list(iter_changed_batches(MagicMock(), "check_ins", "created_at", since, 2))
+
+        assert batches == [stuck]
+        fetch.assert_called_once()
+
+
+# ---------------------------------------------------------------------------
+# _csv_field (staged file load)
+# ---------------------------------------------------------------------------
+
+class TestCsvField:
+    def test_none_is_unquoted_empty(self):
+        # EMPTY_FIELD_AS_NULL: loads as NULL
+        assert _csv_field(None) == ""
+
+    def test_empty_string_is_quoted(self):
+        assert _csv_field("") == '""'
+
+    def test_quotes_doubled(self):
+        assert _csv_field('say "hi"') == '"say ""hi"""'
+
+    def test_bool_and_number_rendering(self):
+        assert _csv_field(True) == '"true"'
+        assert _csv_field(3.5) == '"3.5"'
+
+
+# ---------------------------------------------------------------------------
+# stage_load_rows (PUT + COPY INTO)
+# ---------------------------------------------------------------------------
+
+class _FakeStageCursor:
+    """
+    Snowflake cursor answering PUT / COPY / COUNT(*) like the stage load
+    expects. *put_statuses* None means every local file uploads; *loaded*
+    and *counted* default to the number of rows written by the PUT.
+    """
+
+    def __init__(self, put_statuses=None, loaded=None, counted=None):
+        self.put_statuses = put_statuses
+        self.loaded = loaded
+        self.counted = counted
+        self.executed = []
+        self.files = {}  # name -> data rows, captured at PUT time
+        self.description = []
+        self._results = []
+
+    def execute(self, statement, params=None):
+        statement = " ".join(statement.split())
+        self.executed.append(statement)
+        self.description, self._results = [], []
+        if statement.startswith("PUT"):
+            pattern = statement.split("'file://", 1)[1].split("'", 1)[0]
+            for path in sorted(glob.glob(pattern)):
+                with gzip.open(path, "rt") as f:
+                    self.files[os.path.basename(path)] = len(f.read().splitlines())
+            statuses = self.put_statuses or ["UPLOADED"] * len(self.files)
+            self.description = [("source",), ("status",)]
+            self._results = [(f"f{i}", st) for i, st in enumerate(statuses)]
+        elif statement.startswith("COPY INTO"):
+            loaded = self.loaded if self.loaded is not None else sum(self.files.values())
+            self.description = [("file",), ("rows_loaded",)]
+            self._results = [("f0", loaded)]
+        elif statement.startswith("SELECT COUNT(*)"):
+            counted = self.counted if self.counted is not None else sum(self.files.values())
+            self._results = [(counted,)]
+
+    def executemany(self, statement, rows):
+        self.executed.append(" ".join(statement.split()))
+
+    def fetchall(self):
+        return self._results
+
+    def fetchone(self):
+        return self._results[0]
+
+    def statements(self, prefix: str) -> list:
+        return [s for s in self.executed if s.startswith(prefix)]
+
+
+def _stage_rows(n: int) -> list:
+    return [{"id": f"id{i}", "note": f"n{i}"} for i in range(n)]
+
+
+class TestStageLoadRows:
+    def test_loads_and_removes_the_staged_files(self):
+        cursor = _FakeStageCursor()
+        assert stage_load_rows(cursor, "staging_t", ["id", "note"], _stage_rows(3)) == 3
+
+        (put,) = cursor.statements("PUT")
+        stage_path = put.split()[2]
+        assert cursor.executed[-1] == f"REMOVE {stage_path}"
+
+    def test_files_are_split_at_rows_per_file(self, monkeypatch):
+        monkeypatch.setattr(sync_utils, "STAGE_ROWS_PER_FILE", 2)
+        cursor = _FakeStageCursor()
+        stage_load_rows(cursor, "staging_t", ["id", "note"], _stage_rows(5))
+        assert cursor.files == {"part_00000.csv.gz": 2, "part_00001.csv.gz": 2, "part_00002.csv.gz": 1}
+
+    @pytest.mark.parametrize("statuses", [["UPLOADED", "ERROR"], ["UPLOADED"]])
+    def test_failed_or_short_put_raises(self, monkeypatch, statuses):
+        monkeypatch.setattr(sync_utils, "STAGE_ROWS_PER_FILE", 2)
+        cursor = _FakeStageCursor(put_statuses=statuses)
+        with pytest.raises(RuntimeError, match="uploaded 1 of 2 files"):
+            stage_load_rows(cursor, "staging_t", ["id", "note"], _stage_rows(3))
+        assert not cursor.statements("COPY")
+        assert cursor.executed[-1].startswith("REMOVE @~/")
+
+    @pytest.mark.parametrize("overrides", [{"loaded": 2}, {"counted": 4}])
+    def test_row_count_mismatch_raises(self, overrides):
+        cursor = _FakeStageCursor(**overrides)
+        with pytest.raises(RuntimeError, match="expected 3"):
+            stage_load_rows(cursor, "staging_t", ["id", "note"], _stage_rows(3))
+        assert cursor.executed[-1].startswith("REMOVE @~/")
+
+    def test_remove_failure_does_not_mask_the_load(self):
+        cursor = _FakeStageCursor()
+        execute = cursor.execute
+
+        def failing_remove(statement, params=None):
+            execute(statement, params)
+            if statement.startswith("REMOVE"):
+                raise RuntimeError("stage unavailable")
+
+        cursor.execute = failing_remove
+        assert stage_load_rows(cursor, "staging_t", ["id", "note"], _stage_rows(2)) == 2
+
+    def test_short_copy_never_merges(self):
+        cursor = _FakeStageCursor(loaded=1)
+        with pytest.raises(RuntimeError):
+            upsert_to_snowflake(cursor, "fact_t", _stage_rows(2), "id", bulk=True)
+        assert not cursor.statements("MERGE")
+        assert cursor.statements("REMOVE")
+
+    def test_bulk_upsert_merges_after_a_verified_load(self):
+        cursor = _FakeStageCursor()
+        upsert_to_snowflake(cursor, "fact_t", _stage_rows(2), "id", bulk=True)
+        order = [s.split()[0] for s in cursor.executed]
+        assert order.index("REMOVE") < order.index("MERGE")
+        assert not cursor.statements("INSERT")
+
+
+# ---------------------------------------------------------------------------
+# column_types_for / _cast_from_text (typed targets)
+# ---------------------------------------------------------------------------
+
+class TestColumnTypes:
+    def test_declared_types_win_over_inference(self):
+        rows = [{"id": "a", "mood": 3, "date": "2026-01-01"}]
+        types = column_types_for(["id", "mood", "date"], {"date": "date", "mood": "NUMBER(10,2)"}, rows)
+        assert types == {"id": "VARCHAR", "mood": "NUMBER(10,2)", "date": "DATE"}
+
+    def test_infers_from_first_non_null_value(self):
+        rows = [
+            {"done": None, "n": None, "score": None, "note": None},
+            {"done": True, "n": 2, "score": 0.5, "note": "x"},
+        ]
+        types = column_types_for(["done", "n", "score", "note"], None, rows)
+        assert types == {"done": "BOOLEAN", "n": "NUMBER", "score": "FLOAT", "note": "VARCHAR"}
+
+    def test_rejects_unknown_declared_type(self):
+        with pytest.raises(ValueError):
+            column_types_for(["x"], {"x": "GEOGRAPHY"}, [])
+
+    def test_cast_expressions(self):
+        assert _cast_from_text("c", "VARCHAR(16777216)") == "c"
+        assert _cast_from_text("c", "VARIANT") == "PARSE_JSON(c)"
+        assert _cast_from_text("c", "TIMESTAMP_NTZ(9)") == "CAST(c AS TIMESTAMP_NTZ(9))"
+
+
+# ---------------------------------------------------------------------------
+# Keyset cursor: get_sync_position / fetch_changed_rows / keyset_position
+# ---------------------------------------------------------------------------
+
+class TestKeysetCursor:
+    def test_position_defaults_to_epoch_without_key(self):
+        assert get_sync_position(_make_supabase_read([]), "check_ins") == (EPOCH, None)
+
+    def test_position_reads_watermark_and_key(self):
+        supabase = _make_supabase_read([{"last_watermark": "2026-02-01T12:00:00", "last_key": "k9"}])
+        since, key = get_sync_position(supabase, "check_ins")
+        assert since == datetime(2026, 2, 1, 12, 0, 0, tzinfo=timezone.utc)
+        assert key == "k9"
+        supabase.table.return_value.select.assert_called_once_with("last_watermark,last_key")
+
+    def test_fetch_filters_after_key_and_orders_by_pk(self):
+        supabase = _make_supabase_read([])
+        since = datetime(2026, 2, 1, tzinfo=timezone.utc)
+        until = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+        fetch_changed_rows(supabase, "check_ins", "created_at", since, 100, pk="id", after_key="k9", until=until)
+
+        chain = supabase.table.return_value
+        chain.gt.assert_not_called()
+        chain.or_.assert_called_once_with(
+            f'created_at.gt."{since.isoformat()}",and(created_at.eq."{since.isoformat()}",id.gt."k9")'
+        )
+        chain.lte.assert_called_once_with("created_at", until.isoformat())
+        assert chain.order.call_args_list == [call("created_at", desc=False), call("id", desc=False)]
+
+    def test_keyset_position_is_last_row(self):
+        rows = [
+            {"id": "a", "created_at": "2026-01-01T00:00:00"},
+            {"id": "b", "created_at": "2026-01-01T00:00:01+00:00"},
+        ]
+        assert keyset_position(rows, "created_at", "id") == (
+            datetime(2026, 1, 1, 0, 0, 1, tzinfo=timezone.utc), "b",
+        )
+        assert keyset_position(rows, "created_at") == (
+            datetime(2026, 1, 1, 0, 0, 1, tzinfo=timezone.utc), None,
+        )
+        assert keyset_position([], "created_at", "id") is None
+
+    def test_composite_key_round_trip(self):
+        pk = ["group_id", "user_id"]
+        row = {"group_id": "g1", "user_id": "u1", "joined_at": "2026-01-01T00:00:00"}
+        since, key = keyset_position([row], "joined_at", pk)
+        assert key == '["g1", "u1"]'
+        assert decode_key(pk, key) == ["g1", "u1"]
+        assert encode_key(pk, {**row, "group_id": None}) is None
+
+    def test_key_saved_for_another_pk_does_not_decode(self):
+        pk = ["group_id", "user_id"]
+        assert decode_key(pk, "u1") is None
+        assert decode_key(pk, '["u1"]') is None
+        assert decode_key("id", '["g1", "u1"]') == ['["g1", "u1"]']
+
+    def test_fetch_filters_after_composite_key(self):
+        supabase = _make_supabase_read([])
+        since = datetime(2026, 2, 1, tzinfo=timezone.utc)
+        s = f'"{since.isoformat()}"'
+
+        fetch_changed_rows(
+            supabase, "group_members", "joined_at", since, 100,
+            pk=["group_id", "user_id"], after_key='["g1", "u1"]',
+        )
+
+        chain = supabase.table.return_value
+        chain.or_.assert_called_once_with(
+            f"joined_at.gt.{s},"
+            f'and(joined_at.eq.{s},group_id.gt."g1"),'
+            f'and(joined_at.eq.{s},group_id.eq."g1",user_id.gt."u1")'
+        )
+        assert chain.order.call_args_list == [
+            call("joined_at", desc=False), call("group_id", desc=False), call("user_id", desc=False),
+        ]
+
+    def test_merge_matches_on_every_key_column(self):
+        cursor = MagicMock()
+        rows = [{"group_id": "g1", "user_id": "u1", "joined_at": "2026-01-01T00:00:00", "role": "member"}]
+        upsert_to_snowflake(cursor, "fact_group_members", rows, ["group_id", "user_id"])
+
+        merge = " ".join(cursor.execute.call_args_list[-1][0][0].split())
+        assert "ON t.group_id = s.group_id AND t.user_id = s.user_id" in merge
+        assert "UPDATE SET t.joined_at = s.joined_at, t.role = s.role WHEN NOT MATCHED" in merge
+
+
+# ---------------------------------------------------------------------------
+# stream_changed_batches (psycopg server-side cursor)
+# ---------------------------------------------------------------------------
+
+class _FakeColumn:
+    def __init__(self, name: str, type_code: int):
+        self.name = name
+        self.type_code = type_code
+
+
+class _FakeNamedCursor:
+    def __init__(self, records: list, description: list):
+        self.records = list(records)
+        self.description = description
+        self.adapters = psycopg.adapters  # the built-in type registry
+        self.executed = []
+        self.fetches = 0
+        self.closed = False
+
+    def execute(self, query, params):
+        self.executed.append((query.as_string(None), list(params)))
+
+    def fetchmany(self, size):
+        self.fetches += 1
+        batch, self.records = self.records[:size], self.records[size:]
+        return batch
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+
+class _FakePgConnection:
+    def __init__(self, cursor: _FakeNamedCursor):
+        self._cursor = cursor
+        self.cursor_names = []
+        self.read_only = False
+        self.adapters = MagicMock()
+        self.closed = False
+
+    def cursor(self, name=None):
+        self.cursor_names.append(name)
+        return self._cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+
+_UUID, _TEXT, _TIMESTAMPTZ, _TEXT_ARRAY = 2950, 25, 1184, 1009
+
+
+class TestStreamChangedBatches:
+    SINCE = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    @pytest.fixture
+    def stream(self, monkeypatch):
+        """Open the reader over fake records; returns (generator, connection, cursor)."""
+        def open_stream(records, batch_size=2, description=None, **kwargs):
+            cursor = _FakeNamedCursor(
+                records, description or [_FakeColumn("id", _UUID), _FakeColumn("created_at", _TIMESTAMPTZ)],
+            )
+            conn = _FakePgConnection(cursor)
+            # The generator connects on first next(), so the patch outlives this call
+            monkeypatch.setattr(sync_utils.psycopg, "connect", MagicMock(return_value=conn))
+            gen = stream_changed_batches(
+                "check_ins", "created_at", self.SINCE, batch_size, dsn="postgresql://x", **kwargs,
+            )
+            return gen, conn, cursor
+        return open_stream
+
+    def _records(self, n):
+        return [(f"id{i}", self.SINCE + timedelta(seconds=i)) for i in range(n)]
+
+    def test_plain_watermark_predicate(self, stream):
+        gen, conn, cursor = stream([])
+        assert list(gen) == []
+        assert cursor.executed == [(
+            'SELECT * FROM "check_ins" WHERE "created_at" > %s ORDER BY "created_at"',
+            [self.SINCE],
+        )]
+        assert conn.cursor_names == ["sync_check_ins"]
+        assert conn.read_only is True
+        registered = [c.args[0] for c in conn.adapters.register_loader.call_args_list]
+        assert registered == ["uuid", "json", "jsonb"]
+
+    def test_keyset_row_comparison_with_upper_bound(self, stream):
+        until = self.SINCE + timedelta(hours=1)
+        gen, _, cursor = stream([], pk="id", after_key="k9", until=until)
+        list(gen)
+        assert cursor.executed == [(
+            'SELECT * FROM "check_ins" WHERE ("created_at", "id") > (%s, %s) '
+            'AND "created_at" <= %s ORDER BY "created_at", "id"',
+            [self.SINCE, "k9", until],
+        )]
+
+    def test_composite_key_row_comparison(self, stream):
+        gen, _, cursor = stream([], pk=["group_id", "user_id"], after_key='["g1", "u1"]')
+        list(gen)
+        assert cursor.executed == [(
+            'SELECT * FROM "check_ins" WHERE ("created_at", "group_id", "user_id") > (%s, %s, %s) '
+            'ORDER BY "created_at", "group_id", "user_id"',
+            [self.SINCE, "g1", "u1"],
+        )]
+
+    def test_first_page_without_a_key_still_orders_by_pk(self, stream):
+        gen, _, cursor = stream([], pk="id")
+        list(gen)
+        assert cursor.executed == [(
+            'SELECT * FROM "check_ins" WHERE "created_at" > %s ORDER BY "created_at", "id"',
+            [self.SINCE],
+        )]
+
+    def test_batch_boundaries(self, stream):
+        gen, conn, cursor = stream(self._records(5), batch_size=2)
+        batches = list(gen)
+        assert [len(b) for b in batches] == [2, 2, 1]
+        assert [r["id"] for b in batches for r in b] == [f"id{i}" for i in range(5)]
+        assert cursor.itersize == 2
+        assert cursor.closed and conn.closed
+
+    def test_exact_multiple_ends_on_an_empty_fetch(self, stream):
+        gen, _, cursor = stream(self._records(4), batch_size=2)
+        assert [len(b) for b in gen] == [2, 2]
+        assert cursor.fetches == 3
+
+    def test_values_are_converted_like_postgrest_rows(self, stream):
+        description = [
+            _FakeColumn("id", _UUID),
+            _FakeColumn("created_at", _TIMESTAMPTZ),
+            _FakeColumn("tags", _TEXT_ARRAY),
+            _FakeColumn("note", _TEXT),
+        ]
+        aware = datetime(2026, 1, 1, 12, 0, tzinfo=timezone(timedelta(hours=2)))
+        gen, _, _ = stream([("id0", aware, ["a", "b"], "hi")], description=description)
+        (batch,) = list(gen)
+        assert batch == [{
+            "id": "id0", "created_at": "2026-01-01T10:00:00", "tags": '["a", "b"]', "note": "hi",
+        }]
+
+    def test_closing_early_closes_cursor_and_connection(self, stream):
+        gen, conn, cursor = stream(self._records(10), batch_size=2)
+        first = next(gen)
+        assert len(first) == 2
+        assert not cursor.closed
+
+        gen.close()
+        assert cursor.closed and conn.closed
+        assert cursor.fetches == 1
@@ -2,20 +2,40 @@
 Helper utilities for the Postgres → Snowflake incremental sync.
 
 Responsibilities:
-- Watermark read/write against the sync_watermarks Postgres table (via supabase-py)
-- Fetching changed rows from Postgres using a watermark timestamp (via supabase-py)
-- Upserting rows into Snowflake via a temporary staging table + MERGE
+- Watermark read/write against the sync_watermarks Postgres table (via supabase-py):
+  a keyset cursor, the (watermark, pk) of the last row synced; pk may be
+  composite (a list of columns)
+- Fetching changed rows from Postgres after that cursor in (watermark, pk)
+  order, optionally capped at an upper watermark, either through PostgREST
+  (supabase-py) or streamed straight from Postgres over psycopg (per-table
+  ``reader`` in sync_config.yaml)
+- Estimating the rows still to sync (backlog) for lag reporting, and the
+  watermark span of that backlog for splitting it into ranges
+- Upserting rows into Snowflake via a temporary staging table + MERGE; the
+  staging table is filled with bound INSERTs or, for large batches, by
+  PUTting gzipped CSV files to the user stage and COPYing them in
+- Typed target tables: per-column types declared in sync_config.yaml (or
+  inferred), cast in the MERGE, with new columns added in place
 - JSON/UUID serialization for Snowflake compatibility
 """
 
+import gzip
 import json
 import logging
+import os
+import tempfile
 import uuid
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
+import psycopg
+from psycopg import sql
+from psycopg.types.string import TextLoader
+from sqlalchemy.engine import make_url
 from supabase import Client
 
+from app.config import settings
+
 logger = logging.getLogger(__name__)
 
 # Epoch used when no watermark exists yet — syncs all rows on first run
@@ -26,6 +46,25 @@ EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 # Watermark helpers (Postgres via supabase-py)
 # ---------------------------------------------------------------------------
 
+def _parse_watermark(raw: Any) -> Optional[datetime]:
+    """A stored or fetched watermark value as an aware datetime (naive = UTC), or None."""
+    # PostgREST returns timestamps as ISO strings
+    if isinstance(raw, str):
+        try:
+            ts = datetime.fromisoformat(raw)
+        except ValueError:
+            return None
+    elif isinstance(raw, datetime):
+        ts = raw
+    else:
+        return None
+
+    # Ensure timezone-aware so comparisons are consistent
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts
+
+
 def get_watermark(supabase: Client, source_table: str) -> datetime:
     """
     Return the last successful watermark for *source_table*.
@@ -43,20 +82,33 @@ def get_watermark(supabase: Client, source_table: str) -> datetime:
     data = response.data
     if not data or data[0].get("last_watermark") is None:
         return EPOCH
+    return _parse_watermark(data[0]["last_watermark"]) or EPOCH
 
-    raw = data[0]["last_watermark"]
-    # PostgREST returns timestamps as ISO strings
-    if isinstance(raw, str):
-        ts = datetime.fromisoformat(raw)
-    elif isinstance(raw, datetime):
-        ts = raw
-    else:
-        return EPOCH
 
-    # Ensure timezone-aware so comparisons are consistent
-    if ts.tzinfo is None:
-        ts = ts.replace(tzinfo=timezone.utc)
-    return ts
+def get_sync_position(supabase: Client, source_table: str) -> Tuple[datetime, Optional[str]]:
+    """
+    Return the keyset cursor for *source_table*: (last_watermark, last_key),
+    the watermark and primary key of the last row synced. Rows after it in
+    (watermark_column, pk) order are still to sync. A None key means every
+    row at last_watermark is done (first run, or a cursor saved before keys
+    were tracked).
+    """
+    response = (
+        supabase
+        .table("sync_watermarks")
+        .select("last_watermark,last_key")
+        .eq("source_table", source_table)
+        .limit(1)
+        .execute()
+    )
+
+    data = response.data
+    if not data:
+        return EPOCH, None
+    since = _parse_watermark(data[0].get("last_watermark"))
+    if since is None:
+        return EPOCH, None
+    return since, data[0].get("last_key")
 
 
 def set_watermark(
@@ -66,16 +118,19 @@ def set_watermark(
     rows_processed: int,
     status: str = "ok",
     error: Optional[str] = None,
+    last_key: Optional[str] = None,
 ) -> None:
     """
     Upsert the watermark row for *source_table* in sync_watermarks.
     Called atomically after a successful batch so the task can resume
-    from the correct position on the next run.
+    from the correct position on the next run. *last_key* is the primary
+    key of the last row synced at *new_watermark* (see get_sync_position).
     """
     supabase.table("sync_watermarks").upsert(
         {
             "source_table": source_table,
             "last_watermark": new_watermark.isoformat(),
+            "last_key": last_key,
             "last_run": datetime.now(tz=timezone.utc).isoformat(),
             "last_status": status,
             "last_error": error,
@@ -85,36 +140,112 @@ def set_watermark(
     ).execute()
 
 
+# ---------------------------------------------------------------------------
+# Primary keys
+# ---------------------------------------------------------------------------
+
+# tables[].pk in sync_config.yaml: a column, or a list of columns for a
+# composite key
+PrimaryKey = Union[str, List[str]]
+
+
+def key_columns(pk: Optional[PrimaryKey]) -> List[str]:
+    """The columns of *pk*, in key order (empty without a key)."""
+    if not pk:
+        return []
+    return [pk] if isinstance(pk, str) else list(pk)
+
+
+def encode_key(pk: PrimaryKey, row: Dict[str, Any]) -> Optional[str]:
+    """
+    *row*'s key as saved in sync_watermarks.last_key: the value itself for
+    a single-column key, a JSON array of the values for a composite one.
+    None if any key column is null.
+    """
+    values = [row.get(c) for c in key_columns(pk)]
+    if not values or any(v is None for v in values):
+        return None
+    if isinstance(pk, str):
+        return str(values[0])
+    return json.dumps([str(v) for v in values])
+
+
+def decode_key(pk: PrimaryKey, key: Optional[str]) -> Optional[List[str]]:
+    """
+    The key column values saved by encode_key, or None if *key* is None or
+    was not saved for this key (e.g. before a table's key became
+    composite).
+    """
+    if key is None:
+        return None
+    if isinstance(pk, str):
+        return [key]
+    try:
+        values = json.loads(key)
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != len(key_columns(pk)):
+        return None
+    return [str(v) for v in values]
+
+
 # ---------------------------------------------------------------------------
 # Postgres read helpers (via supabase-py)
 # ---------------------------------------------------------------------------
 
+def _postgrest_quote(val: Any) -> str:
+    """*val* as a double-quoted PostgREST filter value (safe inside or=(...))."""
+    text = str(val).replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{text}"'
+
+
 def fetch_changed_rows(
     supabase: Client,
     source_table: str,
     watermark_column: str,
     since: datetime,
     batch_size: int,
+    pk: Optional[PrimaryKey] = None,
+    after_key: Optional[str] = None,
+    until: Optional[datetime] = None,
 ) -> List[Dict[str, Any]]:
     """
     Return up to *batch_size* rows from *source_table* where
     *watermark_column* > *since*, ordered ascending so the watermark
     advances correctly even if the batch is partial.
 
+    With *pk*, rows are ordered by (watermark_column, pk...) and a non-None
+    *after_key* (encode_key) also takes the rows at *since* whose key sorts
+    after it, so paging from the last row of a batch (keyset_position)
+    neither skips nor repeats rows that share a timestamp. *until* caps
+    *watermark_column* (inclusive).
+
     Returns a list of plain dicts (column → value) with all values
     serialized to Snowflake-safe types via _serialize_value().
     """
     since_iso = since.isoformat()
 
-    response = (
-        supabase
-        .table(source_table)
-        .select("*")
-        .gt(watermark_column, since_iso)
-        .order(watermark_column, desc=False)
-        .limit(batch_size)
-        .execute()
-    )
+    keys = key_columns(pk)
+    after = decode_key(pk, after_key) if keys else None
+
+    query = supabase.table(source_table).select("*")
+    if after is not None:
+        # Row comparison (col, k1, k2, ...) > (since, v1, v2, ...), spelled
+        # out term by term since PostgREST has no row values
+        eq = [f"{watermark_column}.eq.{_postgrest_quote(since_iso)}"]
+        terms = [f"{watermark_column}.gt.{_postgrest_quote(since_iso)}"]
+        for col, val in zip(keys, after):
+            terms.append(f"and({','.join(eq)},{col}.gt.{_postgrest_quote(val)})")
+            eq.append(f"{col}.eq.{_postgrest_quote(val)}")
+        query = query.or_(",".join(terms))
+    else:
+        query = query.gt(watermark_column, since_iso)
+    if until is not None:
+        query = query.lte(watermark_column, until.isoformat())
+    query = query.order(watermark_column, desc=False)
+    for col in keys:
+        query = query.order(col, desc=False)
+    response = query.limit(batch_size).execute()
 
     rows = []
     for raw_row in (response.data or []):
@@ -124,6 +255,101 @@ def fetch_changed_rows(
     return rows
 
 
+def iter_changed_batches(
+    supabase: Client,
+    source_table: str,
+    watermark_column: str,
+    since: datetime,
+    batch_size: int,
+    pk: Optional[PrimaryKey] = None,
+    after_key: Optional[str] = None,
+    until: Optional[datetime] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield successive fetch_changed_rows() batches, each starting after the
+    last row of the previous one, until a batch comes back short.
+
+    With *pk* the batches page by (watermark_column, pk), so any number of
+    rows may share a timestamp. Without it, stops early if a full batch
+    can't move the watermark (every row shares one value) rather than
+    fetching the same rows forever.
+    """
+    while True:
+        rows = fetch_changed_rows(
+            supabase, source_table, watermark_column, since, batch_size,
+            pk=pk, after_key=after_key, until=until,
+        )
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        position = keyset_position(rows, watermark_column, pk)
+        if position is None:
+            return
+        next_since, next_key = position
+        if pk is None and next_since <= since:
+            logger.warning(
+                "[sync] %s: a full batch of %d rows shares %s = %s; raise batch_size to get past it",
+                source_table, len(rows), watermark_column, since,
+            )
+            return
+        since, after_key = next_since, next_key
+
+
+def watermark_span(
+    supabase: Client,
+    source_table: str,
+    watermark_column: str,
+    since: datetime,
+) -> Optional[Tuple[datetime, datetime]]:
+    """
+    (oldest, newest) *watermark_column* among the rows of *source_table*
+    at or after *since*, or None if there are none. Two single-row reads
+    that an index on the column answers without a scan.
+    """
+    edges = []
+    for desc in (False, True):
+        response = (
+            supabase
+            .table(source_table)
+            .select(watermark_column)
+            .gte(watermark_column, since.isoformat())
+            .order(watermark_column, desc=desc)
+            .limit(1)
+            .execute()
+        )
+        data = response.data
+        edge = _parse_watermark(data[0].get(watermark_column)) if data else None
+        if edge is None:
+            return None
+        edges.append(edge)
+    return edges[0], edges[1]
+
+
+def count_rows_since(
+    supabase: Client,
+    source_table: str,
+    watermark_column: str,
+    since: datetime,
+) -> Optional[int]:
+    """
+    Estimate how many rows of *source_table* are still past *since*.
+
+    Uses PostgREST's "estimated" count (exact for small results, planner
+    statistics for large ones), so it stays cheap on a big backlog.
+    Returns None if the count isn't available.
+    """
+    response = (
+        supabase
+        .table(source_table)
+        .select("*", count="estimated", head=True)
+        .gt(watermark_column, since.isoformat())
+        .execute()
+    )
+    return response.count
+
+
 def _serialize_value(val: Any) -> Any:
     """
     Convert Python values to types Snowflake's connector can handle:
@@ -145,45 +371,256 @@ def _serialize_value(val: Any) -> Any:
     return val
 
 
+# ---------------------------------------------------------------------------
+# Postgres read helpers (direct, via psycopg)
+# ---------------------------------------------------------------------------
+
+# Types psycopg would parse into Python objects that the sync then has to
+# turn back into strings (_serialize_value); loading them as text skips both
+_TEXT_LOADED_TYPES = ("uuid", "json", "jsonb")
+
+
+def postgres_dsn() -> str:
+    """libpq connection string for DATABASE_URL (drops SQLAlchemy's +driver suffix)."""
+    url = make_url(settings.DATABASE_URL).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+def _timestamp_to_text(val: Any) -> Any:
+    # Same rendering as _serialize_value: naive UTC ISO
+    if isinstance(val, datetime):
+        if val.tzinfo is not None:
+            val = val.astimezone(timezone.utc).replace(tzinfo=None)
+        return val.isoformat()
+    return val
+
+
+def _column_converters(cursor) -> List[Optional[Callable[[Any], Any]]]:
+    """Per-column converter (None = value is already Snowflake-safe) for *cursor*'s result."""
+    converters = []
+    for col in cursor.description:
+        info = cursor.adapters.types.get(col.type_code)
+        name = info.name if info else ""
+        if info and col.type_code == info.array_oid:
+            # Arrays come back as lists; JSON text, as PostgREST sends them
+            converters.append(_serialize_value)
+        elif name in ("timestamp", "timestamptz"):
+            converters.append(_timestamp_to_text)
+        else:
+            converters.append(None)
+    return converters
+
+
+def stream_changed_batches(
+    source_table: str,
+    watermark_column: str,
+    since: datetime,
+    batch_size: int,
+    dsn: Optional[str] = None,
+    pk: Optional[PrimaryKey] = None,
+    after_key: Optional[str] = None,
+    until: Optional[datetime] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Stream every row of *source_table* with *watermark_column* > *since*
+    straight from Postgres, in ascending watermark order, as batches of up
+    to *batch_size* rows. *pk*, *after_key* and *until* select and order
+    the rows as in fetch_changed_rows(); the keyset test is a row
+    comparison, which an index on (watermark_column, pk...) answers directly.
+
+    One query per call, read through a server-side (named) cursor, so the
+    whole backlog is paged without re-querying and without holding it in
+    memory. Rows come out in the same shape as fetch_changed_rows(): uuid
+    and json/jsonb are loaded as text, arrays become JSON text and
+    timestamps are rendered as naive UTC ISO strings, with no per-cell
+    work for the other columns.
+
+    The connection (read-only, one open transaction) is held until the
+    generator is exhausted or closed.
+    """
+    with psycopg.connect(dsn or postgres_dsn(), connect_timeout=15) as conn:
+        conn.read_only = True
+        for type_name in _TEXT_LOADED_TYPES:
+            conn.adapters.register_loader(type_name, TextLoader)
+
+        col = sql.Identifier(watermark_column)
+        keys = [sql.Identifier(c) for c in key_columns(pk)]
+        after = decode_key(pk, after_key) if keys else None
+        params: List[Any] = [since]
+        if after is not None:
+            where = sql.SQL("({cols}) > ({values})").format(
+                cols=sql.SQL(", ").join([col, *keys]),
+                values=sql.SQL(", ").join([sql.Placeholder()] * (len(keys) + 1)),
+            )
+            params.extend(after)
+        else:
+            where = sql.SQL("{col} > %s").format(col=col)
+        if until is not None:
+            where = sql.SQL("{where} AND {col} <= %s").format(where=where, col=col)
+            params.append(until)
+        order = [col, *keys]
+
+        query = sql.SQL("SELECT * FROM {table} WHERE {where} ORDER BY {order}").format(
+            table=sql.Identifier(source_table),
+            where=where,
+            order=sql.SQL(", ").join(order),
+        )
+        with conn.cursor(name=f"sync_{source_table}") as cur:
+            cur.itersize = batch_size
+            cur.execute(query, params)
+            columns = None
+            while True:
+                records = cur.fetchmany(batch_size)
+                if not records:
+                    return
+                if columns is None:
+                    columns = [c.name for c in cur.description]
+                    convert = [(i, fn) for i, fn in enumerate(_column_converters(cur)) if fn is not None]
+                batch = []
+                for rec in records:
+                    if convert:
+                        rec = list(rec)
+                        for i, fn in convert:
+                            rec[i] = fn(rec[i])
+                    batch.append(dict(zip(columns, rec)))
+                yield batch
+
+
 # ---------------------------------------------------------------------------
 # Snowflake write helpers
 # ---------------------------------------------------------------------------
 
+# Column types a table may declare in sync_config.yaml (tables[].columns).
+# NUMBER and TIMESTAMP_NTZ may carry precision/scale, e.g. NUMBER(10,2)
+SYNC_COLUMN_TYPES = ("VARCHAR", "TIMESTAMP_NTZ", "DATE", "NUMBER", "FLOAT", "BOOLEAN", "VARIANT")
+
+# Target columns already reported as not matching their declared type
+_reported_type_mismatches: set = set()
+
+
+def _base_type(sf_type: str) -> str:
+    """``NUMBER(38,0)`` → ``NUMBER``."""
+    return sf_type.split("(", 1)[0].strip().upper()
+
+
+def column_types_for(
+    columns: List[str],
+    declared: Optional[Dict[str, str]],
+    rows: List[Dict[str, Any]],
+) -> Dict[str, str]:
+    """
+    Snowflake type for each of *columns*: the type *declared* for it in
+    sync_config.yaml, else one inferred from its first non-null value in
+    *rows* (bool → BOOLEAN, int → NUMBER, float → FLOAT), else VARCHAR.
+
+    Timestamps, dates and JSON arrive as strings, so they are only typed
+    when declared. Raises ValueError for a declared type not in
+    SYNC_COLUMN_TYPES.
+    """
+    declared = {col: str(t).strip().upper() for col, t in (declared or {}).items()}
+    for col, sf_type in declared.items():
+        if _base_type(sf_type) not in SYNC_COLUMN_TYPES:
+            raise ValueError(
+                f"Unsupported type {sf_type!r} for column {col} "
+                f"(expected one of {', '.join(SYNC_COLUMN_TYPES)})"
+            )
+
+    types = {}
+    for col in columns:
+        if col in declared:
+            types[col] = declared[col]
+            continue
+        sample = next((row[col] for row in rows if row.get(col) is not None), None)
+        if isinstance(sample, bool):
+            types[col] = "BOOLEAN"
+        elif isinstance(sample, int):
+            types[col] = "NUMBER"
+        elif isinstance(sample, float):
+            types[col] = "FLOAT"
+        else:
+            types[col] = "VARCHAR"
+    return types
+
+
+def _cast_from_text(expr: str, sf_type: str) -> str:
+    """SQL converting the VARCHAR staging value *expr* to a *sf_type* target column."""
+    base = _base_type(sf_type)
+    if base in ("VARCHAR", "TEXT", "STRING"):
+        return expr
+    if base == "VARIANT":
+        return f"PARSE_JSON({expr})"
+    return f"CAST({expr} AS {sf_type})"
+
+
 def ensure_snowflake_table(
     sf_cursor,
     target_table: str,
     columns: List[str],
-    pk: str,
-) -> None:
+    pk: PrimaryKey,
+    column_types: Optional[Dict[str, str]] = None,
+) -> Dict[str, str]:
     """
-    CREATE TABLE IF NOT EXISTS the target table in Snowflake.
-    All columns are created as VARCHAR except the pk (also VARCHAR).
-    This is intentionally permissive — Snowflake can cast as needed and
-    the schema can be tightened later once column types are stable.
+    CREATE TABLE IF NOT EXISTS the target table in Snowflake and add any of
+    *columns* it doesn't have yet. Returns {column: type} for the target as
+    it now stands, keyed by lowercase column name.
+
+    New columns get their type from *column_types* (see column_types_for),
+    VARCHAR when absent. Evolution is additive: ADD COLUMN is a metadata
+    change that doesn't rewrite existing micro-partitions, and a column
+    keeps the type it was created with even if its declaration changes
+    (reported once, at WARNING).
     """
+    column_types = column_types or {}
     col_defs = ", ".join(
-        f"{col} VARCHAR" for col in columns
+        f"{col} {column_types.get(col, 'VARCHAR')}" for col in columns
     )
     sf_cursor.execute(
         f"CREATE TABLE IF NOT EXISTS {target_table} ({col_defs})"
     )
+    sf_cursor.execute(f"DESCRIBE TABLE {target_table}")
+    existing = {row[0].lower(): row[1] for row in sf_cursor.fetchall()}
+
+    for col in columns:
+        wanted = column_types.get(col, "VARCHAR")
+        actual = existing.get(col.lower())
+        if actual is None:
+            sf_cursor.execute(
+                f"ALTER TABLE {target_table} ADD COLUMN IF NOT EXISTS {col} {wanted}"
+            )
+            existing[col.lower()] = wanted
+            logger.info("[sync] Added column %s.%s (%s)", target_table, col, wanted)
+        elif _base_type(actual) != _base_type(wanted) and (target_table, col) not in _reported_type_mismatches:
+            _reported_type_mismatches.add((target_table, col))
+            logger.warning(
+                "[sync] %s.%s is %s, not %s — existing columns are never retyped; "
+                "drop the table and reset its watermark to rebuild it",
+                target_table, col, actual, wanted,
+            )
+    return existing
 
 
 def upsert_to_snowflake(
     sf_cursor,
     target_table: str,
     rows: List[Dict[str, Any]],
-    pk: str,
+    pk: PrimaryKey,
+    bulk: bool = False,
+    column_types: Optional[Dict[str, str]] = None,
 ) -> None:
     """
     Upsert *rows* into *target_table* using a Snowflake temporary
     staging table + MERGE statement.
 
     Steps:
-    1. CREATE OR REPLACE TEMPORARY TABLE staging_<target> (same columns)
-    2. INSERT all rows into staging in one executemany call
-    3. MERGE staging → target on pk equality
-    4. The temp table is automatically dropped at session end
+    1. CREATE OR REPLACE TEMPORARY TABLE staging_<target> (same columns,
+       all VARCHAR)
+    2. Load all rows into staging — one executemany call, or with *bulk*
+       a staged file load (stage_load_rows)
+    3. Create / extend the target with *column_types* (ensure_snowflake_table)
+    4. MERGE staging → target on equality of every pk column, casting each column to the
+       target's type (PARSE_JSON for VARIANT). A value that doesn't cast
+       fails the batch rather than landing as NULL.
+    5. The temp table is automatically dropped at session end
     """
     if not rows:
         return
@@ -198,35 +635,153 @@ def upsert_to_snowflake(
     )
 
     # 2. Bulk insert into staging
-    placeholders = ", ".join(["%s"] * len(columns))
-    insert_sql = (
-        f"INSERT INTO {staging_table} ({', '.join(columns)}) "
-        f"VALUES ({placeholders})"
-    )
-    sf_cursor.executemany(
-        insert_sql,
-        [tuple(row[col] for col in columns) for row in rows],
+    if bulk:
+        stage_load_rows(sf_cursor, staging_table, columns, rows)
+    else:
+        placeholders = ", ".join(["%s"] * len(columns))
+        insert_sql = (
+            f"INSERT INTO {staging_table} ({', '.join(columns)}) "
+            f"VALUES ({placeholders})"
+        )
+        sf_cursor.executemany(
+            insert_sql,
+            [tuple(row[col] for col in columns) for row in rows],
+        )
+
+    # 3. Ensure the target exists with every column, and learn its types
+    target_types = ensure_snowflake_table(sf_cursor, target_table, columns, pk, column_types)
+
+    # 4. MERGE staging → target
+    casts = {c: _cast_from_text(c, target_types[c.lower()]) for c in columns}
+    typed_cols = ", ".join(c if expr == c else f"{expr} AS {c}" for c, expr in casts.items())
+    keys = key_columns(pk)
+    on_clause = " AND ".join(f"t.{c} = s.{c}" for c in keys)
+    update_cols = [c for c in columns if c not in keys]
+    matched = (
+        f"WHEN MATCHED THEN UPDATE SET {', '.join(f't.{c} = s.{c}' for c in update_cols)}"
+        if update_cols else ""
     )
-
-    # 3. MERGE staging → target
-    #    Ensure target table exists first
-    ensure_snowflake_table(sf_cursor, target_table, columns, pk)
-
-    update_cols = [c for c in columns if c != pk]
-    update_clause = ", ".join(f"t.{c} = s.{c}" for c in update_cols)
     insert_cols = ", ".join(columns)
     insert_vals = ", ".join(f"s.{c}" for c in columns)
 
     merge_sql = f"""
         MERGE INTO {target_table} t
-        USING {staging_table} s
-        ON t.{pk} = s.{pk}
-        WHEN MATCHED THEN UPDATE SET {update_clause}
+        USING (SELECT {typed_cols} FROM {staging_table}) s
+        ON {on_clause}
+        {matched}
         WHEN NOT MATCHED THEN INSERT ({insert_cols}) VALUES ({insert_vals})
     """
     sf_cursor.execute(merge_sql)
 
 
+# ---------------------------------------------------------------------------
+# Staged file load (PUT + COPY INTO)
+# ---------------------------------------------------------------------------
+
+# Rows per staged file; COPY loads the files of one batch in parallel
+STAGE_ROWS_PER_FILE = 100_000
+
+# Files are staged under the user stage (@~), which every role can use and
+# which doesn't depend on the temporary staging table's lifetime
+_USER_STAGE_PREFIX = "@~/flock_sync"
+
+# Quoted values keep empty strings; an unquoted empty field is NULL
+_CSV_FILE_FORMAT = (
+    "TYPE = CSV COMPRESSION = GZIP FIELD_DELIMITER = ',' "
+    "FIELD_OPTIONALLY_ENCLOSED_BY = '\"' EMPTY_FIELD_AS_NULL = TRUE "
+    "ESCAPE_UNENCLOSED_FIELD = NONE"
+)
+
+
+def _csv_field(val: Any) -> str:
+    """One CSV field, rendered the way Snowflake stores the bound value in a VARCHAR."""
+    if val is None:
+        return ""
+    if isinstance(val, bool):
+        val = "true" if val else "false"
+    return '"' + str(val).replace('"', '""') + '"'
+
+
+def _write_csv_files(directory: str, columns: List[str], rows: List[Dict[str, Any]]) -> List[str]:
+    """Write *rows* as gzipped CSV files of up to STAGE_ROWS_PER_FILE rows; returns their names."""
+    names = []
+    for start in range(0, len(rows), STAGE_ROWS_PER_FILE):
+        name = f"part_{start // STAGE_ROWS_PER_FILE:05d}.csv.gz"
+        # compresslevel 1: the upload, not the ratio, is the bottleneck
+        with gzip.open(os.path.join(directory, name), "wt", encoding="utf-8", newline="", compresslevel=1) as fh:
+            for row in rows[start:start + STAGE_ROWS_PER_FILE]:
+                fh.write(",".join(_csv_field(row.get(col)) for col in columns))
+                fh.write("\n")
+        names.append(name)
+    return names
+
+
+def _result_dicts(sf_cursor) -> List[Dict[str, Any]]:
+    names = [d[0].lower() for d in sf_cursor.description or []]
+    return [dict(zip(names, r)) for r in sf_cursor.fetchall()]
+
+
+def stage_load_rows(
+    sf_cursor,
+    staging_table: str,
+    columns: List[str],
+    rows: List[Dict[str, Any]],
+) -> int:
+    """
+    Load *rows* into the (empty) *staging_table* through files instead of
+    bound INSERTs:
+
+    1. write them as gzipped CSV files in a local temp directory
+    2. PUT the files to a unique path under the user stage
+    3. COPY INTO *staging_table* (ON_ERROR = ABORT_STATEMENT, PURGE = TRUE)
+    4. verify the rows loaded by COPY and the staging table's row count
+       both equal len(rows) — raises RuntimeError otherwise, so the batch
+       is never MERGEd and its watermark doesn't move
+
+    Local files and any staged files COPY didn't purge are removed
+    whether or not the load succeeds. Returns the number of rows loaded.
+    """
+    stage_path = f"{_USER_STAGE_PREFIX}/{staging_table}/{uuid.uuid4().hex}"
+
+    with tempfile.TemporaryDirectory(prefix="flock_sync_") as tmp:
+        files = _write_csv_files(tmp, columns, rows)
+        try:
+            local = os.path.join(tmp, "*.csv.gz").replace("\\", "/")
+            sf_cursor.execute(
+                f"PUT 'file://{local}' {stage_path} "
+                f"AUTO_COMPRESS = FALSE SOURCE_COMPRESSION = GZIP PARALLEL = 8 OVERWRITE = TRUE"
+            )
+            uploaded = _result_dicts(sf_cursor)
+            failed = [u for u in uploaded if str(u.get("status", "")).upper() not in ("UPLOADED", "SKIPPED")]
+            if failed or len(uploaded) != len(files):
+                raise RuntimeError(
+                    f"PUT to {stage_path} uploaded {len(uploaded) - len(failed)} of {len(files)} files"
+                )
+
+            sf_cursor.execute(
+                f"COPY INTO {staging_table} ({', '.join(columns)}) "
+                f"FROM {stage_path} "
+                f"FILE_FORMAT = ({_CSV_FILE_FORMAT}) "
+                f"ON_ERROR = ABORT_STATEMENT PURGE = TRUE"
+            )
+            loaded = sum(int(r.get("rows_loaded") or 0) for r in _result_dicts(sf_cursor))
+            sf_cursor.execute(f"SELECT COUNT(*) FROM {staging_table}")
+            counted = sf_cursor.fetchone()[0]
+            if loaded != len(rows) or counted != len(rows):
+                raise RuntimeError(
+                    f"COPY INTO {staging_table} loaded {loaded} rows "
+                    f"(table has {counted}), expected {len(rows)}"
+                )
+        finally:
+            try:
+                sf_cursor.execute(f"REMOVE {stage_path}")
+            except Exception as e:  # noqa: BLE001
+                logger.warning("[sync] Could not remove staged files at %s: %s", stage_path, e)
+
+    logger.debug("[sync] Stage-loaded %d rows into %s from %d file(s)", loaded, staging_table, len(files))
+    return loaded
+
+
 # ---------------------------------------------------------------------------
 # Watermark extraction from a batch
 # ---------------------------------------------------------------------------
@@ -254,3 +809,23 @@ def max_watermark_from_rows(
             values.append(raw)
 
     return max(values) if values else None
+
+
+def keyset_position(
+    rows: List[Dict[str, Any]],
+    watermark_column: str,
+    pk: Optional[PrimaryKey] = None,
+) -> Optional[Tuple[datetime, Optional[str]]]:
+    """
+    The keyset cursor just past *rows*: (watermark, pk) of the last row, as
+    an aware datetime and the encode_key() string (None without *pk*). The
+    rows must be in fetch order, i.e. ascending (watermark_column, pk...).
+    Returns None if the last row has no watermark.
+    """
+    if not rows:
+        return None
+    last = rows[-1]
+    since = _parse_watermark(last.get(watermark_column))
+    if since is None:
+        return None
+    return since, (encode_key(pk, last) if pk else None)
@@ -83,6 +83,12 @@ create index if not exists idx_check_ins_user_date on public.check_ins(user_id,
 create index if not exists idx_group_members_user on public.group_members(user_id);
 create index if not exists idx_groups_invite_code on public.groups(invite_code);
 
+-- Keyset order of the Postgres → Snowflake sync: (watermark_column, pk) per
+-- table in backend/worker/sync_config.yaml
+create index if not exists idx_goal_completions_sync on public.goal_completions(created_at, id);
+create index if not exists idx_check_ins_sync on public.check_ins(created_at, id);
+create index if not exists idx_group_members_sync on public.group_members(joined_at, group_id, user_id);
+
 -- =====================
 -- PART 3: ENABLE RLS
 -- =====================